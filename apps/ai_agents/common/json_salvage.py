@@ -0,0 +1,328 @@
+"""
+LLM 输出的容错 JSON 解析（各 Agent 共用）
+
+LLM 返回的 JSON 常见问题：
+- 被 ```json ... ``` 代码块包裹，前后夹杂说明文字
+- 受 max_tokens 限制被截断，缺少结尾的 ] 或 }
+- 使用单引号、尾随逗号、Python 字面量（True/False/None）
+- 多个对象之间缺少逗号，或直接输出多个并列对象
+
+parse_json() 先尝试标准 json.loads（C 实现，最快），失败后使用容错解析：
+截断时丢弃最后一个不完整的数组元素，保留所有完整元素，不再因为一个缺失的括号整体重试 LLM。
+"""
+
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+_FENCE_PATTERN = re.compile(r'```[ \t]*(?:json[c5]?|JSON|javascript|js)?[ \t]*\r?\n?')
+_WHITESPACE = re.compile(r'[\s﻿]*')
+_NUMBER = re.compile(r'-?(?:\d+)(?:\.\d*)?(?:[eE][+-]?\d+)?')
+_IDENTIFIER = re.compile(r'[A-Za-z_$][\w$-]*')
+_STRING_SPECIAL = {'"': re.compile(r'["\\]'), "'": re.compile(r"['\\]")}
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '/': '/', '\\': '\\', '"': '"', "'": "'"}
+_LITERALS = {
+    'true': True, 'True': True,
+    'false': False, 'False': False,
+    'null': None, 'None': None, 'undefined': None,
+}
+
+
+class JsonSalvageError(ValueError):
+    """无法从文本中解析出任何 JSON 值"""
+
+
+class _Truncated(Exception):
+    """解析到文本末尾时值仍未结束，partial 为已解析出的部分内容"""
+
+    def __init__(self, partial: Any = None, container: bool = False):
+        super().__init__()
+        self.partial = partial
+        self.container = container
+
+
+class _TolerantParser:
+    """容错的递归下降 JSON 解析器"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+
+    def skip_ws(self) -> None:
+        self.pos = _WHITESPACE.match(self.text, self.pos).end()
+
+    def at_end(self) -> bool:
+        return self.pos >= len(self.text)
+
+    def parse_value(self) -> Any:
+        self.skip_ws()
+        if self.at_end():
+            raise _Truncated()
+        ch = self.text[self.pos]
+        if ch == '{':
+            return self.parse_object()
+        if ch == '[':
+            return self.parse_array()
+        if ch in _STRING_SPECIAL:
+            return self.parse_string()
+        if ch == '-' or ch.isdigit():
+            return self.parse_number()
+        match = _IDENTIFIER.match(self.text, self.pos)
+        if match:
+            word = match.group(0)
+            if word in _LITERALS:
+                self.pos = match.end()
+                return _LITERALS[word]
+            if match.end() == len(self.text) and any(lit.startswith(word) for lit in _LITERALS):
+                raise _Truncated()
+        raise JsonSalvageError(f"位置 {self.pos} 处存在无法识别的内容: {self.text[self.pos:self.pos + 20]!r}")
+
+    def parse_string(self) -> str:
+        quote = self.text[self.pos]
+        special = _STRING_SPECIAL[quote]
+        self.pos += 1
+        parts = []
+        while True:
+            match = special.search(self.text, self.pos)
+            if match is None:
+                raise _Truncated()
+            parts.append(self.text[self.pos:match.start()])
+            self.pos = match.end()
+            if match.group(0) == quote:
+                return ''.join(parts)
+            # 反斜杠转义
+            if self.at_end():
+                raise _Truncated()
+            esc = self.text[self.pos]
+            if esc == 'u':
+                hex_digits = self.text[self.pos + 1:self.pos + 5]
+                if len(hex_digits) < 4:
+                    raise _Truncated()
+                try:
+                    parts.append(chr(int(hex_digits, 16)))
+                    self.pos += 5
+                except ValueError:
+                    parts.append(esc)
+                    self.pos += 1
+            else:
+                parts.append(_ESCAPES.get(esc, esc))
+                self.pos += 1
+
+    def parse_number(self) -> Any:
+        match = _NUMBER.match(self.text, self.pos)
+        if match is None:
+            if self.pos + 1 >= len(self.text):
+                raise _Truncated()
+            raise JsonSalvageError(f"位置 {self.pos} 处的数字格式不正确")
+        self.pos = match.end()
+        if self.at_end():
+            # 数字可能被截断（例如 12 实际为 123），按截断处理
+            raise _Truncated()
+        token = match.group(0)
+        if token.endswith('.'):
+            token = token[:-1]
+        if any(c in token for c in '.eE'):
+            return float(token)
+        return int(token)
+
+    def parse_array(self) -> List[Any]:
+        self.pos += 1
+        items: List[Any] = []
+        while True:
+            self.skip_ws()
+            if self.at_end():
+                raise _Truncated(items, container=True)
+            ch = self.text[self.pos]
+            if ch == ']':
+                self.pos += 1
+                return items
+            if ch == ',':
+                # 容忍尾随逗号和连续逗号
+                self.pos += 1
+                continue
+            if ch == '}':
+                # 括号错配（多余的 }），跳过
+                self.pos += 1
+                continue
+            try:
+                items.append(self.parse_value())
+            except _Truncated:
+                # 不完整的元素直接丢弃，只保留完整元素
+                raise _Truncated(items, container=True)
+
+    def parse_object(self) -> dict:
+        self.pos += 1
+        result: dict = {}
+        while True:
+            self.skip_ws()
+            if self.at_end():
+                raise _Truncated(result, container=True)
+            ch = self.text[self.pos]
+            if ch == '}':
+                self.pos += 1
+                return result
+            if ch == ',':
+                self.pos += 1
+                continue
+            if ch == ']':
+                self.pos += 1
+                continue
+            key = self._parse_key(result)
+            self.skip_ws()
+            if self.at_end():
+                raise _Truncated(result, container=True)
+            if self.text[self.pos] in ':=':
+                self.pos += 1
+            try:
+                result[key] = self.parse_value()
+            except _Truncated as e:
+                # 对象中被截断的容器值保留已完成部分（如 test_points 数组），被截断的标量丢弃
+                if e.container:
+                    result[key] = e.partial
+                raise _Truncated(result, container=True)
+
+    def _parse_key(self, partial: dict) -> str:
+        ch = self.text[self.pos]
+        if ch in _STRING_SPECIAL:
+            try:
+                return self.parse_string()
+            except _Truncated:
+                raise _Truncated(partial, container=True)
+        match = _IDENTIFIER.match(self.text, self.pos)
+        if match is None:
+            raise JsonSalvageError(f"位置 {self.pos} 处的对象键格式不正确")
+        if match.end() == len(self.text):
+            raise _Truncated(partial, container=True)
+        self.pos = match.end()
+        return match.group(0)
+
+
+def strip_code_fence(text: str) -> str:
+    """取出第一个 ``` 代码块中的内容；代码块未闭合（输出被截断）时取到文本末尾；没有代码块时原样返回"""
+    match = _FENCE_PATTERN.search(text)
+    if match is None:
+        return text.strip()
+    end = text.find('```', match.end())
+    return text[match.end():end if end != -1 else len(text)].strip()
+
+
+def _find_start(text: str, expect: Optional[type]) -> int:
+    if expect is dict and '{' in text:
+        return text.find('{')
+    if expect is list:
+        return _find_list_start(text)
+    starts = [pos for pos in (text.find('['), text.find('{')) if pos != -1]
+    return min(starts) if starts else -1
+
+
+def _find_list_start(text: str) -> int:
+    """expect=list 时跳过前置说明中的方括号（如 "[注意]"）
+
+    依次尝试每个 '['，取第一个能解析为元素均为对象/数组的非空数组的位置；都不满足时依次退回到
+    第一个 '{'（省略外层数组的并列对象）、第一个能解析为数组的 '['（如空数组）、第一个 '['。
+    """
+    first_list = -1
+    pos = text.find('[')
+    while pos != -1:
+        try:
+            value, _, _ = _parse_tolerant(text, pos)
+        except JsonSalvageError:
+            value = None
+        if isinstance(value, list):
+            if value and all(isinstance(item, (dict, list)) for item in value):
+                return pos
+            if first_list == -1:
+                first_list = pos
+        pos = text.find('[', pos + 1)
+    if '{' in text:
+        return text.find('{')
+    return first_list if first_list != -1 else text.find('[')
+
+
+def _parse_tolerant(text: str, start: int) -> Tuple[Any, int, bool]:
+    """从 start 开始容错解析一个值，返回 (值, 结束位置, 是否被截断)"""
+    parser = _TolerantParser(text)
+    parser.pos = start
+    try:
+        value = parser.parse_value()
+        return value, parser.pos, False
+    except _Truncated as e:
+        if not e.container:
+            raise JsonSalvageError("JSON 在第一个完整值之前被截断")
+        return e.partial, len(text), True
+
+
+def parse_json_with_status(text: str, expect: Optional[type] = None) -> Tuple[Any, bool]:
+    """容错解析 LLM 输出中的 JSON
+
+    Args:
+        text: LLM 原始输出
+        expect: 期望的顶层类型（list / dict），用于跳过前置说明文字中的括号
+
+    Returns:
+        (解析结果, 是否经过截断修复)
+
+    Raises:
+        JsonSalvageError: 无法解析出任何 JSON 值
+    """
+    if not text or not text.strip():
+        raise JsonSalvageError("LLM 输出为空")
+    candidate = strip_code_fence(text)
+    try:
+        return json.loads(candidate), False
+    except json.JSONDecodeError:
+        pass
+
+    start = _find_start(candidate, expect)
+    if start == -1 and candidate is not text:
+        # 代码块内没有 JSON 时回退到整段文本
+        candidate = text
+        start = _find_start(candidate, expect)
+    if start == -1:
+        raise JsonSalvageError("LLM 输出中没有 JSON 数组或对象")
+    value, end, truncated = _parse_tolerant(candidate, start)
+
+    if expect is list and isinstance(value, list) and not truncated:
+        # 数组后面紧跟其他数组/对象（LLM 分段输出）时一并收集
+        value = list(value)
+        for extra in _iter_following_values(candidate, end):
+            if isinstance(extra, list):
+                value.extend(extra)
+            else:
+                value.append(extra)
+    elif expect is list and isinstance(value, dict):
+        # LLM 省略了外层数组，直接输出多个并列对象
+        value = [value] + list(_iter_following_values(candidate, end))
+    return value, truncated
+
+
+def _iter_following_values(text: str, pos: int):
+    """依次解析 pos 之后紧邻的 JSON 值，遇到非 JSON 内容即停止"""
+    while True:
+        match = _WHITESPACE.match(text, pos)
+        pos = match.end()
+        if pos < len(text) and text[pos] == ',':
+            pos = _WHITESPACE.match(text, pos + 1).end()
+        if pos >= len(text) or text[pos] not in '[{':
+            return
+        try:
+            value, pos, truncated = _parse_tolerant(text, pos)
+        except JsonSalvageError:
+            return
+        if truncated and not value:
+            return
+        yield value
+        if truncated:
+            return
+
+
+def parse_json(text: str, expect: Optional[type] = None) -> Any:
+    """容错解析 LLM 输出中的 JSON，参见 parse_json_with_status"""
+    return parse_json_with_status(text, expect)[0]
+
+
+def parse_json_list(text: str) -> List[Any]:
+    """解析 LLM 输出为列表；输出为单个对象时包装为单元素列表"""
+    value = parse_json(text, expect=list)
+    return value if isinstance(value, list) else [value]
+
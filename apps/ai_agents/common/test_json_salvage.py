@@ -0,0 +1,44 @@
+"""
+json_salvage 的回归测试（不依赖 Django，可直接运行）：
+
+    python -m unittest apps.ai_agents.common.test_json_salvage
+"""
+
+import unittest
+
+from apps.ai_agents.common.json_salvage import JsonSalvageError, parse_json, parse_json_list
+
+
+class ParseJsonPrefaceTest(unittest.TestCase):
+    """前置说明文字中的括号不应被当作 JSON 的起点"""
+
+    def test_list_after_bracketed_preface(self):
+        text = '说明 [注意] 以下为生成的用例\n[{"id": 1, "title": "登录"}, {"id": 2, "title": "注册"}]'
+        self.assertEqual(parse_json(text, expect=list), [{"id": 1, "title": "登录"}, {"id": 2, "title": "注册"}])
+
+    def test_list_after_ascii_bracketed_preface(self):
+        text = 'Note [draft] output:\n[{"id": 1}]'
+        self.assertEqual(parse_json_list(text), [{"id": 1}])
+
+    def test_truncated_list_after_bracketed_preface(self):
+        text = '说明 [注意]\n[{"id": 1}, {"id": 2, "title": "未完'
+        self.assertEqual(parse_json(text, expect=list), [{"id": 1}])
+
+    def test_objects_without_outer_list_after_preface(self):
+        text = '说明 [注意]\n{"id": 1}\n{"id": 2}'
+        self.assertEqual(parse_json(text, expect=list), [{"id": 1}, {"id": 2}])
+
+    def test_empty_list_after_preface(self):
+        self.assertEqual(parse_json('说明 [注意] 没有用例\n[]', expect=list), [])
+
+    def test_dict_after_bracketed_preface(self):
+        text = '说明 [注意]\n{"test_points": [{"id": "TP-001"}]}'
+        self.assertEqual(parse_json(text, expect=dict), {"test_points": [{"id": "TP-001"}]})
+
+    def test_no_json(self):
+        with self.assertRaises(JsonSalvageError):
+            parse_json('没有任何结构化内容', expect=list)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,7 +7,7 @@ from typing import List, Dict, Any, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from .prompts import APITestCaseGeneratorPrompt
 from apps.llm.base import LLMServiceFactory
-from .iface_test_case_parser import parse_minimal_cases_or_raise
+from .iface_test_case_parser import parse_minimal_cases_or_raise, minimal_cases_output
 from .retry_utils import generate_with_retry
 from apps.utils.logger_manager import set_task_context, clear_task_context
 
@@ -24,7 +24,8 @@ class APITestCaseGeneratorAgent:
     
     def __init__(self, llm_provider: str = "deepseek"):
         self.llm_provider = llm_provider
-        self.llm = LLMServiceFactory.create(llm_provider)
+        # 提供商支持时使用原生结构化输出(JSON mode/schema), 解析失败才需要整轮重试
+        self.llm, self.structured_mode = minimal_cases_output.bind(LLMServiceFactory.create(llm_provider))
         self.prompt = APITestCaseGeneratorPrompt()
         self.test_case_full_template = self._load_test_case_full_template()
         self.max_workers = 5
@@ -165,6 +166,7 @@ class APITestCaseGeneratorAgent:
                 api_info, priority, count,
                 include_format_instructions=include_format_instructions
             )
+            messages = minimal_cases_output.apply(messages, self.structured_mode)
             
             # 打印完整提示词
             try:
@@ -210,7 +212,7 @@ class APITestCaseGeneratorAgent:
         try:
             return generate_with_retry(
                 call_llm=call_llm_once,
-                parse_cases=parse_minimal_cases_or_raise,
+                parse_cases=lambda raw: parse_minimal_cases_or_raise(raw, self.structured_mode),
                 on_retry=on_retry,
                 max_retries=2
             )
@@ -3,51 +3,65 @@ LLM 最小输出的解析器模块
 提供从文本到 MinimalCase 列表的解析功能，替代裸 json.loads
 """
 import json
-from typing import List
-# from pydantic import ValidationError
+from typing import List, Optional
+from pydantic import ValidationError
 from langchain_core.output_parsers import PydanticOutputParser
+from apps.ai_agents.common.json_salvage import strip_code_fence
+from apps.llm.structured import StructuredOutput
+from apps.utils.logger_manager import get_logger
 from .iface_test_case_schema import MinimalCase
 
+logger = get_logger(__name__)
+
 # 建立 Pydantic 解析器
 api_test_case_parser = PydanticOutputParser(pydantic_object=MinimalCase)
 
+# 提供商原生结构化输出约定, 用例数组包装在 cases 字段中
+minimal_cases_output = StructuredOutput('minimal_cases', MinimalCase, wrapper_key='cases')
+
 
 def clean_json_fence(text: str) -> str:
     """清理 LLM 输出中的 ```json ... ``` 包裹"""
-    s = text.strip()
-    if s.startswith('```json'):
-        s = s[7:]
-    if s.endswith('```'):
-        s = s[:-3]
-    return s.strip()
+    return strip_code_fence(text)
 
 
-def parse_minimal_cases_or_raise(response_text: str) -> List[MinimalCase]:
+def parse_minimal_cases_or_raise(response_text: str, structured_mode: Optional[str] = None) -> List[MinimalCase]:
     """
     解析 LLM 响应为 MinimalCase 列表
     
     Args:
         response_text: LLM 的原始字符串输出
+        structured_mode: 调用时使用的结构化输出模式, None 表示提供商不支持
         
     Returns:
         List[MinimalCase]: 解析后的结构化对象列表
         
     Raises:
-        ValidationError: 字段缺失或类型错误
-        json.JSONDecodeError: JSON 格式错误
+        ValidationError: 所有用例均字段缺失或类型错误
+        JsonSalvageError: 响应中无法解析出任何 JSON（ValueError 子类）
     """
-    cleaned = clean_json_fence(response_text)
-    parsed = json.loads(cleaned)  # 若 JSON 不合法，直接抛 JSONDecodeError
-
-    # 统一转为列表处理（支持 LLM 返回单个对象或数组）
-    items = parsed if isinstance(parsed, list) else [parsed]
+    # 容错解析：代码块、截断、单引号、尾随逗号等，截断时保留所有完整用例
+    items = minimal_cases_output.parse(response_text, structured_mode)
     results: List[MinimalCase] = []
+    errors: List[Exception] = []
     
     for item in items:
-        # 交给 parser 做字段/类型校验与转换（失败会抛 ValidationError）
-        obj = api_test_case_parser.parse(json.dumps(item, ensure_ascii=False))
+        # 交给 parser 做字段/类型校验与转换，单条不合法时跳过，保留其余用例
+        try:
+            obj = api_test_case_parser.parse(json.dumps(item, ensure_ascii=False))
+        except (ValidationError, ValueError) as e:
+            errors.append(e)
+            continue
         results.append(obj)
     
+    if errors:
+        logger.warning("共 %d 条用例字段校验失败，已跳过", len(errors))
+        if not results:
+            raise errors[0]
+    if not results:
+        # 没有任何完整用例时交由 generate_with_retry 重试
+        raise ValueError("LLM 响应中没有完整的用例")
+    
     return results
 
 
@@ -0,0 +1,24 @@
+"""
+接口测试用例生成的后台任务
+
+替代原先每个请求启动一个守护线程的方式：任务持久化在 Job 表中，worker 重启后会重新执行，
+进度仍通过 progress_registry / SSE 推送（跨进程时由任务队列写入 Job.progress）。
+"""
+
+from typing import Any, Dict
+
+from apps.utils.job_queue import register_job
+
+
+@register_job('iface_case_generation')
+def iface_case_generation_job(payload: Dict[str, Any], job) -> Dict[str, Any]:
+    from apps.ai_agents.iface_case_generator.iface_case_generator import generate_test_cases_for_apis
+
+    result = generate_test_cases_for_apis(
+        payload['file_path'], payload['selected_apis'], payload['count_per_api'],
+        payload['priority'], payload['llm_provider'], job.task_id,
+        rules_override=payload.get('rules_override')
+    )
+    if not result.get('success'):
+        raise RuntimeError(result.get('error') or result.get('message') or '接口测试用例生成失败')
+    return result
@@ -1,9 +1,10 @@
-from apps.ai_agents.iface_case_generator.iface_case_generator import parse_api_definitions,generate_test_cases_for_apis
+from apps.ai_agents.iface_case_generator.iface_case_generator import parse_api_definitions
 
 from django.conf import settings
 from django.http import JsonResponse, FileResponse
 from apps.utils.progress_registry import get_progress as get_task_progress
-from apps.utils.logger_manager import get_logger, set_task_context, clear_task_context
+from apps.utils.logger_manager import get_logger
+from apps.utils.job_queue import enqueue_job, get_job_progress, is_remote_job_task
 from django.shortcuts import render
 # from apps.ai_agents.common.base_prompts import PromptTemplateManager
 from apps.llm.utils import get_agent_llm_configs
@@ -95,28 +96,21 @@ def iface_case_generator(request):
             # 任务ID（前端可传入；若没有则后端生成）
             task_id = request.POST.get('task_id') or f"task_{int(time.time()*1000)}_{request.user.id if request.user.is_authenticated else 'anon'}"
             
-            # 后台线程异步生成，立即返回
-            import threading
-            def _bg_job():
-                try:
-                    set_task_context(task_id)
-                    # 透传用户规则覆盖（若有）
-                    rules_override = request.POST.get('rules_override') or None
-                    generate_test_cases_for_apis(
-                        file_path, selected_apis, count_per_api, priority, llm_provider, task_id,
-                        rules_override=rules_override
-                    )
-                except Exception as e:
-                    logger.error(f"后台生成失败: {e}")
-                finally:
-                    clear_task_context()
-            t = threading.Thread(target=_bg_job, name=f"gen-{task_id}")
-            t.daemon = True
-            t.start()
+            # 写入后台任务队列后立即返回，由任务 worker 执行生成
+            job = enqueue_job('iface_case_generation', {
+                'file_path': file_path,
+                'selected_apis': selected_apis,
+                'count_per_api': count_per_api,
+                'priority': priority,
+                'llm_provider': llm_provider,
+                # 透传用户规则覆盖（若有）
+                'rules_override': request.POST.get('rules_override') or None,
+            }, task_id=task_id)
             
             return JsonResponse({
                 'success': True,
-                'task_id': task_id
+                'task_id': task_id,
+                'job_id': job.id
             })
         
         else:
@@ -137,7 +131,11 @@ def get_generation_progress_api(request):
         task_id = request.GET.get('task_id')
         if not task_id:
             return JsonResponse({'success': False, 'message': '缺少 task_id'})
-        progress = get_task_progress(task_id)
+        # 任务在其他进程（任务 worker）中执行时，从 Job 表读取持久化的进度
+        if is_remote_job_task(task_id):
+            progress = get_job_progress(task_id)
+        else:
+            progress = get_task_progress(task_id)
         if not progress:
             return JsonResponse({'success': False, 'message': '未找到进度信息'})
         
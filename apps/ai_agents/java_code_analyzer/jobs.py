@@ -0,0 +1,102 @@
+"""
+Java源码分析的后台任务
+
+分析过程包含拉取代码、切换版本和多轮 Agent 调用，耗时较长；在进程池中执行，
+同一仓库的 git checkout 不会与 Web 进程互相干扰（进程池大小见 JOB_QUEUE_CONFIG['process_workers']）。
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict
+from urllib.parse import quote
+
+from django.conf import settings
+
+from apps.utils.job_queue import register_job
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+
+def run_java_code_analysis(target_service: str, base_commit: str, new_commit: str, llm_provider: str) -> Dict[str, Any]:
+    """执行一次Java源码变更分析，返回与 java_code_analyzer_service_api 响应一致的字典"""
+    from apps.ai_agents.java_code_analyzer.java_code_analyzer_agent import JavaCodeAnalyzerAgent
+    from apps.ai_agents.java_code_analyzer.tools import GitTools
+
+    repo_path_mapping = settings.REPO_PATH_MAPPING
+
+    repo_path = repo_path_mapping.get(target_service, target_service)
+
+    # 创建Java代码分析Agent实例
+    analyzer_agent = JavaCodeAnalyzerAgent(
+        repo_path=repo_path,
+        api_key=getattr(settings, f'{llm_provider.upper()}_API_KEY', None),
+        base_url=getattr(settings, f'{llm_provider.upper()}_BASE_URL', None),
+        java_analyzer_service_url=getattr(settings, 'JAVA_ANALYZER_SERVICE_URL', 'http://localhost:8089'),
+        max_iterations=15,
+        verbose=True
+    )
+
+    git_tools = GitTools(repo_path)
+    output_dir = Path(settings.BASE_DIR) / "outputs"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    repo_identifier = Path(repo_path).name or "repo"
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_filename = f"{repo_identifier}_analyzer_{base_commit[:8]}_{new_commit[:8]}_{timestamp}.md"
+    output_path = output_dir / output_filename
+
+    original_ref = None
+    report_content = ""
+
+    try:
+        logger.info("拉取最新代码...")
+        git_tools.pull_latest()
+
+        logger.info("记录当前 Git 状态...")
+        original_ref = git_tools.get_current_ref()
+        logger.info(f"当前引用: {original_ref}")
+
+        logger.info(f"切换到目标版本: {new_commit}")
+        git_tools.checkout_version(new_commit)
+        logger.info(f"已切换到: {new_commit}")
+
+        result = analyzer_agent.analyze(base_commit, new_commit)
+
+        if result.get('success'):
+            report_content = result.get('output', '')
+            if report_content:
+                output_path.write_text(report_content, encoding='utf-8')
+                logger.info(f"分析报告已写入: {output_path}")
+            return {
+                'success': True,
+                'result': report_content or '分析完成，但没有返回详细结果',
+                'report_path': str(output_path),
+                'report_filename': output_filename,
+                'report_download_url': f"/java_code_analyzer/api/download-report/?filename={quote(output_filename)}"
+            }
+
+        error_msg = result.get('error', '分析失败')
+        logger.error(f"分析失败: {error_msg}")
+        return {
+            'success': False,
+            'error': error_msg
+        }
+
+    finally:
+        if original_ref:
+            try:
+                git_tools.checkout_version(original_ref)
+                logger.info(f"已恢复到原始引用: {original_ref}")
+            except Exception as restore_error:
+                logger.error(f"恢复原始引用失败: {restore_error}")
+
+
+@register_job('java_code_analysis', pool='process', max_attempts=1)
+def java_code_analysis_job(payload: Dict[str, Any], job) -> Dict[str, Any]:
+    """分析失败（如提交不存在）重试无意义，只执行一次"""
+    result = run_java_code_analysis(
+        payload['target_service'], payload['base_commit'], payload['new_commit'], payload['llm_provider']
+    )
+    if not result.get('success'):
+        raise RuntimeError(result.get('error', '分析失败'))
+    return result
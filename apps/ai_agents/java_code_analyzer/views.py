@@ -1,12 +1,10 @@
 from apps.utils.logger_manager import get_logger
 from django.conf import settings
-from apps.llm import LLMServiceFactory
-from apps.ai_agents.java_code_analyzer.java_code_analyzer_agent import JavaCodeAnalyzerAgent
+from apps.ai_agents.java_code_analyzer.jobs import run_java_code_analysis
+from apps.utils.job_queue import enqueue_job
 import json
 from django.http import JsonResponse
-from apps.ai_agents.java_code_analyzer.tools import GitTools
 from pathlib import Path
-from datetime import datetime
 from django.views.decorators.http import require_http_methods
 from django.shortcuts import render
 from django.http import FileResponse, Http404
@@ -86,78 +84,22 @@ def java_code_analyzer_service_api(request):
                 'error': '目标服务、基础提交和新提交均为必填项'
             }, status=400)
         
-        # 使用工厂创建选定的LLM服务
-        llm_service = LLMServiceFactory.create(
-            provider=llm_provider,
-            **PROVIDERS.get(llm_provider, {})
-        )
-        
-        repo_path_mapping = settings.REPO_PATH_MAPPING
-        
-        repo_path = repo_path_mapping.get(target_service, target_service)
-        
-        # 创建Java代码分析Agent实例
-        analyzer_agent = JavaCodeAnalyzerAgent(
-            repo_path=repo_path,
-            api_key=getattr(settings, f'{llm_provider.upper()}_API_KEY', None),
-            base_url=getattr(settings, f'{llm_provider.upper()}_BASE_URL', None),
-            java_analyzer_service_url=getattr(settings, 'JAVA_ANALYZER_SERVICE_URL', 'http://localhost:8089'),
-            max_iterations=15,
-            verbose=True
-        )
-        
-        git_tools = GitTools(repo_path)
-        output_dir = Path(settings.BASE_DIR) / "outputs"
-        output_dir.mkdir(parents=True, exist_ok=True)
-        repo_identifier = Path(repo_path).name or "repo"
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_filename = f"{repo_identifier}_analyzer_{base_commit[:8]}_{new_commit[:8]}_{timestamp}.md"
-        output_path = output_dir / output_filename
-
-        original_ref = None
-        report_content = ""
-
-        try:
-            logger.info("拉取最新代码...")
-            git_tools.pull_latest()
-
-            logger.info("记录当前 Git 状态...")
-            original_ref = git_tools.get_current_ref()
-            logger.info(f"当前引用: {original_ref}")
-
-            logger.info(f"切换到目标版本: {new_commit}")
-            git_tools.checkout_version(new_commit)
-            logger.info(f"已切换到: {new_commit}")
-
-            result = analyzer_agent.analyze(base_commit, new_commit)
-
-            if result.get('success'):
-                report_content = result.get('output', '')
-                if report_content:
-                    output_path.write_text(report_content, encoding='utf-8')
-                    logger.info(f"分析报告已写入: {output_path}")
-                return JsonResponse({
-                    'success': True,
-                    'result': report_content or '分析完成，但没有返回详细结果',
-                    'report_path': str(output_path),
-                    'report_filename': output_filename,
-                    'report_download_url': f"/java_code_analyzer/api/download-report/?filename={quote(output_filename)}"
-                })
-
-            error_msg = result.get('error', '分析失败')
-            logger.error(f"分析失败: {error_msg}")
+        # 异步模式: 写入后台任务后立即返回, 前端通过任务状态接口查询结果
+        if data.get('async'):
+            job = enqueue_job('java_code_analysis', {
+                'target_service': target_service,
+                'base_commit': base_commit,
+                'new_commit': new_commit,
+                'llm_provider': llm_provider,
+            }, task_id=data.get('task_id'))
             return JsonResponse({
-                'success': False,
-                'error': error_msg
-            }, status=500)
-
-        finally:
-            if original_ref:
-                try:
-                    git_tools.checkout_version(original_ref)
-                    logger.info(f"已恢复到原始引用: {original_ref}")
-                except Exception as restore_error:
-                    logger.error(f"恢复原始引用失败: {restore_error}")
+                'success': True,
+                'job_id': job.id,
+                'task_id': job.task_id
+            })
+        
+        result = run_java_code_analysis(target_service, base_commit, new_commit, llm_provider)
+        return JsonResponse(result, status=200 if result.get('success') else 500)
 
     except json.JSONDecodeError:
         logger.error("JSON解析错误", exc_info=True)
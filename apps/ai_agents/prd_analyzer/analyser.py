@@ -1,13 +1,103 @@
-from typing import Dict, Any, List, Optional
-import json
+import asyncio
+import re
+from typing import Dict, Any, List, Optional, Tuple
 # import logging
 
+from django.conf import settings
+
 from apps.llm.base import BaseLLMService
+from apps.llm.governor import get_provider_governor
+from apps.llm.tokens import estimate_tokens
 from apps.knowledge.service import KnowledgeService
+from apps.ai_agents.common.json_salvage import JsonSalvageError
+from .prd_analysis_schema import PRD_ANALYSIS_OUTPUT, PRD_SECTION_OUTPUT
 from .prompts import PrdAnalyserPrompt
+from .sections import split_markdown_sections
 # from langchain_core.messages import SystemMessage, HumanMessage
 from apps.utils.logger_manager import get_logger
 
+DEFAULT_PRD_ANALYSIS_CONFIG = {
+    'map_reduce_threshold_tokens': 6000,
+    'section_token_budget': 3000,
+    'max_sections': 60,
+}
+
+ANALYSIS_MODES = ('single', 'map_reduce')
+
+# 合并测试点时优先级取较高者
+_PRIORITY_RANKS = {'高': 3, 'high': 3, '中': 2, 'medium': 2, '低': 1, 'low': 1}
+
+
+def get_prd_analysis_config() -> Dict[str, Any]:
+    """读取 settings.PRD_ANALYSIS_CONFIG，缺省项使用默认值"""
+    config = dict(DEFAULT_PRD_ANALYSIS_CONFIG)
+    config.update(getattr(settings, 'PRD_ANALYSIS_CONFIG', {}) or {})
+    return config
+
+
+def _dedup_key(title: Any) -> str:
+    # 忽略空白、标点与大小写差异
+    return re.sub(r'[\W_]+', '', str(title or '')).lower()
+
+
+def merge_test_points(section_points: List[Tuple[List[str], List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    """合并各段的测试点：同一标题路径下标题相同的测试点合并场景（场景按标题去重），再按文档顺序统一编号
+
+    不同章节中的同名测试点（如"参数校验"）描述的是不同功能，分别保留。
+    测试点编号为 TP-001 起，场景编号为 TS-<测试点序号>-001 起。
+
+    Args:
+        section_points: [(段落标题路径, 该段的测试点列表), ...]，按文档顺序排列
+    """
+    merged: Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]] = {}
+    for path, points in section_points:
+        for point in points:
+            if not isinstance(point, dict) or not _dedup_key(point.get('title')):
+                continue
+            scenarios = [
+                {
+                    'title': scenario.get('title', ''),
+                    'description': scenario.get('description', ''),
+                    'test_type': scenario.get('test_type', '功能测试'),
+                }
+                for scenario in (point.get('scenarios') or []) if isinstance(scenario, dict)
+            ]
+            key = (tuple(path), _dedup_key(point['title']))
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = {
+                    'title': point['title'],
+                    'description': point.get('description', ''),
+                    'priority': point.get('priority', '中'),
+                    'scenarios': [],
+                }
+                existing = merged[key]
+            elif _PRIORITY_RANKS.get(str(point.get('priority', '')).lower(), 0) > \
+                    _PRIORITY_RANKS.get(str(existing['priority']).lower(), 0):
+                existing['priority'] = point['priority']
+            scenario_keys = {_dedup_key(scenario['title']) for scenario in existing['scenarios']}
+            for scenario in scenarios:
+                scenario_key = _dedup_key(scenario['title'])
+                if scenario_key and scenario_key in scenario_keys:
+                    continue
+                scenario_keys.add(scenario_key)
+                existing['scenarios'].append(scenario)
+
+    test_points = []
+    for index, point in enumerate(merged.values(), start=1):
+        test_points.append({
+            'id': f'TP-{index:03d}',
+            'title': point['title'],
+            'description': point['description'],
+            'priority': point['priority'],
+            'scenarios': [
+                {'id': f'TS-{index:03d}-{scenario_index:03d}', **scenario}
+                for scenario_index, scenario in enumerate(point['scenarios'], start=1)
+            ],
+        })
+    return test_points
+
+
 class PrdAnalyserAgent:
     """PRD分析Agent，用于从PRD文档中提取测试点和测试场景"""
     
@@ -15,14 +105,20 @@ class PrdAnalyserAgent:
         self.llm_service = llm_service
         self.knowledge_service = knowledge_service
         self.prompt = PrdAnalyserPrompt()
+        # 提供商支持时使用原生结构化输出(JSON mode/schema), 否则沿用本地容错解析
+        self.llm, self.structured_mode = PRD_ANALYSIS_OUTPUT.bind(llm_service)
+        self.section_llm, self.section_structured_mode = PRD_SECTION_OUTPUT.bind(llm_service)
+        self.governor = get_provider_governor(llm_service)
         self.logger = get_logger(self.__class__.__name__)
     
-    def analyse(self, markdown_content: str) -> Dict[str, Any]:
+    def analyse(self, markdown_content: str, mode: Optional[str] = None) -> Dict[str, Any]:
         """
         分析PRD文档，提取测试点和测试场景
         
         Args:
             markdown_content: Markdown格式的PRD文档内容
+            mode: 'single' 整篇一次分析；'map_reduce' 按标题分段并发分析后合并；
+                  为 None 时文档估算 token 数超过 map_reduce_threshold_tokens 则分段分析
             
         Returns:
             包含测试点和测试场景的字典，格式为：
@@ -33,42 +129,113 @@ class PrdAnalyserAgent:
         """
         try:
             self.logger.info(f"开始分析PRD文档，文档长度：{len(markdown_content)} 字符")
+            config = get_prd_analysis_config()
+            if mode is None:
+                mode = 'map_reduce' if estimate_tokens(markdown_content) > config['map_reduce_threshold_tokens'] \
+                    else 'single'
+            if mode not in ANALYSIS_MODES:
+                raise ValueError(f"不支持的分析模式: {mode}")
+            if mode == 'map_reduce':
+                return self._analyse_map_reduce(markdown_content, config)
             
             # 使用prompt模板格式化消息
             messages = self.prompt.format_messages(markdown_content=markdown_content)
+            messages = PRD_ANALYSIS_OUTPUT.apply(messages, self.structured_mode)
             
             self.logger.info(f"构建后的PRD分析提示词: \n{'='*50}\n{messages}\n{'='*50}")
             
             # 调用LLM服务
-            response = self.llm_service.invoke(messages)
+            response = self.llm.invoke(messages)
             result = response.content
             
-            # 解析JSON结果
+            # 容错解析JSON结果（代码块、截断、单引号等）
             try:
-                if "```json" in result:
-                    json_str = result.split("```json")[1].split("```")[0].strip()
-                elif "```" in result:
-                    json_str = result.split("```")[1].split("```")[0].strip()
-                else:
-                    json_str = result
-                    
-                analysis_result = json.loads(json_str)
-                self.logger.info(f"成功解析PRD分析结果，包含测试点数量：{len(analysis_result.get('test_points', []))}")
-                
-                # 验证分析结果
-                self._validate_analysis_result(analysis_result)
-                
-                return analysis_result
-                
-            except json.JSONDecodeError as e:
+                analysis_result, truncated = PRD_ANALYSIS_OUTPUT.parse_with_status(result, self.structured_mode)
+            except JsonSalvageError as e:
                 self.logger.error(f"解析JSON结果失败: {str(e)}")
                 self.logger.error(f"原始响应: {result}")
                 raise ValueError(f"无法解析生成的分析结果: {str(e)}")
+            if not isinstance(analysis_result, dict):
+                analysis_result = {"test_points": analysis_result}
+            if truncated:
+                self.logger.warning("PRD分析结果不完整，已保留所有完整的测试点")
+            if (truncated or "summary" not in analysis_result) and isinstance(analysis_result.get("test_points"), list):
+                # 汇总信息位于输出末尾，截断时最先丢失，根据已解析的测试点在本地补齐
+                analysis_result["summary"] = self._build_summary(analysis_result["test_points"])
+            self.logger.info(f"成功解析PRD分析结果，包含测试点数量：{len(analysis_result.get('test_points', []))}")
+            
+            # 验证分析结果
+            self._validate_analysis_result(analysis_result)
+            
+            return analysis_result
                 
         except Exception as e:
             self.logger.error(f"PRD分析过程出错: {str(e)}", exc_info=True)
             raise Exception(f"PRD分析失败: {str(e)}")
     
+    def _analyse_map_reduce(self, markdown_content: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        """按标题层级切分文档，各段在提供商 governor 的并发限制下同时分析，再合并测试点并本地计算汇总"""
+        sections = split_markdown_sections(markdown_content, config['section_token_budget'])
+        if not sections:
+            raise ValueError("PRD文档内容为空")
+        if len(sections) > config['max_sections']:
+            raise ValueError(f"文档切分后共 {len(sections)} 段，超过上限 {config['max_sections']}，"
+                             f"请调大 section_token_budget 或拆分文档")
+        self.logger.info(f"分段分析PRD文档，共 {len(sections)} 段")
+
+        results = asyncio.run(self._analyse_sections(sections))
+        failed_sections = [
+            ' > '.join(section['path']) or '文档开头'
+            for section, points in zip(sections, results) if points is None
+        ]
+        if len(failed_sections) == len(sections):
+            raise ValueError("所有分段的分析均失败")
+        test_points = merge_test_points([
+            (section['path'], points) for section, points in zip(sections, results) if points is not None
+        ])
+        analysis_result = {"test_points": test_points, "summary": self._build_summary(test_points)}
+        if failed_sections:
+            self.logger.warning(f"以下分段分析失败，结果中不包含其测试点: {failed_sections}")
+            analysis_result["failed_sections"] = failed_sections
+        self.logger.info(f"分段分析完成，合并后测试点数量：{len(test_points)}")
+
+        self._validate_analysis_result(analysis_result)
+        return analysis_result
+
+    async def _analyse_sections(self, sections: List[Dict[str, Any]]) -> List[Optional[List[Dict[str, Any]]]]:
+        return await asyncio.gather(*(self._analyse_section(section) for section in sections))
+
+    async def _analyse_section(self, section: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """分析单个分段，返回测试点列表；失败时返回 None，不影响其他分段"""
+        section_path = ' > '.join(section['path']) or '文档开头'
+        messages = self.prompt.format_section_messages(section_path, section['content'])
+        messages = PRD_SECTION_OUTPUT.apply(messages, self.section_structured_mode)
+        try:
+            async with self.governor.aacquire(estimate_tokens(messages)):
+                response = await self.section_llm.ainvoke(messages)
+            test_points, truncated = PRD_SECTION_OUTPUT.parse_with_status(
+                response.content, self.section_structured_mode
+            )
+        except Exception as e:
+            self.logger.error(f"分析分段 [{section_path}] 失败: {str(e)}")
+            return None
+        if truncated:
+            self.logger.warning(f"分段 [{section_path}] 的分析结果不完整，已保留所有完整的测试点")
+        return [point for point in test_points if isinstance(point, dict)]
+
+    def _build_summary(self, test_points: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """根据测试点列表计算汇总信息"""
+        priorities = [str(point.get("priority", "")).lower() for point in test_points if isinstance(point, dict)]
+        return {
+            "total_test_points": len(test_points),
+            "total_test_scenarios": sum(
+                len(point.get("scenarios") or []) for point in test_points if isinstance(point, dict)
+            ),
+            "high_priority_points": sum(p in ("high", "高") for p in priorities),
+            "medium_priority_points": sum(p in ("medium", "中") for p in priorities),
+            "low_priority_points": sum(p in ("low", "低") for p in priorities),
+        }
+    
     def _validate_analysis_result(self, result: Dict[str, Any]) -> bool:
         """
         验证分析结果是否符合预期格式
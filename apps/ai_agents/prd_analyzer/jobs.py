@@ -0,0 +1,23 @@
+"""
+PRD分析的后台任务
+
+prd_analyzer 视图请求携带 async 参数时，文档转换完成后写入任务队列并立即返回 job_id，
+分析结果写入 Job.result。长文档按标题分段并发分析（见 PrdAnalyserAgent.analyse 的 mode 参数）。
+"""
+
+from typing import Any, Dict
+
+from apps.utils.job_queue import register_job
+
+
+@register_job('prd_analysis')
+def prd_analysis_job(payload: Dict[str, Any], job) -> Dict[str, Any]:
+    from apps.llm import LLMServiceFactory
+    from apps.llm.utils import get_agent_llm_configs
+    from .analyser import PrdAnalyserAgent
+
+    default_provider, providers = get_agent_llm_configs("prd_analyzer")
+    llm_provider = payload.get('llm_provider') or default_provider
+    llm_service = LLMServiceFactory.create(provider=llm_provider, **providers.get(llm_provider, {}))
+    analyser = PrdAnalyserAgent(llm_service=llm_service)
+    return {'result': analyser.analyse(payload['prd_content'], mode=payload.get('mode'))}
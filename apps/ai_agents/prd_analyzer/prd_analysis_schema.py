@@ -0,0 +1,46 @@
+"""
+PRD 分析结果的 Pydantic 模型定义
+用于提供商原生结构化输出（JSON schema）约束 LLM 输出的测试点/测试场景结构
+"""
+from typing import List
+from pydantic import BaseModel
+
+from apps.llm.structured import StructuredOutput
+
+
+class TestScenario(BaseModel):
+    """测试场景"""
+    id: str
+    title: str
+    description: str
+    test_type: str  # 功能测试/性能测试/兼容性测试/安全性测试
+
+
+class TestPoint(BaseModel):
+    """测试点，与测试场景为一对多关系"""
+    id: str
+    title: str
+    description: str
+    priority: str  # 高/中/低
+    scenarios: List[TestScenario]
+
+
+class AnalysisSummary(BaseModel):
+    """汇总信息"""
+    total_test_points: int
+    total_test_scenarios: int
+    high_priority_points: int
+    medium_priority_points: int
+    low_priority_points: int
+
+
+class PrdAnalysisResult(BaseModel):
+    """PRD 分析结果（LLM 输出的顶层对象）"""
+    test_points: List[TestPoint]
+    summary: AnalysisSummary
+
+
+PRD_ANALYSIS_OUTPUT = StructuredOutput('prd_analysis', PrdAnalysisResult)
+
+# 长文档分段分析时每段只输出测试点列表，汇总信息在合并后本地计算
+PRD_SECTION_OUTPUT = StructuredOutput('prd_section_analysis', TestPoint, wrapper_key='test_points')
@@ -39,6 +39,16 @@ class PrdAnalyserPromptManager(BasePromptManager):
             human_message_prompt
         ])
 
+    def get_section_prompt(self) -> ChatPromptTemplate:
+        """获取长文档分段分析的提示词模板，系统消息与整篇分析相同"""
+        config = self.config
+        system_template_formatted = config['system_template'].format(
+            role=config['role'],
+            capabilities=config['capabilities'],
+            analysis_focus=', '.join(config['analysis_focus'])
+        )
+        return self._create_chat_prompt_template(system_template_formatted, config['section_human_template'])
+
 
 class PrdAnalyserPrompt:
     """PRD分析提示词"""
@@ -49,6 +59,7 @@ class PrdAnalyserPrompt:
         # 初始化具体的提示词模板管理器
         self.prompt_manager = PrdAnalyserPromptManager(str(config_path))
         self.prompt_template = self.prompt_manager.get_prd_analyser_prompt()
+        self.section_prompt_template = self.prompt_manager.get_section_prompt()
     
     def format_messages(self, markdown_content: str) -> list:
         """格式化消息
@@ -61,4 +72,16 @@ class PrdAnalyserPrompt:
         """
         return self.prompt_template.format_messages(
             markdown_content=markdown_content
-        )
\ No newline at end of file
+        )
+
+    def format_section_messages(self, section_path: str, markdown_content: str) -> list:
+        """格式化分段分析的消息
+
+        Args:
+            section_path: 片段所属的章节路径，如 "3 订单管理 > 3.2 退款"
+            markdown_content: 片段的Markdown内容
+        """
+        return self.section_prompt_template.format_messages(
+            section_path=section_path,
+            markdown_content=markdown_content
+        )
@@ -0,0 +1,124 @@
+"""
+按标题层级切分 Markdown PRD
+
+将文档解析为标题树（# ~ ######，忽略代码块内的 #），自顶向下切分：
+- 某个标题连同其全部子标题的内容不超过 token_budget 时作为一段
+- 超出时拆为"标题下的正文"和各子标题，再把相邻的小段合并到预算内，尽量保持段落完整
+- 没有子标题且仍超出预算的正文依次按空行分隔的段落、行、句子切分，每段保留所属标题行
+
+每段附带所属的标题路径（如 ["3 订单管理", "3.2 退款"]），供分段分析时提供上下文。
+"""
+
+import re
+from typing import Any, Dict, List
+
+from apps.llm.tokens import estimate_tokens
+
+_HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+_FENCE_PATTERN = re.compile(r'^\s*(```|~~~)')
+_SENTENCE_END_PATTERN = re.compile(r'(?<=[。！？；!?;])')
+
+
+def _parse_heading_tree(markdown_content: str) -> Dict[str, Any]:
+    root = {'level': 0, 'title': '', 'lines': [], 'children': []}
+    stack = [root]
+    in_fence = False
+    for line in markdown_content.splitlines():
+        if _FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING_PATTERN.match(line)
+        if not match:
+            stack[-1]['lines'].append(line)
+            continue
+        level = len(match.group(1))
+        while stack[-1]['level'] >= level:
+            stack.pop()
+        node = {'level': level, 'title': match.group(2), 'lines': [line], 'children': []}
+        stack[-1]['children'].append(node)
+        stack.append(node)
+    return root
+
+
+def _node_text(node: Dict[str, Any]) -> str:
+    parts = ['\n'.join(node['lines'])]
+    parts.extend(_node_text(child) for child in node['children'])
+    return '\n'.join(part for part in parts if part.strip())
+
+
+def _split_text(text: str, token_budget: int) -> List[str]:
+    """将没有子标题的超长正文依次按段落、行、句子切分"""
+    if estimate_tokens(text) <= token_budget:
+        return [text]
+    paragraphs = [p for p in re.split(r'\n\s*\n', text) if p.strip()]
+    separator = '\n\n'
+    if len(paragraphs) <= 1:
+        paragraphs = [line for line in text.splitlines() if line.strip()]
+        separator = '\n'
+    if len(paragraphs) <= 1:
+        paragraphs = [sentence for sentence in _SENTENCE_END_PATTERN.split(text) if sentence]
+        separator = ''
+    if len(paragraphs) <= 1:
+        # 单句超出预算时不再切分，原样作为一段
+        return [text]
+    pieces = []
+    for paragraph in paragraphs:
+        pieces.extend(_split_text(paragraph, token_budget))
+    return _merge_texts(pieces, token_budget, separator)
+
+
+def _merge_texts(pieces: List[str], token_budget: int, separator: str) -> List[str]:
+    merged, current, current_tokens = [], [], 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece)
+        if current and current_tokens + tokens > token_budget:
+            merged.append(separator.join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        merged.append(separator.join(current))
+    return merged
+
+
+def _split_node(node: Dict[str, Any], path: List[str], token_budget: int) -> List[Dict[str, Any]]:
+    text = _node_text(node)
+    if not text.strip():
+        return []
+    # 标题路径包含本节自身的标题
+    own_path = path + [node['title']] if node['title'] else path
+    if estimate_tokens(text) <= token_budget:
+        return [{'path': own_path, 'content': text}]
+
+    pieces = []
+    # 正文拆成多段时每段都保留标题行，合并相邻段后仍能区分各自所属的标题
+    heading = node['lines'][0] + '\n' if node['title'] else ''
+    body = '\n'.join(node['lines'][1:] if node['title'] else node['lines'])
+    if body.strip():
+        body_budget = max(1, token_budget - estimate_tokens(heading))
+        pieces.extend({'path': own_path, 'content': heading + part} for part in _split_text(body, body_budget))
+    for child in node['children']:
+        pieces.extend(_split_node(child, own_path, token_budget))
+
+    # 相邻的小段合并到预算内；合并后的标题路径取公共前缀
+    merged: List[Dict[str, Any]] = []
+    for piece in pieces:
+        if merged and estimate_tokens(merged[-1]['content']) + estimate_tokens(piece['content']) <= token_budget:
+            previous = merged[-1]
+            common = []
+            for a, b in zip(previous['path'], piece['path']):
+                if a != b:
+                    break
+                common.append(a)
+            merged[-1] = {'path': common, 'content': previous['content'] + '\n\n' + piece['content']}
+        else:
+            merged.append(piece)
+    return merged
+
+
+def split_markdown_sections(markdown_content: str, token_budget: int) -> List[Dict[str, Any]]:
+    """按标题层级将 Markdown 切分为不超过 token_budget 的若干段
+
+    Returns:
+        [{'path': 标题路径列表, 'content': 段落 Markdown 原文}, ...]，按文档顺序排列
+    """
+    return _split_node(_parse_heading_tree(markdown_content or ''), [], max(1, int(token_budget)))
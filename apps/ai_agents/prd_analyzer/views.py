@@ -7,6 +7,7 @@ from apps.llm import LLMServiceFactory
 from django.shortcuts import render
 from apps.utils.file_transfer import word_to_markdown
 from apps.llm.utils import get_agent_llm_configs
+from apps.utils.job_queue import enqueue_job
 
 
 
@@ -66,9 +67,20 @@ def prd_analyzer(request):
             with open(file_path.replace('.docx', '.md'), 'r', encoding='utf-8') as f:
                 prd_content = f.read()
             logger.info(f"PRD内容: {prd_content}")
+            # 分析模式: single 整篇分析, map_reduce 分段并发分析, 不传时按文档长度自动选择
+            analysis_mode = request.POST.get('mode') or None
+            # 异步模式: 写入后台任务后立即返回, 前端通过任务状态接口查询结果
+            if request.POST.get('async'):
+                job = enqueue_job('prd_analysis', {'prd_content': prd_content, 'mode': analysis_mode},
+                                  task_id=request.POST.get('task_id'))
+                return JsonResponse({
+                    'success': True,
+                    'job_id': job.id,
+                    'task_id': job.task_id
+                })
             #调用PRD分析器
             analyser = PrdAnalyserAgent(llm_service=llm_service)
-            result = analyser.analyse(prd_content)
+            result = analyser.analyse(prd_content, mode=analysis_mode)
             return JsonResponse({
                 'success': True,
                 'result': result
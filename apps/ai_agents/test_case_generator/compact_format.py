@@ -0,0 +1,54 @@
+"""
+测试用例紧凑输出协议
+
+与接口用例的"最小输出"协议类似：LLM 不再输出带重复键名、步骤编号前缀的冗长 JSON，
+而是每条用例只输出一个定长位置数组：
+
+    [["用例描述", ["步骤", "步骤"], ["预期结果", "预期结果"]], ...]
+
+本地再展开为原有的 {"description", "test_steps", "expected_results"} 字典，
+并补上 "1. "、"2. " 编号，前端与保存逻辑无需任何改动。
+"""
+
+import re
+from typing import Any, List
+
+# 紧凑数组中各字段的位置
+DESCRIPTION_INDEX = 0
+TEST_STEPS_INDEX = 1
+EXPECTED_RESULTS_INDEX = 2
+
+# LLM 偶尔仍会自带编号，展开时去掉后统一重新编号
+_NUMBER_PREFIX = re.compile(r'^\s*\d+\s*[.、．)）]\s*')
+
+
+def _numbered(items: Any) -> Any:
+    """为步骤/结果列表统一加上 "1. " 形式的编号；不是列表时原样返回，交由校验逻辑处理"""
+    if isinstance(items, str):
+        items = [items]
+    if not isinstance(items, list):
+        return items
+    return [f"{i}. {_NUMBER_PREFIX.sub('', str(item)).strip()}" for i, item in enumerate(items, 1)]
+
+
+def expand_compact_case(item: Any) -> Any:
+    """将单条紧凑用例展开为完整字典；LLM 已按完整格式输出（字典）时原样返回"""
+    if isinstance(item, dict):
+        return item
+    if not isinstance(item, list) or len(item) < 3:
+        return item
+    return {
+        "description": str(item[DESCRIPTION_INDEX]),
+        "test_steps": _numbered(item[TEST_STEPS_INDEX]),
+        "expected_results": _numbered(item[EXPECTED_RESULTS_INDEX]),
+    }
+
+
+def expand_compact_cases(items: Any) -> List[Any]:
+    """展开紧凑用例列表；无法展开的条目原样保留，由 _validate_test_cases 跳过"""
+    if not isinstance(items, list):
+        items = [items]
+    # 只有一条用例时 LLM 可能省略外层数组
+    if len(items) >= 3 and isinstance(items[DESCRIPTION_INDEX], str) and isinstance(items[TEST_STEPS_INDEX], list):
+        items = [items]
+    return [expand_compact_case(item) for item in items]
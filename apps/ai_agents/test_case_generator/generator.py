@@ -1,11 +1,31 @@
 from typing import Dict, Any, List, Optional
-import json
+import asyncio
 # from langchain_core.messages import SystemMessage, HumanMessage
 from apps.llm.base import BaseLLMService
 from apps.knowledge.service import KnowledgeService
 from .prompts import TestCaseGeneratorPrompt
+from .planner import plan_shards
+from .compact_format import expand_compact_cases
+from .test_case_schema import get_test_case_output
 from apps.utils.logger_manager import get_logger
 import re
+from django.conf import settings
+
+DEFAULT_GENERATION_CONFIG = {
+    'max_cases_per_shard': 15,
+    'max_concurrent_shards': 4,
+    'dedup_threshold': 0.95,
+    'output_format': 'compact',
+}
+
+
+def get_generation_config() -> Dict[str, Any]:
+    """读取 settings.TEST_CASE_GENERATION_CONFIG，缺省项使用默认值"""
+    config = dict(DEFAULT_GENERATION_CONFIG)
+    config.update(getattr(settings, 'TEST_CASE_GENERATION_CONFIG', {}) or {})
+    return config
+
+
 class TestCaseGeneratorAgent:
     """测试用例生成Agent"""
     
@@ -15,58 +35,129 @@ class TestCaseGeneratorAgent:
         self.case_categories = case_categories
         self.case_count = case_count
         self.knowledge_service = knowledge_service
-        self.prompt = TestCaseGeneratorPrompt()
+        # 输出格式: compact 时LLM输出紧凑位置数组, 本地展开为完整字段
+        self.output_format = get_generation_config()['output_format']
+        self.prompt = TestCaseGeneratorPrompt(self.output_format)
+        # 提供商支持时使用原生结构化输出(JSON mode/schema), 否则沿用本地容错解析
+        self.structured_output = get_test_case_output(self.output_format)
+        self.llm, self.structured_mode = self.structured_output.bind(llm_service)
         self.logger = get_logger(self.__class__.__name__)  # 添加logger
     
 
     async def async_generate(self, input_text: str, input_type: str = "requirement") -> List[Dict[str, Any]]:
-        """异步方式生成测试用例"""
+        """异步方式生成测试用例
+
+        用例数超过 TEST_CASE_GENERATION_CONFIG['max_cases_per_shard'] 时按设计方法/用例类型/数量拆成多个分片，
+        并发调用LLM后在本地合并去重，避免单次输出超过 max_tokens 被截断。
+        """
         self.logger.info(f"开始生成测试用例-异步方式,进入生成测试用例的TestCaseGeneratorAgent")
         # 确定输入类型描述
         input_type_desc = "需求描述" if input_type == "requirement" else "代码片段"
+        config = get_generation_config()
         
-        # 获取知识上下文
-        knowledge_context = self._get_knowledge_context(input_text)
-        self.logger.info(f"获取到知识库上下文: \n{'='*50}\n{knowledge_context}\n{'='*50}")
+        # 知识检索在线程池中执行，与下面的提示词构建并行
+        knowledge_task = asyncio.create_task(self._aget_knowledge_context(input_text))
         
-        # 处理设计方法和测试类型
-        case_design_methods = ",".join(self.case_design_methods) if self.case_design_methods else ""
-        case_categories = ",".join(self.case_categories) if self.case_categories else ""
-        
-        # 使用新的 format_messages 方法获取消息列表
-        messages = self.prompt.format_messages(
-            requirements=input_text,
-            case_design_methods=case_design_methods,
-            case_categories=case_categories,
-            case_count=self.case_count,
-            knowledge_context=knowledge_context
+        # 规划分片，并预先填充各分片除知识上下文外的提示词变量
+        shards = plan_shards(
+            self.case_design_methods,
+            self.case_categories,
+            self.case_count,
+            max_cases_per_shard=config['max_cases_per_shard'],
         )
-        self.logger.info(f"构建后大模型提示词+用户需求消息: \n{'='*50}\n{messages}\n{'='*50}")
+        partial_prompts = [
+            self.prompt.prepare(
+                requirements=input_text,
+                case_design_methods=",".join(shard['case_design_methods']),
+                case_categories=",".join(shard['case_categories']),
+                case_count=shard['case_count'],
+                shard_note=shard['shard_note'],
+            )
+            for shard in shards
+        ]
+        
+        knowledge_context = await knowledge_task
+        self.logger.info(f"获取到知识库上下文: \n{'='*50}\n{knowledge_context}\n{'='*50}")
+
+        if len(shards) == 1:
+            messages = self.prompt.format_with_knowledge(partial_prompts[0], knowledge_context)
+            valid_test_cases = await self._agenerate_shard(messages, self.case_count)
+        else:
+            self.logger.info(f"用例数 {self.case_count} 拆分为 {len(shards)} 个分片并发生成: "
+                             f"{[shard['case_count'] for shard in shards]}")
+            semaphore = asyncio.Semaphore(config['max_concurrent_shards'])
+
+            async def run_shard(index: int, partial_prompt) -> List[Dict[str, Any]]:
+                async with semaphore:
+                    messages = self.prompt.format_with_knowledge(partial_prompt, knowledge_context)
+                    return await self._agenerate_shard(messages, shards[index]['case_count'], shard_index=index)
+
+            results = await asyncio.gather(
+                *(run_shard(i, partial_prompt) for i, partial_prompt in enumerate(partial_prompts)),
+                return_exceptions=True,
+            )
+            merged: List[Dict[str, Any]] = []
+            errors = []
+            for index, result in enumerate(results):
+                if isinstance(result, Exception):
+                    self.logger.error(f"分片 #{index + 1} 生成失败: {str(result)}")
+                    errors.append(str(result))
+                else:
+                    merged.extend(result)
+            if not merged:
+                raise ValueError(f"所有分片均生成失败: {errors[0] if errors else ''}")
+            valid_test_cases = await self._dedupe_test_cases(merged, config['dedup_threshold'])
+
+        if len(valid_test_cases) > self.case_count:
+            self.logger.warning(f"LLM 超量生成：期望 {self.case_count} 条，但拿到 {len(valid_test_cases)} 条，自动裁剪。")
+            valid_test_cases = valid_test_cases[: self.case_count]
+        return valid_test_cases
+
+    async def _agenerate_shard(self, messages: list, case_count: int, shard_index: Optional[int] = None) -> List[Dict[str, Any]]:
+        """调用LLM生成一个分片的用例并校验"""
+        shard_desc = f"分片 #{shard_index + 1} " if shard_index is not None else ""
+        messages = self.structured_output.apply(messages, self.structured_mode)
+        self.logger.info(f"{shard_desc}构建后大模型提示词+用户需求消息: \n{'='*50}\n{messages}\n{'='*50}")
         
         # 调用LLM服务
+        result = ""
         try:
-            response = await self.llm_service.ainvoke(messages)
+            response = await self.llm.ainvoke(messages)
             result = response.content
-            self.logger.info(f"LLM原始响应: \n{'='*50}\n{result}\n{'='*50}")
+            self.logger.info(f"{shard_desc}LLM原始响应: \n{'='*50}\n{result}\n{'='*50}")
             
-            # 尝试提取JSON部分
-            json_str = self._extract_json_from_response(result)
-            if not json_str:
-                raise ValueError("无法从响应中提取有效的JSON数据")
-                
-            # 尝试解析JSON
-            test_cases = json.loads(json_str)
-            self.logger.info(f"_validate_test_cases处理前的用例个数: {len(test_cases)}")
+            # 容错解析JSON（代码块、截断、单引号等），截断时保留所有完整用例
+            test_cases = self._parse_test_cases(result)
+            self.logger.info(f"{shard_desc}_validate_test_cases处理前的用例个数: {len(test_cases)}")
             
             valid_test_cases = self._validate_test_cases(test_cases)
-            if len(valid_test_cases) > self.case_count:
-                self.logger.warning(f"LLM 超量生成：期望 {self.case_count} 条，但拿到 {len(valid_test_cases)} 条，自动裁剪。")
-                valid_test_cases = valid_test_cases[: self.case_count]
-            return valid_test_cases
+            return valid_test_cases[: case_count]
             
         except Exception as e:
             raise ValueError(f"无法解析生成的测试用例: {str(e)}\n原始响应: {result}")
 
+    async def _dedupe_test_cases(self, test_cases: List[Dict[str, Any]], threshold: float) -> List[Dict[str, Any]]:
+        """合并分片结果后去除近似重复用例；相似度服务不可用时退化为按文本精确去重"""
+        texts = [
+            "\n".join([case['description']] + [str(step) for step in case['test_steps']]
+                      + [str(result) for result in case['expected_results']])
+            for case in test_cases
+        ]
+        try:
+            keep = await self.knowledge_service.adedupe(texts, threshold)
+        except Exception as e:
+            self.logger.warning(f"近似去重失败, 改为精确去重: {str(e)}")
+            seen = set()
+            keep = []
+            for index, text in enumerate(texts):
+                normalized = re.sub(r'\s+', '', text)
+                if normalized not in seen:
+                    seen.add(normalized)
+                    keep.append(index)
+        if len(keep) < len(test_cases):
+            self.logger.info(f"分片合并去重: {len(test_cases)} -> {len(keep)} 条")
+        return [test_cases[index] for index in keep]
+
 
     
     def generate(self, input_text: str, input_type: str = "requirement") -> List[Dict[str, Any]]:
@@ -91,21 +182,17 @@ class TestCaseGeneratorAgent:
             case_count=self.case_count,
             knowledge_context=knowledge_context
         )
+        messages = self.structured_output.apply(messages, self.structured_mode)
         self.logger.info(f"构建后大模型提示词+用户需求消息: \n{'='*50}\n{messages}\n{'='*50}")
         
         # 调用LLM服务
         try:
-            response = self.llm_service.invoke(messages)
+            response = self.llm.invoke(messages)
             result = response.content
             self.logger.info(f"LLM原始响应: \n{'='*50}\n{result}\n{'='*50}")
             
-            # 尝试提取JSON部分
-            json_str = self._extract_json_from_response(result)
-            if not json_str:
-                raise ValueError("无法从响应中提取有效的JSON数据")
-                
-            # 尝试解析JSON
-            test_cases = json.loads(json_str)
+            # 容错解析JSON（代码块、截断、单引号等），截断时保留所有完整用例
+            test_cases = self._parse_test_cases(result)
             self.logger.info(f"_validate_test_cases处理前的用例个数: {len(test_cases)}")
             
             valid_test_cases = self._validate_test_cases(test_cases)
@@ -126,6 +213,18 @@ class TestCaseGeneratorAgent:
             self.logger.warning(f"获取知识上下文失败: {str(e)}")
         return ""
     
+    async def _aget_knowledge_context(self, input_text: str) -> str:
+        """异步获取相关知识上下文，检索失败或超时时返回空字符串"""
+        try:
+            knowledge = await self.knowledge_service.asearch_relevant_knowledge(input_text)
+            if knowledge:
+                return f"{knowledge}"
+        except asyncio.TimeoutError:
+            self.logger.warning("获取知识上下文超时, 不使用知识库内容")
+        except Exception as e:
+            self.logger.warning(f"获取知识上下文失败: {str(e)}")
+        return ""
+    
     def _validate_test_cases(self, test_cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """验证并修复测试用例格式
         
@@ -194,28 +293,21 @@ class TestCaseGeneratorAgent:
         
         return valid_test_cases
             
-    def _extract_json_from_response(self, response: str) -> str:
-        """从响应中提取JSON部分并进行基础修复
+    def _parse_test_cases(self, response: str) -> List[Any]:
+        """从LLM响应中解析测试用例列表（拆包结构化输出的 test_cases 字段），紧凑格式时展开为完整字典
         
         Args:
             response: 原始响应字符串
             
         Returns:
-            修复后的JSON字符串
+            用例列表（尚未校验）
         """
-        # 使用正则表达式提取JSON字符串
-        result = ""
-        right_format_pattern = r'^\[([\s\S]*)\]$'
-        match = re.search(right_format_pattern, response)
-        if match:
-            result = match.group(0)  # 使用group(0)返回完整匹配，包含方括号
-        else:
-            #从字符串中找到最后一个出现},的位置，然后取},前面的内容,并补全]和json结束标记```
-            last_comma_index = response.rfind('},')
-            if last_comma_index != -1:
-                result = response[:last_comma_index+1] + ']'
-        # self.logger.info(f"_extract_json_from_response函数处理结果: \n{'='*50}\n{result}\n{'='*50}")    
-        return result
+        test_cases, truncated = self.structured_output.parse_with_status(response, self.structured_mode)
+        if truncated:
+            self.logger.warning(f"LLM响应不完整，已保留 {len(test_cases)} 条完整用例")
+        if self.output_format == "compact":
+            test_cases = expand_compact_cases(test_cases)
+        return test_cases
         
 
             
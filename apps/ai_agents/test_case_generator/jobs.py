@@ -0,0 +1,41 @@
+"""
+测试用例生成的后台任务
+
+generate 视图请求携带 async=true 时写入任务队列后立即返回 job_id，
+任务完成后结果写入 Job.result 并同步更新生成结果缓存。
+"""
+
+import asyncio
+from typing import Any, Dict
+
+from apps.utils.job_queue import register_job
+
+
+@register_job('test_case_generation')
+def test_case_generation_job(payload: Dict[str, Any], job) -> Dict[str, Any]:
+    from apps.knowledge.service import get_knowledgeService_instance
+    from apps.llm import LLMServiceFactory
+    from apps.llm.utils import get_agent_llm_configs
+    from .generator import TestCaseGeneratorAgent
+    from .result_cache import asave_result
+
+    _, providers = get_agent_llm_configs("test_case_generator")
+    llm_provider = payload['llm_provider']
+    llm_service = LLMServiceFactory.create(llm_provider, **providers.get(llm_provider, {}))
+    generator_agent = TestCaseGeneratorAgent(
+        llm_service=llm_service,
+        knowledge_service=get_knowledgeService_instance(),
+        case_design_methods=payload['case_design_methods'],
+        case_categories=payload['case_categories'],
+        case_count=payload['case_count'],
+    )
+
+    async def run() -> list:
+        test_cases = await generator_agent.async_generate(payload['requirements'], input_type="requirement")
+        await asave_result(payload['cache_key'], payload['requirements'], payload['case_design_methods'],
+                           payload['case_categories'], payload['case_count'], llm_provider,
+                           payload.get('llm_model', ''), test_cases)
+        return test_cases
+
+    test_cases = asyncio.run(run())
+    return {'test_cases': test_cases}
@@ -0,0 +1,87 @@
+"""
+测试用例生成分片规划
+
+一次请求生成大量用例时，单次 LLM 调用会受 max_tokens 限制被截断，尾部用例丢失。
+规划器把请求拆成多个分片，每个分片的用例数不超过 max_cases_per_shard：
+1. 优先按用例设计方法拆分（每个分片负责一部分设计方法）
+2. 设计方法不足时按用例类型拆分
+3. 单个分组用例数仍超限时按数量拆分，并给出批次提示以减少分片间重复
+各分片并发调用 LLM，结果在本地合并去重。
+"""
+
+import math
+from typing import Any, Dict, List
+
+
+def _split_evenly(items: List[str], groups: int) -> List[List[str]]:
+    """将 items 轮询分成 groups 组"""
+    buckets: List[List[str]] = [[] for _ in range(groups)]
+    for i, item in enumerate(items):
+        buckets[i % groups].append(item)
+    return [bucket for bucket in buckets if bucket]
+
+
+def _distribute(total: int, weights: List[int]) -> List[int]:
+    """按权重把 total 分配到各组（最大余数法），总和保持不变"""
+    weight_sum = sum(weights)
+    counts = [total * w // weight_sum for w in weights]
+    remainders = sorted(range(len(weights)), key=lambda i: (total * weights[i]) % weight_sum, reverse=True)
+    for idx in remainders[:total - sum(counts)]:
+        counts[idx] += 1
+    return counts
+
+
+def plan_shards(case_design_methods: List[str],
+                case_categories: List[str],
+                case_count: int,
+                max_cases_per_shard: int = 15) -> List[Dict[str, Any]]:
+    """规划生成分片
+
+    Args:
+        case_design_methods: 用户选择的用例设计方法
+        case_categories: 用户选择的用例类型
+        case_count: 需要生成的用例总数
+        max_cases_per_shard: 每个分片最多生成的用例数
+
+    Returns:
+        分片列表，每项包含 case_design_methods、case_categories、case_count、shard_note
+    """
+    case_design_methods = list(case_design_methods or [])
+    case_categories = list(case_categories or [])
+    if case_count <= max_cases_per_shard:
+        return [{
+            'case_design_methods': case_design_methods,
+            'case_categories': case_categories,
+            'case_count': case_count,
+            'shard_note': '',
+        }]
+
+    shard_total = math.ceil(case_count / max_cases_per_shard)
+    if len(case_design_methods) > 1:
+        groups = [
+            {'case_design_methods': methods, 'case_categories': case_categories}
+            for methods in _split_evenly(case_design_methods, min(shard_total, len(case_design_methods)))
+        ]
+        weights = [len(group['case_design_methods']) for group in groups]
+    elif len(case_categories) > 1:
+        groups = [
+            {'case_design_methods': case_design_methods, 'case_categories': categories}
+            for categories in _split_evenly(case_categories, min(shard_total, len(case_categories)))
+        ]
+        weights = [len(group['case_categories']) for group in groups]
+    else:
+        groups = [{'case_design_methods': case_design_methods, 'case_categories': case_categories}]
+        weights = [1]
+
+    shards: List[Dict[str, Any]] = []
+    for group, group_count in zip(groups, _distribute(case_count, weights)):
+        parts = math.ceil(group_count / max_cases_per_shard)
+        for part, part_count in enumerate(_distribute(group_count, [1] * parts)):
+            shard_note = ''
+            if parts > 1:
+                shard_note = (
+                    f"本次为同一需求的第{part + 1}批(共{parts}批)用例，"
+                    f"请侧重与其他批次不同的测试场景和测试数据，避免生成重复用例。"
+                )
+            shards.append(dict(group, case_count=part_count, shard_note=shard_note))
+    return shards
@@ -15,8 +15,12 @@ class TestCaseGeneratorPromptManager(BasePromptManager):
         with open(config_path, "r", encoding="utf-8") as f:
             self.config = yaml.safe_load(f)
     
-    def get_test_case_generator_prompt(self) -> ChatPromptTemplate:
-        """获取测试用例生成的提示词模板"""
+    def get_test_case_generator_prompt(self, output_format: str = "verbose") -> ChatPromptTemplate:
+        """获取测试用例生成的提示词模板
+
+        Args:
+            output_format: verbose 为完整JSON字典格式，compact 为紧凑位置数组格式
+        """
         config = self.config
         
         # 准备系统消息的变量并格式化模板
@@ -32,7 +36,8 @@ class TestCaseGeneratorPromptManager(BasePromptManager):
         system_message_prompt = SystemMessagePromptTemplate.from_template(system_template_formatted)
         
         # 创建人类消息模板
-        human_message_prompt = HumanMessagePromptTemplate.from_template(config['human_template'])
+        human_template = config['compact_human_template'] if output_format == "compact" else config['human_template']
+        human_message_prompt = HumanMessagePromptTemplate.from_template(human_template)
         
         # 组合成聊天提示词模板
         return ChatPromptTemplate.from_messages([
@@ -44,12 +49,13 @@ class TestCaseGeneratorPromptManager(BasePromptManager):
 class TestCaseGeneratorPrompt:
     """测试用例生成提示词"""
     
-    def __init__(self):
+    def __init__(self, output_format: str = "verbose"):
         # 获取当前文件所在目录的configs子目录下的配置文件
         config_path = Path(__file__).parent / "configs" / "prompt_config.yaml"
         # 初始化具体的提示词模板管理器
         self.prompt_manager = TestCaseGeneratorPromptManager(str(config_path))
-        self.prompt_template = self.prompt_manager.get_test_case_generator_prompt()
+        self.output_format = output_format
+        self.prompt_template = self.prompt_manager.get_test_case_generator_prompt(output_format)
     
     def format_messages(self, requirements: str, case_design_methods: str = "", 
                        case_categories: str = "", knowledge_context: str = "", case_count: int = 10) -> list:
@@ -64,24 +70,46 @@ class TestCaseGeneratorPrompt:
         Returns:
             格式化后的消息列表
         """
+        partial_prompt = self.prepare(
+            requirements=requirements,
+            case_design_methods=case_design_methods,
+            case_categories=case_categories,
+            case_count=case_count
+        )
+        return self.format_with_knowledge(partial_prompt, knowledge_context)
+
+    def prepare(self, requirements: str, case_design_methods: str = "",
+                case_categories: str = "", case_count: int = 10, shard_note: str = "") -> ChatPromptTemplate:
+        """预先填充除知识上下文外的全部变量，可在等待知识检索期间完成
+
+        Args:
+            shard_note: 分片生成时的批次提示，单次生成时为空
+
+        Returns:
+            只剩 knowledge_context 变量的提示词模板
+        """
         # 处理空值情况
         if not case_design_methods:
             case_design_methods = "所有适用的测试用例设计方法"
         
         if not case_categories:
             case_categories = "所有适用的测试类型"
-            
+
+        return self.prompt_template.partial(
+            requirements=requirements,
+            case_design_methods=case_design_methods,
+            case_categories=case_categories,
+            case_count=str(case_count),
+            shard_note=shard_note
+        )
+
+    @staticmethod
+    def format_with_knowledge(partial_prompt: ChatPromptTemplate, knowledge_context: str = "") -> list:
+        """填充知识上下文，得到最终消息列表"""
         # 格式化知识上下文提示
         knowledge_prompt = (
             f"参考以下知识库内容：\n{knowledge_context}"
             if knowledge_context
             else "根据你的专业知识"
         )
-        
-        return self.prompt_template.format_messages(
-            requirements=requirements,
-            case_design_methods=case_design_methods,
-            case_categories=case_categories,
-            case_count=case_count,
-            knowledge_context=knowledge_prompt
-        )
\ No newline at end of file
+        return partial_prompt.format_messages(knowledge_context=knowledge_prompt)
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""
+测试用例生成结果缓存（需求级记忆化）
+
+同一需求在迭代中经常被重复生成。以需求文本、设计方法、用例类型、用例条数、提供商/模型、输出格式
+计算缓存键，生成成功后把结果写入 GenerationResultCache；再次收到相同请求时直接返回已保存的结果。
+设计方法和用例类型与选择顺序无关，需求文本只去掉首尾空白，内容有任何改动都会重新生成。
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from apps.core.models import GenerationResultCache
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_RESULT_CACHE_CONFIG = {
+    'enabled': True,
+    'ttl_days': 30,  # 超过该天数的缓存视为过期，0 表示永不过期
+}
+
+
+def get_result_cache_config() -> Dict[str, Any]:
+    """读取 settings.TEST_CASE_RESULT_CACHE_CONFIG，缺省项使用默认值"""
+    config = dict(DEFAULT_RESULT_CACHE_CONFIG)
+    config.update(getattr(settings, 'TEST_CASE_RESULT_CACHE_CONFIG', {}) or {})
+    return config
+
+
+def build_cache_key(requirements: str,
+                    case_design_methods: List[str],
+                    case_categories: List[str],
+                    case_count: int,
+                    llm_provider: str,
+                    llm_model: str,
+                    output_format: str) -> str:
+    """计算生成请求的缓存键"""
+    payload = {
+        'requirements': (requirements or '').strip(),
+        'case_design_methods': sorted(case_design_methods or []),
+        'case_categories': sorted(case_categories or []),
+        'case_count': int(case_count),
+        'llm_provider': llm_provider or '',
+        'llm_model': llm_model or '',
+        'output_format': output_format or '',
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+async def aget_cached_result(cache_key: str) -> Optional[GenerationResultCache]:
+    """查询缓存，命中时累加命中次数；未命中、已过期或缓存关闭时返回 None"""
+    config = get_result_cache_config()
+    if not config['enabled']:
+        return None
+    queryset = GenerationResultCache.objects.filter(cache_key=cache_key)
+    if config['ttl_days']:
+        queryset = queryset.filter(updated_at__gte=timezone.now() - timedelta(days=config['ttl_days']))
+    entry = await queryset.afirst()
+    if entry is None:
+        return None
+    # 只更新计数，不刷新 updated_at，过期时间从生成时间起算
+    await GenerationResultCache.objects.filter(pk=entry.pk).aupdate(hit_count=F('hit_count') + 1)
+    return entry
+
+
+async def asave_result(cache_key: str,
+                       requirements: str,
+                       case_design_methods: List[str],
+                       case_categories: List[str],
+                       case_count: int,
+                       llm_provider: str,
+                       llm_model: str,
+                       test_cases: List[Dict[str, Any]]) -> None:
+    """保存生成结果，已存在时覆盖（重新生成的结果替换旧结果）"""
+    if not get_result_cache_config()['enabled'] or not test_cases:
+        return
+    try:
+        await GenerationResultCache.objects.aupdate_or_create(
+            cache_key=cache_key,
+            defaults={
+                'requirements': requirements,
+                'case_design_methods': list(case_design_methods or []),
+                'case_categories': list(case_categories or []),
+                'case_count': int(case_count),
+                'llm_provider': llm_provider or '',
+                'llm_model': llm_model or '',
+                'test_cases': test_cases,
+                'hit_count': 0,
+            },
+        )
+    except Exception as e:
+        # 缓存写入失败不影响本次生成结果的返回
+        logger.warning(f"保存用例生成结果缓存失败: {str(e)}")
@@ -110,7 +110,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 llm_provider: document.getElementById('llm-provider')?.value || 'deepseek',
                 case_design_methods: selectedDesignMethods,
                 case_categories: selectedCaseCategories,
-                case_count: document.getElementById('case_count')?.value || '10'
+                case_count: document.getElementById('case_count')?.value || '10',
+                regenerate: document.getElementById('regenerate')?.checked || false
             };
             
             console.log('发送的数据:', requestData);
@@ -152,6 +153,11 @@ document.addEventListener('DOMContentLoaded', function() {
                     // 使用已有的 displayTestCases 函数显示测试用例
                     displayTestCases(data.test_cases);
                     
+                    // 相同需求的历史结果直接返回, 提示用户可勾选"重新生成"
+                    if (data.cached) {
+                        showNotification(`已返回相同需求于 ${data.cached_at} 生成的结果，如需重新生成请勾选"重新生成"`, 'info');
+                    }
+                    
                     // 保存生成的测试用例到会话存储
                     sessionStorage.setItem('generatedTestCases', JSON.stringify(data.test_cases));
                     sessionStorage.setItem('inputText', inputTextValue);
@@ -0,0 +1,36 @@
+"""
+测试用例生成的输出 Pydantic 模型定义
+用于提供商原生结构化输出（JSON schema）约束 LLM 生成的用例结构
+"""
+from typing import List
+from pydantic import BaseModel, Field
+
+from apps.llm.structured import StructuredOutput
+
+
+class GeneratedTestCase(BaseModel):
+    """完整格式的单条用例"""
+    description: str = Field(..., min_length=1)  # 用例描述
+    test_steps: List[str] = Field(..., min_length=1)  # 测试步骤
+    expected_results: List[str] = Field(..., min_length=1)  # 预期结果
+
+
+# 紧凑格式的单条用例：["用例描述", ["步骤", ...], ["预期结果", ...]]
+COMPACT_TEST_CASE_SCHEMA = {
+    'type': 'array',
+    'minItems': 3,
+    'maxItems': 3,
+    'items': {
+        'anyOf': [
+            {'type': 'string'},
+            {'type': 'array', 'items': {'type': 'string'}},
+        ]
+    },
+}
+
+
+def get_test_case_output(output_format: str = "verbose") -> StructuredOutput:
+    """根据输出格式返回测试用例的结构化输出约定，结果数组包装在 test_cases 字段中"""
+    if output_format == "compact":
+        return StructuredOutput('compact_test_cases', COMPACT_TEST_CASE_SCHEMA, wrapper_key='test_cases')
+    return StructuredOutput('test_cases', GeneratedTestCase, wrapper_key='test_cases')
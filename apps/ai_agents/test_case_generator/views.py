@@ -2,7 +2,10 @@
 import json
 from django.http import JsonResponse
 from apps.llm import LLMServiceFactory
-from apps.ai_agents.test_case_generator.generator import TestCaseGeneratorAgent
+from apps.ai_agents.test_case_generator.generator import TestCaseGeneratorAgent, get_generation_config
+from apps.ai_agents.test_case_generator.result_cache import build_cache_key, aget_cached_result, asave_result
+from apps.utils.job_queue import enqueue_job
+from asgiref.sync import sync_to_async
 from apps.core.models import TestCase
 from apps.utils.logger_manager import get_logger
 from django.views.decorators.http import require_http_methods
@@ -61,9 +64,52 @@ async def generate(request):
     case_design_methods = data.get('case_design_methods', [])  # 获取测试方法
     case_categories = data.get('case_categories', [])         # 获取测试类型
     case_count = int(data.get('case_count', 10))            # 获取生成用例条数
+    regenerate = bool(data.get('regenerate', False))         # 为True时跳过缓存重新生成
     
     logger.info(f"接收到的数据: {json.dumps(data, ensure_ascii=False)}")
     
+    llm_model = PROVIDERS.get(llm_provider, {}).get('model', '')
+    cache_key = build_cache_key(requirements, case_design_methods, case_categories, case_count,
+                                llm_provider, llm_model, get_generation_config()['output_format'])
+    if not regenerate:
+        try:
+            cached = await aget_cached_result(cache_key)
+        except Exception as e:
+            logger.warning(f"查询用例生成结果缓存失败: {str(e)}")
+            cached = None
+        if cached is not None:
+            logger.info(f"命中用例生成结果缓存 - 缓存键: {cache_key[:12]}, 用例数量: {len(cached.test_cases)}")
+            return JsonResponse({
+                'success': True,
+                'test_cases': cached.test_cases,
+                'cached': True,
+                'cached_at': cached.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+            })
+    
+    # 异步模式: 写入后台任务后立即返回, 前端通过任务状态接口查询结果
+    if data.get('async'):
+        try:
+            job = await sync_to_async(enqueue_job)('test_case_generation', {
+                'requirements': requirements,
+                'llm_provider': llm_provider,
+                'llm_model': llm_model,
+                'case_design_methods': case_design_methods,
+                'case_categories': case_categories,
+                'case_count': case_count,
+                'cache_key': cache_key,
+            }, task_id=data.get('task_id'))
+        except Exception as e:
+            logger.error(f"提交测试用例生成任务失败: {str(e)}", exc_info=True)
+            return JsonResponse({
+                'success': False,
+                'message': str(e)
+            }, status=500)
+        return JsonResponse({
+            'success': True,
+            'job_id': job.id,
+            'task_id': job.task_id
+        })
+    
     try:
         # 使用工厂创建选定的LLM服务
         logger.info(f"使用 {llm_provider} 生成测试用例")
@@ -83,6 +129,8 @@ async def generate(request):
         test_cases = await generator_agent.async_generate(requirements, input_type="requirement")
 
         logger.info(f"测试用例生成成功 - 生成数量: {len(test_cases)}")
+        await asave_result(cache_key, requirements, case_design_methods, case_categories, case_count,
+                           llm_provider, llm_model, test_cases)
         
         context.update({
             'test_cases': test_cases
@@ -90,7 +138,8 @@ async def generate(request):
         
         return JsonResponse({
             'success': True,
-            'test_cases': test_cases
+            'test_cases': test_cases,
+            'cached': False
         })
             
     except Exception as e:
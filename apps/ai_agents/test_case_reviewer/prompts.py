@@ -1,6 +1,6 @@
 from pathlib import Path
 import yaml
-from typing import Dict, Any
+from typing import Dict, Any, List
 from langchain_core.prompts import ChatPromptTemplate
 # from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.prompts import SystemMessagePromptTemplate, HumanMessagePromptTemplate
@@ -43,6 +43,19 @@ class TestCaseReviewerPromptManager(BasePromptManager):
             human_message_prompt
         ])
 
+    def get_batch_review_prompt(self) -> ChatPromptTemplate:
+        """获取多条测试用例合并评审的提示词模板，系统消息与单条评审相同"""
+        config = self.config
+        system_vars = {
+            'role': config['role'],
+            'evaluation_aspects': ', '.join(config['evaluation_aspects'])
+        }
+        system_template_formatted = config['system_template'].format(**system_vars)
+        return ChatPromptTemplate.from_messages([
+            SystemMessagePromptTemplate.from_template(system_template_formatted),
+            HumanMessagePromptTemplate.from_template(config['batch_human_template'])
+        ])
+
 
 class TestCaseReviewerPrompt:
     """测试用例评审提示词"""
@@ -53,6 +66,22 @@ class TestCaseReviewerPrompt:
         # 初始化具体的提示词模板管理器
         self.prompt_manager = TestCaseReviewerPromptManager(str(config_path))
         self.prompt_template = self.prompt_manager.get_test_case_reviewer_prompt()
+        self.batch_prompt_template = self.prompt_manager.get_batch_review_prompt()
+    
+    @staticmethod
+    def format_test_case(test_case: Dict[str, Any]) -> str:
+        """将单条测试用例格式化为提示词中的文本"""
+        return (
+            f"测试用例描述：\n{test_case.get('description', '')}\n\n"
+            f"测试步骤：\n{test_case.get('test_steps', '')}\n\n"
+            f"预期结果：\n{test_case.get('expected_results', '')}"
+        )
+    
+    def _format_review_points(self) -> str:
+        return '\n'.join(
+            f"- {point}" 
+            for point in self.prompt_manager.config['review_points']
+        )
     
     def format_messages(self, test_case: Dict[str, Any]) -> list:
         """格式化消息
@@ -64,19 +93,25 @@ class TestCaseReviewerPrompt:
             格式化后的消息列表
         """
         # 格式化测试用例数据为字符串
-        test_case_str = (
-            f"测试用例描述：\n{test_case.get('description', '')}\n\n"
-            f"测试步骤：\n{test_case.get('test_steps', '')}\n\n"
-            f"预期结果：\n{test_case.get('expected_results', '')}"
-        )
-        
-        # 获取评审点列表
-        review_points = '\n'.join(
-            f"- {point}" 
-            for point in self.prompt_manager.config['review_points']
-        )
+        test_case_str = self.format_test_case(test_case)
         
         return self.prompt_template.format_messages(
             test_case=test_case_str,
-            review_points=review_points
+            review_points=self._format_review_points()
+        )
+    
+    def format_batch_messages(self, test_cases: List[Dict[str, Any]]) -> list:
+        """格式化多条测试用例合并评审的消息
+
+        Args:
+            test_cases: 测试用例数据列表，每条需包含 id 作为评审结果中的 case_id
+        """
+        test_cases_str = '\n\n'.join(
+            f"### 用例编号: {test_case['id']}\n{self.format_test_case(test_case)}"
+            for test_case in test_cases
+        )
+        return self.batch_prompt_template.format_messages(
+            case_count=len(test_cases),
+            test_cases=test_cases_str,
+            review_points=self._format_review_points()
         )
\ No newline at end of file
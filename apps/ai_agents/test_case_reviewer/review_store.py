@@ -0,0 +1,93 @@
+"""
+AI评审结果持久化与复用
+
+每次AI评审后写入 TestCaseReview，记录评审时用例内容（描述+测试步骤+预期结果）的哈希及所用提供商/模型。
+再次评审时若用例内容哈希未变且评审所用的提供商/模型与当前配置一致，直接返回最近一次保存的评审结果；
+用例经 update_test_case 修改后哈希变化，或切换了评审模型，才会重新调用LLM评审。
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Optional
+
+from apps.ai_agents.common.json_salvage import JsonSalvageError, parse_json
+from apps.core.models import TestCaseReview
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+
+def compute_content_hash(description: str, test_steps: str, expected_results: str) -> str:
+    """计算用例评审内容的哈希，只去掉各字段首尾空白"""
+    payload = json.dumps(
+        [(description or '').strip(), (test_steps or '').strip(), (expected_results or '').strip()],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def test_case_content_hash(test_case: Any) -> str:
+    """计算 TestCase 实例或用例字典的内容哈希"""
+    if isinstance(test_case, dict):
+        return compute_content_hash(test_case.get('description'), test_case.get('test_steps'),
+                                    test_case.get('expected_results'))
+    return compute_content_hash(test_case.description, test_case.test_steps, test_case.expected_results)
+
+
+def get_stored_reviews(test_cases: Iterable[Any], llm_provider: str, llm_model: str) -> Dict[Any, TestCaseReview]:
+    """批量查询内容未变化的用例由当前提供商/模型给出的最近一次AI评审，返回 {用例ID: TestCaseReview}"""
+    hashes = {}
+    for test_case in test_cases:
+        test_case_id = test_case['id'] if isinstance(test_case, dict) else test_case.id
+        hashes[test_case_id] = test_case_content_hash(test_case)
+    if not hashes:
+        return {}
+    stored = {}
+    reviews = (TestCaseReview.objects
+               .filter(test_case_id__in=list(hashes), reviewer__isnull=True,
+                       llm_provider=llm_provider or '', llm_model=llm_model or '')
+               .exclude(content_hash='')
+               .order_by('review_date', 'id'))
+    for review in reviews:
+        # 按时间升序遍历，同一用例保留内容哈希匹配的最新一条
+        if hashes.get(review.test_case_id) == review.content_hash:
+            stored[review.test_case_id] = review
+    return stored
+
+
+def get_stored_review(test_case: Any, llm_provider: str, llm_model: str) -> Optional[TestCaseReview]:
+    """查询单条用例内容未变化时当前提供商/模型的最近一次AI评审"""
+    test_case_id = test_case['id'] if isinstance(test_case, dict) else test_case.id
+    return get_stored_reviews([test_case], llm_provider, llm_model).get(test_case_id)
+
+
+def save_review(test_case: Any, review_content: str, llm_provider: str, llm_model: str) -> Optional[TestCaseReview]:
+    """保存一次AI评审结果，评审内容能解析为JSON对象时同时保存结构化结果"""
+    test_case_id = test_case['id'] if isinstance(test_case, dict) else test_case.id
+    try:
+        review_result = parse_json(review_content)
+    except (JsonSalvageError, ValueError):
+        review_result = None
+    try:
+        return TestCaseReview.objects.create(
+            test_case_id=test_case_id,
+            review_comments=review_content,
+            review_result=review_result if isinstance(review_result, dict) else None,
+            content_hash=test_case_content_hash(test_case),
+            llm_provider=llm_provider or '',
+            llm_model=llm_model or '',
+        )
+    except Exception as e:
+        # 保存失败不影响本次评审结果的返回
+        logger.warning(f"保存用例 {test_case_id} 的评审结果失败: {str(e)}")
+        return None
+
+
+def review_to_dict(review: TestCaseReview) -> Dict[str, Any]:
+    """已保存评审的接口返回字段"""
+    return {
+        'review_result': review.review_comments,
+        'cached': True,
+        'reviewed_at': review.review_date.isoformat(),
+        'llm_model': review.llm_model,
+    }
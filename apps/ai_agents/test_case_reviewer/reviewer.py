@@ -1,8 +1,13 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
 import logging
 
+from django.conf import settings
 from apps.llm.base import BaseLLMService
+from apps.llm.governor import get_provider_governor
+from apps.llm.structured import StructuredOutput
+from apps.llm.tokens import estimate_tokens
 from apps.knowledge.service import KnowledgeService
 from apps.core.models import TestCase
 from .prompts import TestCaseReviewerPrompt
@@ -10,6 +15,58 @@ from .prompts import TestCaseReviewerPrompt
 from apps.utils.logger_manager import get_logger
 
 
+DEFAULT_REVIEW_BATCH_CONFIG = {
+    'pack_token_budget': 3000,
+    'max_cases_per_pack': 8,
+    'max_cases': 500,
+}
+
+
+def get_review_batch_config() -> Dict[str, Any]:
+    """读取 settings.TEST_CASE_REVIEW_BATCH_CONFIG，缺省项使用默认值"""
+    config = dict(DEFAULT_REVIEW_BATCH_CONFIG)
+    config.update(getattr(settings, 'TEST_CASE_REVIEW_BATCH_CONFIG', {}) or {})
+    return config
+
+
+# 合并评审时单条用例评审结果的 Schema，结果放在 {"reviews": [...]} 中
+CASE_REVIEW_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'case_id': {'type': 'integer'},
+        'score': {'type': 'number'},
+        'strengths': {'type': 'array', 'items': {'type': 'string'}},
+        'weaknesses': {'type': 'array', 'items': {'type': 'string'}},
+        'suggestions': {'type': 'array', 'items': {'type': 'string'}},
+        'missing_scenarios': {'type': 'array', 'items': {'type': 'string'}},
+        'recommendation': {'type': 'string'},
+        'comments': {'type': 'string'},
+    },
+    'required': ['case_id', 'score', 'recommendation'],
+}
+
+batch_review_output = StructuredOutput('test_case_reviews', CASE_REVIEW_SCHEMA, wrapper_key='reviews')
+
+
+def pack_test_cases(test_cases: List[Dict[str, Any]], token_budget: int, max_cases: int) -> List[List[Dict[str, Any]]]:
+    """按顺序将测试用例打包，每包用例内容的 token 估算总数不超过 token_budget、条数不超过 max_cases
+
+    单条用例超过预算时独占一包。
+    """
+    packs: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    current_tokens = 0
+    for test_case in test_cases:
+        tokens = estimate_tokens(TestCaseReviewerPrompt.format_test_case(test_case))
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_cases):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(test_case)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
 
 class TestCaseReviewerAgent:
     """测试用例评审Agent"""
@@ -18,6 +75,9 @@ class TestCaseReviewerAgent:
         self.llm_service = llm_service
         self.knowledge_service = knowledge_service
         self.prompt = TestCaseReviewerPrompt()
+        # 同一提供商的评审请求共享并发与token速率限制
+        self.governor = get_provider_governor(llm_service)
+        self.batch_llm, self.batch_structured_mode = batch_review_output.bind(llm_service)
         self.logger = get_logger(self.__class__.__name__)  # 添加logger
 
     
@@ -32,20 +92,100 @@ class TestCaseReviewerAgent:
                 "expected_results": test_case.expected_results
             }
             
-            # 使用新的 format_messages 方法获取消息列表
-            messages = self.prompt.format_messages(test_case_dict)
-            
-            self.logger.info(f"构建后的评审提示词: \n{'='*50}\n{messages}\n{'='*50}")
-            
-            # 调用LLM服务
-            result = self.llm_service.invoke(messages)  # 使用 invoke 方法替代 chat
-            
-            return result
+            return self._invoke_review(test_case_dict)
             
         except Exception as e:
             self.logger.error(f"评审过程出错: {str(e)}", exc_info=True)
             raise Exception(f"评审失败: {str(e)}")
 
+    def _invoke_review(self, test_case_dict: Dict[str, Any]):
+        """评审单条用例，返回LLM响应消息"""
+        # 使用新的 format_messages 方法获取消息列表
+        messages = self.prompt.format_messages(test_case_dict)
+        
+        self.logger.info(f"构建后的评审提示词: \n{'='*50}\n{messages}\n{'='*50}")
+        
+        # 调用LLM服务
+        with self.governor.acquire(estimate_tokens(messages)):
+            return self.llm_service.invoke(messages)  # 使用 invoke 方法替代 chat
+
+    def review_batch(self, test_cases: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """批量评审测试用例，按批次完成顺序逐条产出评审结果
+
+        用例按 TEST_CASE_REVIEW_BATCH_CONFIG 的 token 预算打包，每包一次LLM请求，各包在提供商
+        governor 的并发限制下并行执行。批次结果中缺失的用例（如输出被截断）单独补评。
+
+        Args:
+            test_cases: 测试用例字典列表，需包含 id、description、test_steps、expected_results
+
+        Yields:
+            {'test_case_id', 'success', 'review_result'} 或 {'test_case_id', 'success': False, 'message'}
+        """
+        if not test_cases:
+            return
+        config = get_review_batch_config()
+        packs = pack_test_cases(test_cases, config['pack_token_budget'], config['max_cases_per_pack'])
+        self.logger.info(f"批量评审 {len(test_cases)} 条用例，打包为 {len(packs)} 个批次: {[len(pack) for pack in packs]}")
+
+        executor = ThreadPoolExecutor(max_workers=min(self.governor.max_concurrency, len(packs)),
+                                      thread_name_prefix='case-review')
+        try:
+            futures = {executor.submit(self._review_pack, pack): pack for pack in packs}
+            for future in as_completed(futures):
+                pack = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    self.logger.error(f"批次评审失败({len(pack)} 条用例): {str(e)}", exc_info=True)
+                    results = {test_case['id']: {'success': False, 'message': f'评审失败：{str(e)}'}
+                               for test_case in pack}
+                for test_case in pack:
+                    yield {'test_case_id': test_case['id'], **results[test_case['id']]}
+        finally:
+            # 调用方提前结束迭代（如客户端断开）时不再启动尚未开始的批次
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _review_pack(self, pack: List[Dict[str, Any]]) -> Dict[Any, Dict[str, Any]]:
+        """评审一个批次，返回 {用例ID: 结果}"""
+        if len(pack) == 1:
+            return {pack[0]['id']: self._review_single(pack[0])}
+
+        messages = self.prompt.format_batch_messages(pack)
+        messages = batch_review_output.apply(messages, self.batch_structured_mode)
+        with self.governor.acquire(estimate_tokens(messages)):
+            response = self.batch_llm.invoke(messages)
+        reviews = batch_review_output.parse(response.content, self.batch_structured_mode)
+
+        reviews_by_id = {}
+        for review in reviews:
+            if not isinstance(review, dict):
+                continue
+            review = dict(review)
+            case_id = str(review.pop('case_id', '')).strip()
+            reviews_by_id[case_id] = review
+
+        results = {}
+        for test_case in pack:
+            review = reviews_by_id.get(str(test_case['id']))
+            if review is None:
+                self.logger.warning(f"批次评审结果中缺少用例 {test_case['id']}，单独补评")
+                results[test_case['id']] = self._review_single(test_case)
+            else:
+                results[test_case['id']] = {
+                    'success': True,
+                    'review_result': json.dumps(review, ensure_ascii=False),
+                }
+        return results
+
+    def _review_single(self, test_case: Dict[str, Any]) -> Dict[str, Any]:
+        """单独评审一条用例，结果格式与单条评审接口一致"""
+        try:
+            result = self._invoke_review(test_case)
+            return {'success': True, 'review_result': result.content if hasattr(result, 'content') else str(result)}
+        except Exception as e:
+            self.logger.error(f"用例 {test_case['id']} 评审失败: {str(e)}", exc_info=True)
+            return {'success': False, 'message': f'评审失败：{str(e)}'}
+
     def _format_prompt(self, test_case):
         """格式化提示词"""
         try:
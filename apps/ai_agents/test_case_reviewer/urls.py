@@ -15,12 +15,17 @@ urlpatterns = [
     path('case-review-detail/api/test-case/<int:test_case_id>/', views.get_test_case, name='get_test_case'),
     path('test_case_reviewer/api/copy-test-cases/', views.copy_test_cases, name='copy_test_cases'), #复制选中的用例集合
     path('test_case_reviewer/api/export-test-cases-excel/', views.export_test_cases_excel, name='export_test_cases_excel'), #将用例集合导出到excel
+    path('api/export-test-cases/', views.export_test_cases_excel, name='export_test_cases'), #按ID或筛选条件流式导出xlsx/csv
     path('api/delete-test-cases/', views.delete_test_cases, name='delete_test_cases'), #删除选中的测试用例
+    path('api/bulk-update-test-cases/', views.bulk_update_test_cases_view, name='bulk_update_test_cases'), #批量修改用例状态/BU/Feature/优先级
     path('case-review-detail/api/update-test-case/', views.update_test_case, name='update_test_case'),#更新单个测试用例的状态到mysql
     path('case-review-detail/api/review/', views.case_review, name='case_review'),#调用大模型对单个测试用例进行AI评审
+    path('api/batch-review/', views.batch_review, name='batch_review'),#批量AI评审, NDJSON流式返回每条用例的评审结果
 
 
 
+    path('api/search-test-cases/', views.search_test_cases_view, name='search_test_cases'), #全文检索测试用例, 按相关度排序并高亮
+    path('api/test-cases/bulk/', views.bulk_get_test_cases, name='bulk_get_test_cases'), #批量获取测试用例(POST传入ID列表), 流式返回
     path('api/test-cases/<str:test_case_ids>/', views.get_test_cases, name='get_test_cases'),
 
 
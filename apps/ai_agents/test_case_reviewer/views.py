@@ -1,14 +1,21 @@
 from apps.core.models import TestCase
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from apps.utils.logger_manager import get_logger
+from apps.utils.pagination import KeysetPaginator
+from apps.core.test_case_stats import get_test_case_stats
+from apps.core.test_case_search import search_test_cases
 import json
 from django.shortcuts import render
-from apps.ai_agents.test_case_reviewer.reviewer import TestCaseReviewerAgent
+from apps.ai_agents.test_case_reviewer.reviewer import TestCaseReviewerAgent, get_review_batch_config
+from apps.core.test_case_service import (
+    bulk_delete_test_cases, bulk_update_test_cases, export_csv_response, export_xlsx_response, fetch_test_cases,
+    parse_fetch_fields, parse_id_list, select_test_cases, test_cases_json_response
+)
+from apps.ai_agents.test_case_reviewer.review_store import (
+    get_stored_review, get_stored_reviews, review_to_dict, save_review
+)
 from django.http import JsonResponse
-import xlwt
 from django.views.decorators.http import require_http_methods
-from datetime import datetime
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.conf import settings
 from apps.llm import LLMServiceFactory
 from apps.knowledge.service import get_knowledgeService_instance
@@ -36,43 +43,23 @@ knowledge_service = get_knowledgeService_instance()
 # @login_required 先屏蔽登录
 def review_view(request):
     """页面-测试用例评审页面视图"""
-    # 获取所有测试用例
-    pending_cases = TestCase.objects.filter(status='pending').order_by('-created_at')
-    approved_cases = TestCase.objects.filter(status='approved').order_by('-created_at')
-    rejected_cases = TestCase.objects.filter(status='rejected').order_by('-created_at')
-    
     # 每页显示15条数据
     page_size = 15
+    # 各状态的用例数取自统计计数, 分页器不再执行 COUNT(*)
+    status_counts = get_test_case_stats()['status']
     
-    # 处理待评审用例分页
-    pending_paginator = Paginator(pending_cases, page_size)
-    pending_page = request.GET.get('pending_page', 1)
-    try:
-        pending_test_cases = pending_paginator.page(pending_page)
-    except PageNotAnInteger:
-        pending_test_cases = pending_paginator.page(1)
-    except EmptyPage:
-        pending_test_cases = pending_paginator.page(pending_paginator.num_pages)
-    
-    # 处理已通过用例分页
-    approved_paginator = Paginator(approved_cases, page_size)
-    approved_page = request.GET.get('approved_page', 1)
-    try:
-        approved_test_cases = approved_paginator.page(approved_page)
-    except PageNotAnInteger:
-        approved_test_cases = approved_paginator.page(1)
-    except EmptyPage:
-        approved_test_cases = approved_paginator.page(approved_paginator.num_pages)
-    
-    # 处理未通过用例分页
-    rejected_paginator = Paginator(rejected_cases, page_size)
-    rejected_page = request.GET.get('rejected_page', 1)
-    try:
-        rejected_test_cases = rejected_paginator.page(rejected_page)
-    except PageNotAnInteger:
-        rejected_test_cases = rejected_paginator.page(1)
-    except EmptyPage:
-        rejected_test_cases = rejected_paginator.page(rejected_paginator.num_pages)
+    # 按 (created_at, id) 键集分页, 翻页链接携带上一页末行的游标, 深页不再使用 OFFSET
+    pages = {}
+    for status in ('pending', 'approved', 'rejected'):
+        paginator = KeysetPaginator(
+            TestCase.objects.filter(status=status),
+            page_size,
+            count=status_counts[status],
+        )
+        pages[status] = paginator.page_from_params(request.GET, prefix=status)
+    pending_test_cases = pages['pending']
+    approved_test_cases = pages['approved']
+    rejected_test_cases = pages['rejected']
     
     context = {
         'pending_test_cases': pending_test_cases,
@@ -112,6 +99,12 @@ def case_review(request):
                 'message': f'找不到ID为 {test_case_id} 的测试用例'
             }, status=404)
         
+        # 用例内容未修改过且评审模型未切换时直接返回已保存的评审结果
+        stored_review = get_stored_review(test_case, DEFAULT_PROVIDER, DEFAULT_LLM_CONFIG.get('model', ''))
+        if stored_review is not None:
+            logger.info(f"用例 {test_case.id} 内容未变化, 返回 {stored_review.review_date} 的评审结果")
+            return JsonResponse({'success': True, **review_to_dict(stored_review)})
+        
         # 调用测试用例评审Agent
         logger.info("开始调用评审Agent...")
         test_case_reviewer = TestCaseReviewerAgent(llm_service, knowledge_service)
@@ -120,10 +113,12 @@ def case_review(request):
         
         # 从AIMessage对象中提取内容
         review_content = review_result.content if hasattr(review_result, 'content') else str(review_result)
+        save_review(test_case, review_content, DEFAULT_PROVIDER, DEFAULT_LLM_CONFIG.get('model', ''))
         
         return JsonResponse({
             'success': True,
-            'review_result': review_content  # 只返回评审内容文本
+            'review_result': review_content,  # 只返回评审内容文本
+            'cached': False
         })
         
     except json.JSONDecodeError:
@@ -140,6 +135,117 @@ def case_review(request):
         }, status=500)
 
 
+# @login_required 先屏蔽登录
+@require_http_methods(["POST"])
+def batch_review(request):
+    """批量AI评审API接口
+
+    请求体: {"test_case_ids": [1, 2, ...]} 或 {"status": "pending"}（按状态筛选）。
+    内容未修改过的用例直接返回已保存的评审结果（cached=true），其余用例按token预算打包、并发评审，
+    评审结果逐条保存。响应为 NDJSON 流，每行一个JSON对象:
+    - {"type": "start", "total": 用例数, "cached": 复用结果数}
+    - {"type": "result", "test_case_id": ID, "success": true, "review_result": 评审内容, "cached": bool}，
+      失败时为 success=false 和 message
+    - {"type": "done", "total": 用例数, "succeeded": 成功数, "failed": 失败数}
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'message': '无效的JSON数据'
+        }, status=400)
+
+    try:
+        test_case_ids = parse_id_list(data.get('test_case_ids'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    status = data.get('status')
+    if not test_case_ids and not status:
+        return JsonResponse({
+            'success': False,
+            'message': '请提供测试用例ID列表或状态'
+        }, status=400)
+
+    queryset = TestCase.objects.all()
+    if test_case_ids:
+        queryset = queryset.filter(id__in=test_case_ids)
+    if status:
+        queryset = queryset.filter(status=status)
+
+    max_cases = get_review_batch_config()['max_cases']
+    test_cases = list(
+        queryset.order_by('id').values('id', 'description', 'test_steps', 'expected_results')[:max_cases + 1]
+    )
+    if not test_cases:
+        return JsonResponse({
+            'success': False,
+            'message': '没有找到需要评审的测试用例'
+        }, status=404)
+    if len(test_cases) > max_cases:
+        return JsonResponse({
+            'success': False,
+            'message': f'单次最多评审 {max_cases} 条测试用例'
+        }, status=400)
+
+    stored_reviews = get_stored_reviews(test_cases, DEFAULT_PROVIDER, DEFAULT_LLM_CONFIG.get('model', ''))
+    pending_cases = [test_case for test_case in test_cases if test_case['id'] not in stored_reviews]
+    cases_by_id = {test_case['id']: test_case for test_case in pending_cases}
+    logger.info(f"接收到批量评审请求, 用例数: {len(test_cases)}, 复用已保存评审: {len(stored_reviews)}")
+    test_case_reviewer = TestCaseReviewerAgent(llm_service, knowledge_service)
+
+    def stream():
+        succeeded = failed = 0
+        yield json.dumps({'type': 'start', 'total': len(test_cases), 'cached': len(stored_reviews)},
+                         ensure_ascii=False) + '\n'
+        for test_case_id, review in stored_reviews.items():
+            succeeded += 1
+            yield json.dumps({'type': 'result', 'test_case_id': test_case_id, 'success': True,
+                              **review_to_dict(review)}, ensure_ascii=False) + '\n'
+        for result in test_case_reviewer.review_batch(pending_cases):
+            if result['success']:
+                succeeded += 1
+                save_review(cases_by_id[result['test_case_id']], result['review_result'],
+                            DEFAULT_PROVIDER, DEFAULT_LLM_CONFIG.get('model', ''))
+                result['cached'] = False
+            else:
+                failed += 1
+            yield json.dumps({'type': 'result', **result}, ensure_ascii=False) + '\n'
+        logger.info(f"批量评审完成: 成功 {succeeded} 条, 失败 {failed} 条")
+        yield json.dumps({'type': 'done', 'total': len(test_cases), 'succeeded': succeeded, 'failed': failed},
+                         ensure_ascii=False) + '\n'
+
+    response = StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_http_methods(["GET"])
+def search_test_cases_view(request):
+    """测试用例全文检索API接口
+
+    GET参数: q(检索词, 空格分隔的多个词需同时命中), status(可选), page, page_size
+    返回按相关度排序的用例及高亮片段(highlights 中命中的词以 <mark> 包裹, 其余内容已转义)
+    """
+    query = (request.GET.get('q') or '').strip()
+    if not query:
+        return JsonResponse({'success': False, 'message': '检索词不能为空'}, status=400)
+    try:
+        result = search_test_cases(
+            query,
+            status=request.GET.get('status') or None,
+            page=int(request.GET.get('page') or 1),
+            page_size=int(request.GET.get('page_size') or 0) or None,
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'message': '分页参数格式不正确'}, status=400)
+    except Exception as e:
+        logger.error(f"检索测试用例失败: {str(e)}", exc_info=True)
+        return JsonResponse({'success': False, 'message': f'检索失败: {str(e)}'}, status=500)
+    return JsonResponse({'success': True, **result})
+
+
 def case_review_detail(request):
     return render(request, 'case_review_detail.html')
 
@@ -160,21 +266,85 @@ def get_test_case(request, test_case_id):
         return JsonResponse({'error': '测试用例不存在'}, status=404)
 
 def get_test_cases(request, test_case_ids: str):
-    """从mysql查询、获取多个测试用例"""
+    """从mysql查询、获取多个测试用例(ID在URL路径中以逗号分隔, 大量ID请使用 bulk_get_test_cases)"""
     try:
-        # 将逗号分隔的字符串转换为列表
-        ids = test_case_ids.split(',')
-        test_cases = TestCase.objects.filter(id__in=ids).values(
-                    'id', 'title', 'description', 'test_steps', 
-                    'expected_results', 'status', 'requirements', 'llm_provider'
-                )
-        logger.info(f"获取到的测试用例集合数据类型是: {type(test_cases)}")
-        return JsonResponse({
-            'success': True,
-            'test_cases': list(test_cases)
-        })
-    except TestCase.DoesNotExist:
-        return JsonResponse({'error': '测试用例集合不存在'}, status=404)
+        test_cases = fetch_test_cases(test_case_ids)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    return JsonResponse({
+        'success': True,
+        'test_cases': test_cases
+    })
+
+
+def _read_selection_params(request):
+    """读取批量操作的参数: POST 的 JSON 请求体或表单, 以及 GET 查询参数"""
+    if request.method == 'POST':
+        if request.content_type == 'application/json':
+            return json.loads(request.body or b'{}')
+        if request.POST:
+            return request.POST
+    return request.GET
+
+
+def _has_selection(params, ids):
+    """批量操作是否指定了用例ID或筛选条件, 避免误操作全部用例"""
+    return bool(ids) or any(params.get(key) for key in ('status', 'bu', 'feature', 'created_from', 'created_to'))
+
+
+@require_http_methods(["POST"])
+def bulk_get_test_cases(request):
+    """批量获取测试用例API接口
+
+    请求体: {"ids": [1, 2, ...], "fields": ["id", "description", ...]}，也可以传 status/bu/feature/
+    created_from/created_to 按条件获取。按ID分组查询，边查询边输出:
+    {"success": true, "test_cases": [...], "count": N}，中途出错时末尾附带 "error"
+    """
+    try:
+        params = json.loads(request.body or b'{}')
+        fields = parse_fetch_fields(params.get('fields'))
+        queryset, ids = select_test_cases(params)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': '无效的JSON数据'}, status=400)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    if not _has_selection(params, ids):
+        return JsonResponse({'success': False, 'message': '请提供测试用例ID列表或筛选条件'}, status=400)
+    return test_cases_json_response(queryset, ids, fields)
+
+
+@require_http_methods(["POST"])
+def bulk_update_test_cases_view(request):
+    """批量修改测试用例的状态/BU/Feature/优先级
+
+    请求体: {"ids": [1, 2, ...], "changes": {"status": "approved"}, "comments": "评审意见"}，也可以用
+    status/bu/feature/created_from/created_to 按条件选择用例。按ID分组各执行一条 UPDATE；修改状态且填写了
+    comments 时为状态变化的用例写入评审记录。
+    """
+    try:
+        params = json.loads(request.body or b'{}')
+        queryset, ids = select_test_cases(params)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': '无效的JSON数据'}, status=400)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    if not _has_selection(params, ids):
+        return JsonResponse({'success': False, 'message': '请提供测试用例ID列表或筛选条件'}, status=400)
+
+    reviewer = request.user if request.user.is_authenticated else None
+    try:
+        result = bulk_update_test_cases(queryset, params.get('changes'), ids=ids,
+                                        comments=(params.get('comments') or '').strip(), reviewer=reviewer)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"批量修改测试用例失败: {str(e)}", exc_info=True)
+        return JsonResponse({'success': False, 'message': f'批量修改失败: {str(e)}'}, status=500)
+    return JsonResponse({
+        'success': True,
+        'message': f'成功修改 {result["updated"]} 条测试用例',
+        **result,
+    })
 
 
 @require_http_methods(["POST"])
@@ -195,114 +365,85 @@ def update_test_case(request):
         return JsonResponse({'success': False, 'message': str(e)}) 
 
 
+@require_http_methods(["GET", "POST"])
 def copy_test_cases(request):
-    """返回用户手动勾选、复制后的测试用例集合"""
+    """返回用户手动勾选、复制后的测试用例集合
+
+    用例ID放在 POST 请求体 {"ids": [...]} 中(兼容查询参数 ids=1,2,3), 响应边查询边输出
+    """
     try:
-        # 将逗号分隔的字符串转换为列表
-        ids = request.GET.get('ids')
-        response = get_test_cases(request,ids)
-        response_data = json.loads(response.content)
-        if response_data.get('success'):
-            test_cases = response_data.get('test_cases')
-            logger.info(f"获取到的测试用例集合数据类型是2222: {type(test_cases)}")
-            return JsonResponse({
-                'success': True,
-                'test_cases': test_cases
-            })
-        else:
-            return JsonResponse({
-                'success': False,
-                'message': response_data.get('message')
-            })
-    except TestCase.DoesNotExist:
-        return JsonResponse({'error': '测试用例集合不存在'}, status=404)
+        params = _read_selection_params(request)
+        ids = parse_id_list(params.get('ids'))
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': '无效的JSON数据'}, status=400)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    if not ids:
+        return JsonResponse({'success': False, 'message': '未提供测试用例ID'}, status=400)
+    return test_cases_json_response(TestCase.objects.all(), ids)
 
 
+@require_http_methods(["GET", "POST"])
 def export_test_cases_excel(request):
-    """将用例集合导出到excel"""
+    """导出测试用例到 xlsx/csv 文件
+
+    参数(GET查询参数, 或POST表单/JSON请求体; 选中大量用例时使用POST, 避免URL超长):
+        format: xlsx(默认) 或 csv
+        ids: 测试用例ID(逗号分隔字符串或列表)
+        status/bu/feature/created_from/created_to: 筛选条件，可与 ids 组合；均未提供时导出全部用例
+    """
     try:
-        ids = request.GET.get('ids')
-        if not ids:
-            return JsonResponse({'success': False, 'message': '未提供测试用例ID'})
-            
-        # 获取测试用例数据
-        response = get_test_cases(request, ids)
-        response_data = json.loads(response.content)
-        
-        if not response_data.get('success'):
-            return JsonResponse({'success': False, 'message': '获取测试用例数据失败'})
-            
-        test_cases = response_data.get('test_cases')
-        logger.info(f"获取到的测试用例集合数据类型是: {type(test_cases)}")
-        
-        # 创建Excel工作簿和工作表
-        wb = xlwt.Workbook(encoding='utf-8')
-        ws = wb.add_sheet('测试用例')
-        
-        # 设置表头样式
-        header_style = xlwt.XFStyle()
-        header_font = xlwt.Font()
-        header_font.bold = True
-        header_style.font = header_font
-        
-        # 写入表头
-        headers = ['序号', '用例描述', '测试步骤', '预期结果', '状态']
-        for col, header in enumerate(headers):
-            ws.write(0, col, header, header_style)
-            # 设置列宽
-            ws.col(col).width = 256 * 30  # 30个字符宽度
-        
-        # 写入数据
-        for row, test_case in enumerate(test_cases, start=1):
-            ws.write(row, 0, row)  # 序号
-            ws.write(row, 1, test_case.get('description', ''))
-            ws.write(row, 2, test_case.get('test_steps', ''))
-            ws.write(row, 3, test_case.get('expected_results', ''))
-            ws.write(row, 4, test_case.get('status', ''))
-            
-            # 自动调整行高
-            ws.row(row).height_mismatch = True
-            ws.row(row).height = 20 * 40  # 40行文本高度
-        
-        # 生成文件名
-        current_time = datetime.now().strftime('%Y%m%d_%H%M%S')  # 格式：20240319_153021
-        case_count = len(test_cases)
-        filename = f"test_cases_{current_time}_{case_count}_cases.xls"
-        
-        # 生成响应
-        response = HttpResponse(content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        # 保存Excel文件到响应
-        wb.save(response)
-        return response
-        
+        params = _read_selection_params(request)
+        queryset, ids = select_test_cases(params)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': '无效的JSON数据'}, status=400)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    export_format = (params.get('format') or 'xlsx').lower()
+    if export_format not in ('xlsx', 'csv'):
+        return JsonResponse({'success': False, 'message': f'不支持的导出格式: {export_format}'}, status=400)
+
+    try:
+        if export_format == 'csv':
+            return export_csv_response(queryset, ids)
+        return export_xlsx_response(queryset, ids)
     except Exception as e:
-        logger.error(f"导出Excel失败: {str(e)}", exc_info=True)
+        logger.error(f"导出测试用例失败: {str(e)}", exc_info=True)
         return JsonResponse({
             'success': False,
-            'message': f'导出Excel失败: {str(e)}'
-        }) 
+            'message': f'导出失败: {str(e)}'
+        }, status=500)
 
 
-@require_http_methods(["DELETE"])
+@require_http_methods(["POST", "DELETE"])
 def delete_test_cases(request):
-    """删除选中的测试用例"""
+    """删除选中的测试用例
+
+    POST 请求体: {"ids": [...]} 或筛选条件 status/bu/feature/created_from/created_to;
+    兼容 DELETE 请求的查询参数 ids=1,2,3
+    """
     try:
-        ids = request.GET.get('ids', '')
-        if not ids:
-            return JsonResponse({'success': False, 'message': '未提供测试用例ID'})
-            
-        test_case_ids = ids.split(',')
-        TestCase.objects.filter(id__in=test_case_ids).delete()
-        
+        params = _read_selection_params(request)
+        queryset, ids = select_test_cases(params)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': '无效的JSON数据'}, status=400)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    if request.method == 'DELETE' and not ids:
+        return JsonResponse({'success': False, 'message': '未提供测试用例ID'})
+    if not _has_selection(params, ids):
+        return JsonResponse({'success': False, 'message': '请提供测试用例ID列表或筛选条件'}, status=400)
+
+    try:
+        deleted = bulk_delete_test_cases(queryset, ids)
         return JsonResponse({
             'success': True,
-            'message': f'成功删除 {len(test_case_ids)} 条测试用例'
+            'deleted': deleted,
+            'message': f'成功删除 {deleted} 条测试用例'
         })
     except Exception as e:
         logger.error(f"删除测试用例失败: {str(e)}", exc_info=True)
         return JsonResponse({
             'success': False,
             'message': f'删除失败: {str(e)}'
-        }) 
\ No newline at end of file
+        })
@@ -10,8 +10,8 @@ class TestCaseAdmin(admin.ModelAdmin):
 
 @admin.register(TestCaseReview)
 class TestCaseReviewAdmin(admin.ModelAdmin):
-    list_display = ('test_case', 'reviewer', 'review_date')
-    list_filter = ('review_date',)
+    list_display = ('test_case', 'reviewer', 'llm_model', 'review_date')
+    list_filter = ('review_date', 'llm_provider')
     search_fields = ('test_case__title', 'review_comments')
     readonly_fields = ('review_date',)
 
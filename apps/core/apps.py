@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = "apps.core"
+
+    def ready(self):
+        # 注册测试用例统计计数的信号处理函数
+        from . import test_case_stats  # noqa: F401
@@ -0,0 +1,168 @@
+"""
+测试用例列表分页基准测试
+
+向 TestCase 写入合成数据（标题以 [bench] 开头），对评审列表的各状态在不同深度的页上分别测量：
+- offset: 原实现，Paginator（COUNT(*) + ORDER BY created_at DESC LIMIT/OFFSET）
+- keyset: KeysetPaginator（统计计数 + (created_at, id) 游标条件）
+输出每种方式的 p50/p95/max 延迟。在添加索引的迁移执行前后各运行一次（--skip-seed 复用已写入的数据），
+即可对比索引的效果。
+
+示例：
+    python manage.py benchmark_test_cases --rows 1000000
+    python manage.py benchmark_test_cases --skip-seed --iterations 20
+    python manage.py benchmark_test_cases --cleanup
+"""
+
+import random
+import statistics
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils import timezone
+
+from apps.core.models import TestCase
+from apps.core.test_case_stats import get_test_case_stats, rebuild_test_case_stats
+from apps.utils.pagination import KeysetPaginator
+
+BENCH_TITLE_PREFIX = '[bench]'
+STATUS_WEIGHTS = [('pending', 0.5), ('approved', 0.35), ('rejected', 0.15)]
+
+
+class Command(BaseCommand):
+    help = "写入合成测试用例并对比 OFFSET 分页与键集分页的页面查询延迟"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='写入的合成用例数，默认100万')
+        parser.add_argument('--batch-size', type=int, default=5000, help='每批写入条数')
+        parser.add_argument('--page-size', type=int, default=15, help='每页条数，与评审页一致')
+        parser.add_argument('--iterations', type=int, default=10, help='每个页深度的重复测量次数')
+        parser.add_argument('--skip-seed', action='store_true', help='不写入数据，直接使用已有数据测量')
+        parser.add_argument('--cleanup', action='store_true', help='删除合成数据后退出')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self._cleanup()
+            return
+        if not options['skip_seed']:
+            self._seed(options['rows'], options['batch_size'])
+            rebuild_test_case_stats()
+        self._benchmark(options['page_size'], options['iterations'])
+
+    def _cleanup(self):
+        # 分批按主键删除，避免单条 DELETE 锁住大量行
+        deleted = 0
+        while True:
+            ids = list(TestCase.objects.filter(title__startswith=BENCH_TITLE_PREFIX)
+                       .values_list('id', flat=True)[:10000])
+            if not ids:
+                break
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {TestCase._meta.db_table} WHERE id IN ({','.join(['%s'] * len(ids))})", ids
+                )
+            deleted += len(ids)
+        rebuild_test_case_stats()
+        self.stdout.write(self.style.SUCCESS(f"已删除合成用例 {deleted} 条"))
+
+    def _seed(self, rows: int, batch_size: int):
+        rng = random.Random(42)
+        statuses = [status for status, _ in STATUS_WEIGHTS]
+        weights = [weight for _, weight in STATUS_WEIGHTS]
+        bus = [bu for bu, _ in TestCase.BU_CHOICES]
+        priorities = [priority for priority, _ in TestCase.PRIORITY_CHOICES]
+        now = timezone.now()
+        started = time.perf_counter()
+        written = 0
+        while written < rows:
+            count = min(batch_size, rows - written)
+            batch = []
+            for index in range(written, written + count):
+                batch.append(TestCase(
+                    title=f"{BENCH_TITLE_PREFIX} 用例-{index}",
+                    description=f"合成用例 {index}：验证功能点 {index % 997} 在条件 {index % 31} 下的行为",
+                    test_steps="1. 打开页面\n2. 输入数据\n3. 提交",
+                    expected_results="1. 页面正常\n2. 数据保存成功",
+                    status=rng.choices(statuses, weights)[0],
+                    bu=rng.choice(bus),
+                    feature=f"feature-{index % 50}",
+                    priority=rng.choice(priorities),
+                    llm_provider=rng.choice(['deepseek', 'qwen']),
+                ))
+            TestCase.objects.bulk_create(batch)
+            # created_at 为 auto_now_add，写入后按批分散到过去一年，使排序与分页接近真实数据
+            offset = timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+            TestCase.objects.filter(title__startswith=BENCH_TITLE_PREFIX, created_at__gte=now).update(
+                created_at=now - offset
+            )
+            written += count
+            self.stdout.write(f"已写入 {written}/{rows} 条，耗时 {time.perf_counter() - started:.1f}s")
+
+    def _measure(self, func: Callable[[], None], iterations: int) -> List[float]:
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def _report(self, label: str, timings: List[float]):
+        ordered = sorted(timings)
+        p95 = ordered[min(len(ordered) - 1, int(round(len(ordered) * 0.95)) - 1)]
+        self.stdout.write(
+            f"  {label:<28} p50={statistics.median(ordered):8.1f}ms  p95={p95:8.1f}ms  max={ordered[-1]:8.1f}ms"
+        )
+
+    def _benchmark(self, page_size: int, iterations: int):
+        status_counts = get_test_case_stats()['status']
+        for status, _ in STATUS_WEIGHTS:
+            total = status_counts.get(status, 0)
+            num_pages = max(1, (total + page_size - 1) // page_size)
+            depths = sorted({1, max(1, num_pages // 10), max(1, num_pages // 2), max(1, num_pages * 9 // 10), num_pages})
+            self.stdout.write(self.style.MIGRATE_HEADING(f"状态 {status}: {total} 条, {num_pages} 页"))
+            timings: Dict[str, List[float]] = {'offset': [], 'keyset': []}
+            deepest = None
+
+            for depth in depths:
+                queryset = TestCase.objects.filter(status=status)
+
+                def offset_page(depth=depth, queryset=queryset):
+                    # 原实现: 每次请求新建 Paginator，执行 COUNT(*) 与 OFFSET 查询
+                    paginator = Paginator(queryset.order_by('-created_at'), page_size)
+                    list(paginator.page(min(depth, paginator.num_pages)).object_list)
+
+                keyset_paginator = KeysetPaginator(queryset, page_size, count=total)
+                # 游标取自目标页前一页的末行（不计入耗时），模拟用户逐页点击"下一页"到达该页
+                cursor = None
+                if depth > 1:
+                    previous_row = keyset_paginator.object_list[(depth - 1) * page_size - 1:(depth - 1) * page_size]
+                    previous_row = list(previous_row)
+                    cursor = keyset_paginator.encode_cursor(previous_row[0]) if previous_row else None
+
+                def keyset_page(depth=depth, cursor=cursor, paginator=keyset_paginator):
+                    if cursor:
+                        list(paginator.page_after(cursor, depth).object_list)
+                    else:
+                        list(paginator.get_page(1).object_list)
+
+                if cursor:
+                    deepest = (keyset_paginator, cursor)
+
+                offset_result = self._measure(offset_page, iterations)
+                keyset_result = self._measure(keyset_page, iterations)
+                timings['offset'].extend(offset_result)
+                timings['keyset'].extend(keyset_result)
+                self._report(f"第 {depth} 页 offset", offset_result)
+                self._report(f"第 {depth} 页 keyset", keyset_result)
+
+            self._report("全部页深度 offset", timings['offset'])
+            self._report("全部页深度 keyset", timings['keyset'])
+
+            if deepest and connection.vendor == 'mysql':
+                paginator, cursor = deepest
+                values = paginator.decode_cursor(cursor)
+                plan = paginator.object_list.filter(paginator._keyset_filter(values, 'lt'))[:page_size].explain()
+                self.stdout.write(f"  最深页 keyset 查询计划:\n{plan}")
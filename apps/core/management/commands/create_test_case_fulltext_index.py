@@ -0,0 +1,57 @@
+"""
+创建测试用例全文索引
+
+在 TestCase 的 title、description、test_steps、expected_results、requirements 上创建 MySQL FULLTEXT 索引，
+使用 ngram 解析器以支持中文检索（ngram_token_size 为 MySQL 服务端参数，默认 2）。
+Django 的模型索引无法声明 FULLTEXT/WITH PARSER，因此由本命令单独创建；大表上建索引耗时较长，请在低峰期执行。
+
+示例：
+    python manage.py create_test_case_fulltext_index
+    python manage.py create_test_case_fulltext_index --drop
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.core.models import TestCase
+from apps.core.test_case_search import (
+    FULLTEXT_INDEX_NAME, SEARCH_FIELDS, fulltext_index_exists, is_fulltext_available
+)
+
+
+class Command(BaseCommand):
+    help = "为测试用例创建 MySQL ngram 全文索引（用于用例全文检索）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drop', action='store_true', help='删除全文索引，检索退化为 icontains')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            raise CommandError(f"全文索引仅支持 MySQL, 当前数据库: {connection.vendor}")
+
+        quote = connection.ops.quote_name
+        table = quote(TestCase._meta.db_table)
+        exists = fulltext_index_exists()
+
+        if options['drop']:
+            if not exists:
+                self.stdout.write("全文索引不存在, 无需删除")
+                return
+            with connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {table} DROP INDEX {quote(FULLTEXT_INDEX_NAME)}")
+            is_fulltext_available(refresh=True)
+            self.stdout.write(self.style.SUCCESS(f"已删除全文索引 {FULLTEXT_INDEX_NAME}"))
+            return
+
+        if exists:
+            self.stdout.write(f"全文索引 {FULLTEXT_INDEX_NAME} 已存在")
+            return
+
+        columns = ', '.join(quote(TestCase._meta.get_field(field).column) for field in SEARCH_FIELDS)
+        self.stdout.write(f"正在创建全文索引 {FULLTEXT_INDEX_NAME} ({columns}) ...")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"ALTER TABLE {table} ADD FULLTEXT INDEX {quote(FULLTEXT_INDEX_NAME)} ({columns}) WITH PARSER ngram"
+            )
+        is_fulltext_available(refresh=True)
+        self.stdout.write(self.style.SUCCESS(f"已创建全文索引 {FULLTEXT_INDEX_NAME}"))
@@ -0,0 +1,22 @@
+"""
+重建测试用例统计计数
+
+计数随用例增删改增量维护；直接修改数据库、导入数据等绕过 ORM 的操作后，运行本命令以一次分组查询重建。
+
+示例：
+    python manage.py rebuild_test_case_stats
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.core.test_case_stats import rebuild_test_case_stats
+
+
+class Command(BaseCommand):
+    help = "以一次分组查询重建测试用例状态/BU/优先级计数"
+
+    def handle(self, *args, **options):
+        stats = rebuild_test_case_stats()
+        self.stdout.write(self.style.SUCCESS(f"用例总数: {stats['total']}"))
+        for dimension in ('status', 'bu', 'priority'):
+            self.stdout.write(f"{dimension}: {stats[dimension]}")
@@ -0,0 +1,45 @@
+"""
+后台任务 worker 命令
+
+认领 Job 表中排队的任务，在线程池/进程池中执行；收到 SIGTERM/SIGINT 后停止认领新任务，
+等待运行中的任务完成后退出。被强制杀死时，运行中的任务会在心跳超时后由其他 worker 重新排队。
+
+示例：
+    python manage.py run_jobs
+    python manage.py run_jobs --threads 8 --processes 2
+    python manage.py run_jobs --job-types iface_case_generation test_case_generation
+"""
+
+import signal
+
+from django.core.management.base import BaseCommand
+
+from apps.utils.job_queue import JobWorker
+
+
+class Command(BaseCommand):
+    help = "运行后台任务 worker，执行排队中的 Agent 任务"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=None, help='线程池大小，缺省使用 JOB_QUEUE_CONFIG')
+        parser.add_argument('--processes', type=int, default=None, help='进程池大小，缺省使用 JOB_QUEUE_CONFIG')
+        parser.add_argument('--job-types', nargs='*', default=None, help='只执行指定类型的任务')
+        parser.add_argument('--once', action='store_true', help='只认领一轮任务，执行完成后退出')
+
+    def handle(self, *args, **options):
+        worker = JobWorker(
+            thread_workers=options['threads'],
+            process_workers=options['processes'],
+            job_types=options['job_types'],
+        )
+
+        def _shutdown(signum, frame):
+            self.stdout.write("收到退出信号，等待运行中的任务完成...")
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, _shutdown)
+        signal.signal(signal.SIGINT, _shutdown)
+
+        self.stdout.write(self.style.SUCCESS(f"任务 worker 已启动: {worker.worker_id}"))
+        worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS("任务 worker 已退出"))
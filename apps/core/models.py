@@ -1,5 +1,16 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+class TestCaseQuerySet(models.QuerySet):
+    """测试用例查询集：bulk_create 不触发模型信号，在这里同步更新统计计数"""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        from apps.core.test_case_stats import record_created
+        record_created(created)
+        return created
+
 
 class TestCase(models.Model):
     """测试用例模型"""
@@ -56,6 +67,8 @@ class TestCase(models.Model):
     bu = models.CharField(max_length=50, choices=BU_CHOICES, blank=True, verbose_name='BU')
     feature = models.CharField(max_length=100, blank=True, verbose_name='Feature')
     priority = models.CharField(max_length=2, choices=PRIORITY_CHOICES, blank=True, verbose_name='Priority')
+
+    objects = TestCaseQuerySet.as_manager()
     
     def __str__(self):
         return (
@@ -67,9 +80,20 @@ class TestCase(models.Model):
     class Meta:
         verbose_name = "测试用例"
         verbose_name_plural = "测试用例"
+        # 评审列表按状态筛选、按创建时间倒序键集分页；InnoDB 二级索引隐含主键，等价于 (status, created_at, id)
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='testcase_status_created_idx'),
+            models.Index(fields=['bu', 'feature'], name='testcase_bu_feature_idx'),
+            models.Index(fields=['llm_provider', 'created_at'], name='testcase_provider_created_idx'),
+            models.Index(fields=['created_at'], name='testcase_created_idx'),
+        ]
 
 class TestCaseReview(models.Model):
-    """测试用例评审记录"""
+    """测试用例评审记录
+
+    AI评审时 reviewer 为空，并记录评审时用例内容（描述+步骤+预期结果）的哈希与所用模型；
+    用例内容未变化时再次评审直接返回已保存的结果。
+    """
     test_case = models.ForeignKey(
         TestCase, 
         on_delete=models.CASCADE, 
@@ -80,9 +104,15 @@ class TestCaseReview(models.Model):
         User, 
         on_delete=models.CASCADE, 
         related_name='reviews',
-        verbose_name="评审人"
+        verbose_name="评审人",
+        null=True,
+        blank=True
     )
     review_comments = models.TextField(verbose_name="评审意见")
+    review_result = models.JSONField(null=True, blank=True, verbose_name="结构化评审结果")
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, verbose_name="用例内容哈希")
+    llm_provider = models.CharField(max_length=50, blank=True, verbose_name="LLM提供商")
+    llm_model = models.CharField(max_length=100, blank=True, verbose_name="LLM模型")
     review_date = models.DateTimeField(auto_now_add=True, verbose_name="评审时间")
     
     def __str__(self):
@@ -91,12 +121,52 @@ class TestCaseReview(models.Model):
     class Meta:
         verbose_name = "测试用例评审"
         verbose_name_plural = "测试用例评审"
+        indexes = [
+            models.Index(fields=['test_case', 'content_hash'], name='review_case_hash_idx'),
+        ]
+
+class TestCaseStatCounter(models.Model):
+    """测试用例统计计数
+
+    按维度（status/bu/priority）和取值保存用例数，由 apps.core.test_case_stats 在用例增删改时增量维护，
+    首页、评审页读取计数时无需扫描 TestCase 全表。
+    """
+    dimension = models.CharField(max_length=20, verbose_name="统计维度")
+    value = models.CharField(max_length=50, blank=True, verbose_name="维度取值")
+    count = models.BigIntegerField(default=0, verbose_name="用例数")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    def __str__(self):
+        return f"{self.dimension}={self.value}: {self.count}"
+
+    class Meta:
+        verbose_name = "测试用例统计"
+        verbose_name_plural = "测试用例统计"
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'value'], name='uniq_case_stat_dimension_value'),
+        ]
 
 class KnowledgeBase(models.Model):
     """知识库条目"""
+    SYNC_STATUS_CHOICES = [
+        ('pending', '待同步'),
+        ('synced', '已同步'),
+        ('failed', '同步失败'),
+    ]
+
     title = models.CharField(max_length=200, verbose_name="知识条目标题")
     content = models.TextField(verbose_name="知识内容")
     vector_id = models.CharField(max_length=100, blank=True, verbose_name="向量ID")
+    source = models.CharField(max_length=512, blank=True, db_index=True, verbose_name="来源文件")
+    doc_type = models.CharField(max_length=32, blank=True, verbose_name="文档类型")
+    chunk_id = models.CharField(max_length=128, blank=True, verbose_name="分片ID")
+    sync_status = models.CharField(
+        max_length=20,
+        choices=SYNC_STATUS_CHOICES,
+        default='pending',
+        db_index=True,
+        verbose_name="向量同步状态"
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
     
@@ -105,4 +175,117 @@ class KnowledgeBase(models.Model):
     
     class Meta:
         verbose_name = "知识库"
-        verbose_name_plural = "知识库" 
\ No newline at end of file
+        verbose_name_plural = "知识库" 
+
+
+class KnowledgeSyncOutbox(models.Model):
+    """知识库向量同步待办(outbox)
+
+    与 KnowledgeBase 行在同一事务中写入，由同步任务批量写入/删除 Milvus 向量，保证 MySQL 与 Milvus 最终一致。
+    """
+    OPERATION_CHOICES = [
+        ('upsert', '写入/更新向量'),
+        ('delete', '删除向量'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', '待处理'),
+        ('processing', '处理中'),
+        ('done', '已完成'),
+        ('failed', '失败'),
+    ]
+
+    knowledge_id = models.BigIntegerField(db_index=True, verbose_name="知识条目ID")
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES, verbose_name="操作")
+    vector_id = models.CharField(max_length=100, blank=True, verbose_name="待删除的向量ID")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="状态")
+    attempts = models.IntegerField(default=0, verbose_name="尝试次数")
+    last_error = models.TextField(blank=True, verbose_name="最近一次错误")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="最早执行时间")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    def __str__(self):
+        return f"{self.operation} knowledge#{self.knowledge_id} ({self.status})"
+
+    class Meta:
+        verbose_name = "知识库同步待办"
+        verbose_name_plural = "知识库同步待办"
+        indexes = [
+            models.Index(fields=['status', 'run_after', 'id']),
+        ]
+
+class GenerationResultCache(models.Model):
+    """测试用例生成结果缓存
+
+    以需求文本、设计方法、用例类型、用例条数及提供商/模型的哈希为键保存生成结果，
+    相同请求直接返回已保存的结果，避免重复调用LLM；用户可通过"重新生成"跳过缓存。
+    """
+    cache_key = models.CharField(max_length=64, unique=True, verbose_name="缓存键")
+    requirements = models.TextField(verbose_name="需求描述")
+    case_design_methods = models.JSONField(default=list, verbose_name="用例设计方法")
+    case_categories = models.JSONField(default=list, verbose_name="用例类型")
+    case_count = models.IntegerField(verbose_name="用例条数")
+    llm_provider = models.CharField(max_length=50, blank=True, verbose_name="LLM提供商")
+    llm_model = models.CharField(max_length=100, blank=True, verbose_name="LLM模型")
+    test_cases = models.JSONField(default=list, verbose_name="生成结果")
+    hit_count = models.IntegerField(default=0, verbose_name="命中次数")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    def __str__(self):
+        return f"{self.cache_key[:12]} ({self.case_count}条, {self.llm_provider})"
+
+    class Meta:
+        verbose_name = "用例生成结果缓存"
+        verbose_name_plural = "用例生成结果缓存"
+
+
+class Job(models.Model):
+    """后台任务
+
+    长耗时的 Agent 工作（用例生成、PRD分析、代码分析等）写入任务表后立即返回，由任务 worker
+    （python manage.py run_jobs 或 Web 进程内嵌 worker）按优先级认领执行；任务状态持久化在数据库中，
+    worker 重启后心跳超时的运行中任务会被重新排队。
+    """
+    STATUS_CHOICES = [
+        ('pending', '排队中'),
+        ('running', '运行中'),
+        ('succeeded', '成功'),
+        ('failed', '失败'),
+        ('cancelled', '已取消'),
+    ]
+
+    POOL_CHOICES = [
+        ('thread', '线程池'),
+        ('process', '进程池'),
+    ]
+
+    job_type = models.CharField(max_length=50, db_index=True, verbose_name="任务类型")
+    task_id = models.CharField(max_length=100, db_index=True, blank=True, verbose_name="进度任务ID")
+    pool = models.CharField(max_length=10, choices=POOL_CHOICES, default='thread', verbose_name="执行池")
+    priority = models.IntegerField(default=0, verbose_name="优先级")  # 数值越大越先执行
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="状态")
+    payload = models.JSONField(default=dict, verbose_name="任务参数")
+    result = models.JSONField(null=True, blank=True, verbose_name="任务结果")
+    progress = models.JSONField(default=dict, blank=True, verbose_name="进度快照")
+    error = models.TextField(blank=True, verbose_name="错误信息")
+    attempts = models.IntegerField(default=0, verbose_name="尝试次数")
+    max_attempts = models.IntegerField(default=3, verbose_name="最大尝试次数")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="最早执行时间")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="执行worker")
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name="最近心跳时间")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="开始时间")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="结束时间")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    def __str__(self):
+        return f"{self.job_type}#{self.id} ({self.status})"
+
+    class Meta:
+        verbose_name = "后台任务"
+        verbose_name_plural = "后台任务"
+        indexes = [
+            models.Index(fields=['status', 'pool', 'priority', 'id']),
+        ]
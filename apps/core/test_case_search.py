@@ -0,0 +1,201 @@
+"""
+测试用例全文检索
+
+在 title、description、test_steps、expected_results、requirements 上检索：
+- MySQL 上已创建 FULLTEXT 索引（WITH PARSER ngram，python manage.py create_test_case_fulltext_index）时，
+  使用 MATCH ... AGAINST（BOOLEAN MODE）检索并按相关度排序，中文按 ngram 切分无需分词
+- 否则（未建索引、非 MySQL、检索词短于 ngram_token_size）退化为 icontains 查询，在最近的 max_candidates 条
+  匹配中按字段加权的命中次数排序
+结果附带高亮片段，命中的检索词以 <mark> 包裹，其余内容已做 HTML 转义。
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from apps.core.models import TestCase
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_SEARCH_CONFIG = {
+    'page_size': 20,
+    'max_page_size': 100,
+    'ngram_token_size': 2,  # 与 MySQL 的 ngram_token_size 一致，短于该长度的检索词无法命中全文索引
+    'max_candidates': 500,
+    'snippet_length': 120,
+}
+
+SEARCH_FIELDS: Tuple[str, ...] = ('title', 'description', 'test_steps', 'expected_results', 'requirements')
+# icontains 退化检索时各字段的命中权重
+FIELD_WEIGHTS = {'title': 3, 'description': 2, 'test_steps': 1, 'expected_results': 1, 'requirements': 1}
+FULLTEXT_INDEX_NAME = 'testcase_fulltext_idx'
+RESULT_FIELDS = ('id', 'status', 'bu', 'feature', 'priority', 'created_at') + SEARCH_FIELDS
+
+# BOOLEAN MODE 中有特殊含义的字符
+_BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]')
+
+_fulltext_available: Optional[bool] = None
+
+
+def get_search_config() -> Dict[str, Any]:
+    """读取 settings.TEST_CASE_SEARCH_CONFIG，缺省项使用默认值"""
+    config = dict(DEFAULT_SEARCH_CONFIG)
+    config.update(getattr(settings, 'TEST_CASE_SEARCH_CONFIG', {}) or {})
+    return config
+
+
+def fulltext_index_exists() -> bool:
+    """查询当前数据库中 TestCase 表是否已有全文索引"""
+    if connection.vendor != 'mysql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+            [TestCase._meta.db_table, FULLTEXT_INDEX_NAME],
+        )
+        return cursor.fetchone()[0] > 0
+
+
+def is_fulltext_available(refresh: bool = False) -> bool:
+    """全文索引是否可用，结果在进程内缓存；创建/删除索引的命令会刷新缓存"""
+    global _fulltext_available
+    if _fulltext_available is None or refresh:
+        try:
+            _fulltext_available = fulltext_index_exists()
+        except Exception as e:
+            logger.warning(f"检查全文索引失败, 使用 icontains 检索: {str(e)}")
+            _fulltext_available = False
+    return _fulltext_available
+
+
+def parse_query_terms(query: str) -> List[str]:
+    """按空白拆分检索词，去掉 BOOLEAN MODE 操作符，去重并保持顺序"""
+    terms = []
+    for term in _BOOLEAN_OPERATORS.sub(' ', query or '').split():
+        if term.lower() not in (existing.lower() for existing in terms):
+            terms.append(term)
+    return terms
+
+
+def _fulltext_search(queryset: QuerySet, terms: List[str]) -> QuerySet:
+    # 每个检索词作为短语且必须出现；ngram 解析器会把短语切为连续的 n 元组匹配
+    boolean_query = ' '.join(f'+"{term}"' for term in terms)
+    columns = ', '.join(connection.ops.quote_name(TestCase._meta.get_field(field).column) for field in SEARCH_FIELDS)
+    score = RawSQL(f"MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)", (boolean_query,))
+    return queryset.annotate(score=score).filter(score__gt=0).order_by('-score', '-id')
+
+
+def _contains_filter(terms: List[str]) -> Q:
+    condition = Q()
+    for term in terms:
+        term_condition = Q()
+        for field in SEARCH_FIELDS:
+            term_condition |= Q(**{f'{field}__icontains': term})
+        condition &= term_condition
+    return condition
+
+
+def _contains_score(row: Dict[str, Any], terms: List[str]) -> int:
+    score = 0
+    for field in SEARCH_FIELDS:
+        text = (row.get(field) or '').lower()
+        score += FIELD_WEIGHTS[field] * sum(text.count(term.lower()) for term in terms)
+    return score
+
+
+def highlight(text: str, terms: Sequence[str], snippet_length: Optional[int] = None) -> str:
+    """返回高亮后的文本片段
+
+    Args:
+        text: 原文
+        terms: 检索词（不区分大小写）
+        snippet_length: 片段长度，以第一个命中位置为中心截取；为 None 时返回全文
+    """
+    text = text or ''
+    pattern = re.compile('|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE) \
+        if terms else None
+    start, end = 0, len(text)
+    if snippet_length and len(text) > snippet_length:
+        match = pattern.search(text) if pattern else None
+        center = match.start() if match else 0
+        start = max(0, min(center - snippet_length // 3, len(text) - snippet_length))
+        end = start + snippet_length
+    snippet = text[start:end]
+
+    parts = []
+    position = 0
+    for match in (pattern.finditer(snippet) if pattern else []):
+        parts.append(escape(snippet[position:match.start()]))
+        parts.append(f'<mark>{escape(match.group(0))}</mark>')
+        position = match.end()
+    parts.append(escape(snippet[position:]))
+    return ('…' if start > 0 else '') + ''.join(parts) + ('…' if end < len(text) else '')
+
+
+def _to_result(row: Dict[str, Any], terms: List[str], snippet_length: int) -> Dict[str, Any]:
+    lowered_terms = [term.lower() for term in terms]
+    highlights = {
+        field: highlight(row.get(field) or '', terms, snippet_length)
+        for field in SEARCH_FIELDS
+        if any(term in (row.get(field) or '').lower() for term in lowered_terms)
+    }
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'status': row['status'],
+        'bu': row['bu'],
+        'feature': row['feature'],
+        'priority': row['priority'],
+        'created_at': row['created_at'],
+        'score': row.get('score'),
+        'highlights': highlights,
+    }
+
+
+def search_test_cases(query: str,
+                      status: Optional[str] = None,
+                      page: int = 1,
+                      page_size: Optional[int] = None) -> Dict[str, Any]:
+    """检索测试用例
+
+    Returns:
+        {'results': [...], 'total': 命中数, 'page': 页码, 'page_size': 每页条数, 'mode': 'fulltext'/'icontains'}
+    """
+    config = get_search_config()
+    page_size = min(max(1, int(page_size or config['page_size'])), config['max_page_size'])
+    page = max(1, int(page or 1))
+    terms = parse_query_terms(query)
+    response = {'results': [], 'total': 0, 'page': page, 'page_size': page_size, 'mode': 'icontains'}
+    if not terms:
+        return response
+
+    queryset = TestCase.objects.all()
+    if status:
+        queryset = queryset.filter(status=status)
+    offset = (page - 1) * page_size
+
+    if is_fulltext_available() and all(len(term) >= config['ngram_token_size'] for term in terms):
+        matched = _fulltext_search(queryset, terms)
+        response['mode'] = 'fulltext'
+        response['total'] = matched.count()
+        rows = list(matched.values(*RESULT_FIELDS, 'score')[offset:offset + page_size])
+    else:
+        candidates = list(
+            queryset.filter(_contains_filter(terms)).order_by('-id').values(*RESULT_FIELDS)[:config['max_candidates']]
+        )
+        for row in candidates:
+            row['score'] = _contains_score(row, terms)
+        candidates.sort(key=lambda row: (-row['score'], -row['id']))
+        response['total'] = len(candidates)
+        response['truncated'] = len(candidates) >= config['max_candidates']
+        rows = candidates[offset:offset + page_size]
+
+    response['results'] = [_to_result(row, terms, config['snippet_length']) for row in rows]
+    return response
@@ -0,0 +1,453 @@
+"""
+测试用例查询与导出
+
+- filter_test_cases: 按筛选条件（状态、BU、Feature、创建日期范围）构造查询，显式ID列表单独传递
+- iter_test_case_rows: 分批读取，内存占用与总行数无关
+  （MySQL 驱动会把整个结果集读入客户端，QuerySet.iterator() 无法做到流式读取）
+  - 指定ID时按ID升序切分为 id_chunk_size 个一组的 IN 查询，不会生成超长的 IN 列表
+  - 未指定ID时按主键键集分页（id > 上一批最大id）
+- stream_test_cases_json: 边查询边输出 JSON，不在内存中拼装完整响应
+- XLSX 导出使用 XlsxWriter 的 constant_memory 模式逐行写入临时文件，再以文件流返回；
+  超过单个工作表行数上限（1048576 行，含表头）时自动续写到新的工作表
+- CSV 导出边读取边输出，不落盘
+- bulk_update_test_cases/bulk_delete_test_cases: 按ID组或筛选条件批量修改、删除，同步维护统计计数与评审记录
+"""
+
+import csv
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import xlsxwriter
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import QuerySet
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.core.models import TestCase, TestCaseReview
+from apps.core.test_case_stats import record_changes, record_deleted, stat_groups, suppress_delete_accounting
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_EXPORT_CONFIG = {
+    'batch_size': 1000,
+    'id_chunk_size': 1000,
+    'max_ids': 100000,
+}
+
+# 批量获取接口可返回的字段
+FETCH_FIELDS = (
+    'id', 'title', 'description', 'test_steps', 'expected_results', 'status',
+    'requirements', 'llm_provider', 'bu', 'feature', 'priority', 'created_at', 'updated_at',
+)
+DEFAULT_FETCH_FIELDS = (
+    'id', 'title', 'description', 'test_steps', 'expected_results', 'status', 'requirements', 'llm_provider',
+)
+# 批量修改接口可修改的字段
+BULK_UPDATE_FIELDS = ('status', 'bu', 'feature', 'priority')
+
+# 导出列: (字段名, 表头)
+EXPORT_COLUMNS: List[Tuple[str, str]] = [
+    ('id', '用例ID'),
+    ('title', '用例标题'),
+    ('description', '用例描述'),
+    ('test_steps', '测试步骤'),
+    ('expected_results', '预期结果'),
+    ('status', '状态'),
+    ('bu', 'BU'),
+    ('feature', 'Feature'),
+    ('priority', '优先级'),
+    ('created_at', '创建时间'),
+]
+
+# Excel 单元格最多容纳的字符数
+XLSX_CELL_MAX_CHARS = 32767
+# Excel 单个工作表最多行数（含表头）；XlsxWriter 超出时不报错，只返回 -1
+XLSX_MAX_ROWS = 1048576
+
+
+def get_export_config() -> Dict[str, Any]:
+    """读取 settings.TEST_CASE_EXPORT_CONFIG，缺省项使用默认值"""
+    config = dict(DEFAULT_EXPORT_CONFIG)
+    config.update(getattr(settings, 'TEST_CASE_EXPORT_CONFIG', {}) or {})
+    return config
+
+
+def parse_id_list(ids: Any) -> List[int]:
+    """解析逗号分隔的ID字符串或ID列表，去重并升序返回；非法ID或数量超过上限时抛出 ValueError"""
+    if not ids:
+        return []
+    if isinstance(ids, str):
+        ids = ids.split(',')
+    try:
+        id_list = sorted({int(str(test_case_id).strip()) for test_case_id in ids if str(test_case_id).strip()})
+    except (TypeError, ValueError):
+        raise ValueError('测试用例ID格式不正确')
+    max_ids = get_export_config()['max_ids']
+    if len(id_list) > max_ids:
+        raise ValueError(f'单次最多处理 {max_ids} 条测试用例')
+    return id_list
+
+
+def filter_test_cases(status: Optional[str] = None,
+                      bu: Optional[str] = None,
+                      feature: Optional[str] = None,
+                      created_from: Optional[str] = None,
+                      created_to: Optional[str] = None) -> QuerySet:
+    """按筛选条件构造测试用例查询，条件之间为"且"关系，全部为空时返回所有用例
+
+    Args:
+        status/bu/feature: 精确匹配
+        created_from/created_to: 创建日期范围（YYYY-MM-DD，含首尾两天）
+    """
+    queryset = TestCase.objects.all()
+    if status:
+        queryset = queryset.filter(status=status)
+    if bu:
+        queryset = queryset.filter(bu=bu)
+    if feature:
+        queryset = queryset.filter(feature=feature)
+    for value, lookup in ((created_from, 'created_at__date__gte'), (created_to, 'created_at__date__lte')):
+        if not value:
+            continue
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f'日期格式不正确: {value}，应为YYYY-MM-DD')
+        queryset = queryset.filter(**{lookup: date})
+    return queryset
+
+
+def select_test_cases(params: Any) -> Tuple[QuerySet, List[int]]:
+    """从请求参数（request.GET/request.POST 或 JSON 字典）解析筛选条件和显式ID
+
+    Returns:
+        (筛选后的查询集, 升序ID列表)；ID列表为空表示不限制ID
+    """
+    ids = params.get('ids')
+    if hasattr(params, 'getlist') and len(params.getlist('ids')) > 1:
+        ids = params.getlist('ids')
+    queryset = filter_test_cases(
+        status=params.get('status'),
+        bu=params.get('bu'),
+        feature=params.get('feature'),
+        created_from=params.get('created_from'),
+        created_to=params.get('created_to'),
+    )
+    return queryset, parse_id_list(ids)
+
+
+def _chunks(items: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def count_test_cases(queryset: QuerySet, ids: Optional[Sequence[int]] = None) -> int:
+    """统计选中的用例数，指定ID时分组执行 IN 查询"""
+    if not ids:
+        return queryset.count()
+    chunk_size = get_export_config()['id_chunk_size']
+    return sum(queryset.filter(id__in=chunk).count() for chunk in _chunks(ids, chunk_size))
+
+
+def iter_test_case_rows(queryset: QuerySet, fields: Sequence[str],
+                        ids: Optional[Sequence[int]] = None,
+                        batch_size: Optional[int] = None) -> Iterator[Tuple[Any, ...]]:
+    """按主键升序分批读取用例，逐行产出 fields 对应的值元组
+
+    指定 ids（升序）时每批查询一组ID；否则每批查询 id > 上一批最大id 的前 batch_size 条，
+    两种方式都走主键索引，不使用 OFFSET。
+    """
+    config = get_export_config()
+    fields = list(fields)
+    if ids:
+        for chunk in _chunks(ids, config['id_chunk_size']):
+            yield from queryset.filter(id__in=chunk).order_by('id').values_list(*fields).iterator()
+        return
+
+    batch_size = batch_size or config['batch_size']
+    if 'id' in fields:
+        id_index = fields.index('id')
+        select_fields = fields
+    else:
+        id_index = len(fields)
+        select_fields = fields + ['id']
+    last_id = 0
+    while True:
+        batch = list(
+            queryset.filter(id__gt=last_id).order_by('id').values_list(*select_fields)[:batch_size]
+        )
+        if not batch:
+            return
+        for row in batch:
+            yield row if select_fields is fields else row[:-1]
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1][id_index]
+
+
+def iter_test_cases(queryset: QuerySet, fields: Sequence[str] = DEFAULT_FETCH_FIELDS,
+                    ids: Optional[Sequence[int]] = None) -> Iterator[Dict[str, Any]]:
+    """与 iter_test_case_rows 相同，逐条产出字段字典"""
+    fields = list(fields)
+    for row in iter_test_case_rows(queryset, fields, ids=ids):
+        yield dict(zip(fields, row))
+
+
+def fetch_test_cases(ids: Any, fields: Sequence[str] = DEFAULT_FETCH_FIELDS) -> List[Dict[str, Any]]:
+    """按ID批量获取用例字段字典（按ID升序，不存在的ID忽略）"""
+    id_list = parse_id_list(ids)
+    if not id_list:
+        return []
+    return list(iter_test_cases(TestCase.objects.all(), fields, ids=id_list))
+
+
+def parse_fetch_fields(fields: Any) -> Tuple[str, ...]:
+    """校验批量获取接口请求的字段列表，未指定时使用默认字段"""
+    if not fields:
+        return DEFAULT_FETCH_FIELDS
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    fields = [str(field).strip() for field in fields if str(field).strip()]
+    invalid = [field for field in fields if field not in FETCH_FIELDS]
+    if invalid:
+        raise ValueError(f'不支持的字段: {", ".join(invalid)}')
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return tuple(fields)
+
+
+def stream_test_cases_json(test_cases: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """逐条输出 {"success": true, "test_cases": [...], "count": N}
+
+    成功标志在查询开始前已输出，查询中途出错时以 "error" 字段结尾，客户端据此判断结果不完整。
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    yield '{"success": true, "test_cases": ['
+    count = 0
+    error = None
+    try:
+        for test_case in test_cases:
+            yield (',' if count else '') + encoder.encode(test_case)
+            count += 1
+    except Exception as e:
+        logger.error(f"批量获取测试用例中断: {str(e)}", exc_info=True)
+        error = f'获取测试用例失败: {str(e)}'
+    tail = {'count': count}
+    if error:
+        tail['error'] = error
+    yield '], ' + encoder.encode(tail)[1:]
+
+
+def test_cases_json_response(queryset: QuerySet, ids: Optional[Sequence[int]] = None,
+                             fields: Sequence[str] = DEFAULT_FETCH_FIELDS) -> StreamingHttpResponse:
+    """批量获取用例的流式 JSON 响应"""
+    return StreamingHttpResponse(
+        stream_test_cases_json(iter_test_cases(queryset, fields, ids=ids)),
+        content_type='application/json',
+    )
+
+
+def _format_cell(value: Any) -> Any:
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def _export_filename(extension: str, case_count: int) -> str:
+    current_time = datetime.now().strftime('%Y%m%d_%H%M%S')  # 格式：20240319_153021
+    return f"test_cases_{current_time}_{case_count}_cases.{extension}"
+
+
+def _check_written(result: int, row: int) -> None:
+    # XlsxWriter 写入失败时返回负数而不抛异常（-2 为字符串被截断，已提前截断不会出现）
+    if result is not None and result < 0:
+        raise ValueError(f"写入xlsx第 {row} 行失败, 返回码: {result}")
+
+
+def write_xlsx(queryset: QuerySet, output: Any, ids: Optional[Sequence[int]] = None) -> int:
+    """将用例以 constant_memory 模式写入 xlsx 文件对象，返回实际写入的用例数
+
+    每个工作表写满 XLSX_MAX_ROWS - 1 条用例后续写到下一个工作表（测试用例、测试用例(2)...），序号连续。
+    """
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'strings_to_numbers': False,
+                                            'strings_to_formulas': False, 'strings_to_urls': False})
+    header_format = workbook.add_format({'bold': True})
+    text_format = workbook.add_format({'text_wrap': True, 'valign': 'top'})
+    headers = ['序号'] + [header for _, header in EXPORT_COLUMNS]
+    rows_per_sheet = XLSX_MAX_ROWS - 1
+
+    def add_sheet(number: int):
+        sheet = workbook.add_worksheet('测试用例' if number == 1 else f'测试用例({number})')
+        sheet.set_column(0, 0, 8)
+        sheet.set_column(1, len(headers) - 1, 30)
+        _check_written(sheet.write_row(0, 0, headers, header_format), 0)
+        return sheet
+
+    worksheet = add_sheet(1)
+    count = 0
+    fields = [field for field, _ in EXPORT_COLUMNS]
+    for count, row in enumerate(iter_test_case_rows(queryset, fields, ids=ids), start=1):
+        sheet_row = (count - 1) % rows_per_sheet + 1
+        if sheet_row == 1 and count > 1:
+            worksheet = add_sheet((count - 1) // rows_per_sheet + 1)
+        _check_written(worksheet.write_number(sheet_row, 0, count), count)
+        for col, value in enumerate(row, start=1):
+            value = _format_cell(value)
+            if isinstance(value, str):
+                result = worksheet.write_string(sheet_row, col, value[:XLSX_CELL_MAX_CHARS], text_format)
+            else:
+                result = worksheet.write(sheet_row, col, value, text_format)
+            _check_written(result, count)
+    workbook.close()
+    return count
+
+
+def export_xlsx_response(queryset: QuerySet, ids: Optional[Sequence[int]] = None) -> FileResponse:
+    """导出 xlsx：逐行写入临时文件后以文件流返回，响应结束后临时文件自动删除"""
+    output = tempfile.TemporaryFile(suffix='.xlsx')
+    try:
+        count = write_xlsx(queryset, output, ids=ids)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    logger.info(f"导出xlsx完成, 用例数: {count}")
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=_export_filename('xlsx', count),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
+class _Echo:
+    """csv.writer 的伪文件对象，write 直接返回写入内容"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def iter_csv(queryset: QuerySet, ids: Optional[Sequence[int]] = None) -> Iterator[str]:
+    """逐行产出 CSV 文本，首行前带 UTF-8 BOM，便于 Excel 正确识别中文"""
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(['序号'] + [header for _, header in EXPORT_COLUMNS])
+    fields = [field for field, _ in EXPORT_COLUMNS]
+    for index, row in enumerate(iter_test_case_rows(queryset, fields, ids=ids), start=1):
+        yield writer.writerow([index] + [_format_cell(value) for value in row])
+
+
+def export_csv_response(queryset: QuerySet, ids: Optional[Sequence[int]] = None) -> StreamingHttpResponse:
+    """导出 CSV：边查询边输出"""
+    count = count_test_cases(queryset, ids)
+    response = StreamingHttpResponse(iter_csv(queryset, ids), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{_export_filename("csv", count)}"'
+    return response
+
+
+def validate_bulk_changes(changes: Any) -> Dict[str, Any]:
+    """校验批量修改的字段值，返回可直接用于 QuerySet.update 的字典"""
+    if not isinstance(changes, dict) or not changes:
+        raise ValueError('请提供要修改的字段')
+    invalid = [field for field in changes if field not in BULK_UPDATE_FIELDS]
+    if invalid:
+        raise ValueError(f'不支持批量修改的字段: {", ".join(invalid)}')
+    validated = {}
+    for field, value in changes.items():
+        value = '' if value is None else str(value).strip()
+        choices = TestCase._meta.get_field(field).choices
+        if choices and value not in {choice for choice, _ in choices}:
+            # 状态必须是有效取值，BU/优先级允许清空
+            if field == 'status' or value:
+                raise ValueError(f'{field} 的取值无效: {value}')
+        max_length = TestCase._meta.get_field(field).max_length
+        if max_length and len(value) > max_length:
+            raise ValueError(f'{field} 超过最大长度 {max_length}')
+        validated[field] = value
+    return validated
+
+
+def bulk_update_test_cases(queryset: QuerySet,
+                           changes: Dict[str, Any],
+                           ids: Optional[Sequence[int]] = None,
+                           comments: str = '',
+                           reviewer: Any = None) -> Dict[str, int]:
+    """以集合方式批量修改用例的状态/BU/Feature/优先级
+
+    指定 ids 时每组ID执行一条 UPDATE，否则对筛选结果执行一条 UPDATE；已是目标值的用例不修改。
+    修改前按统计维度分组计数，修改后同步增量更新统计计数；修改状态且填写了评审意见时，
+    为状态发生变化的用例批量写入评审记录。
+
+    Returns:
+        {'updated': 修改的用例数, 'reviews_created': 写入的评审记录数}
+    """
+    changes = validate_bulk_changes(changes)
+    # 所有字段都已是目标值的用例不再修改
+    target = queryset.exclude(**changes)
+    chunks = _chunks(ids, get_export_config()['id_chunk_size']) if ids else [None]
+    updated = reviews_created = 0
+    now = timezone.now()
+
+    with transaction.atomic():
+        for chunk in chunks:
+            selection = target.filter(id__in=chunk) if chunk is not None else target
+            review_ids = []
+            if 'status' in changes and comments:
+                review_ids = list(selection.exclude(status=changes['status']).values_list('id', flat=True))
+            groups = stat_groups(selection)
+            updated += selection.update(**changes, updated_at=now)
+            record_changes(groups, changes)
+            if review_ids:
+                TestCaseReview.objects.bulk_create([
+                    TestCaseReview(test_case_id=test_case_id, reviewer=reviewer, review_comments=comments)
+                    for test_case_id in review_ids
+                ], batch_size=1000)
+                reviews_created += len(review_ids)
+
+    logger.info(f"批量修改测试用例: {changes}, 修改 {updated} 条, 写入评审记录 {reviews_created} 条")
+    return {'updated': updated, 'reviews_created': reviews_created}
+
+
+def _iter_id_batches(queryset: QuerySet, ids: Optional[Sequence[int]], batch_size: int) -> Iterator[List[int]]:
+    """按主键升序分批产出选中用例的ID：指定 ids 时逐组过滤，否则按 id > 上一批最大id 键集分页"""
+    if ids:
+        for chunk in _chunks(ids, batch_size):
+            batch = list(queryset.filter(id__in=chunk).order_by('id').values_list('id', flat=True))
+            if batch:
+                yield batch
+        return
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def bulk_delete_test_cases(queryset: QuerySet, ids: Optional[Sequence[int]] = None) -> int:
+    """批量删除用例（评审记录级联删除），返回删除的用例数
+
+    按主键分批删除，每批一个事务，内存只与批大小有关；删除前按统计维度分组计数，
+    提交后一次性扣减统计计数，不再由每条用例的删除信号各自更新计数。
+    """
+    batch_size = get_export_config()['id_chunk_size']
+    deleted = 0
+    for batch in _iter_id_batches(queryset, ids, batch_size):
+        with transaction.atomic(), suppress_delete_accounting():
+            # 先锁定本批用例，保证分组计数与实际删除的行一致
+            batch = list(TestCase.objects.select_for_update().filter(id__in=batch).values_list('id', flat=True))
+            selection = TestCase.objects.filter(id__in=batch)
+            groups = stat_groups(selection)
+            _, per_model = selection.delete()
+            record_deleted(groups)
+        deleted += per_model.get(TestCase._meta.label, 0)
+    logger.info(f"批量删除测试用例 {deleted} 条")
+    return deleted
@@ -0,0 +1,248 @@
+"""
+测试用例统计（状态、BU、优先级计数）
+
+计数保存在 TestCaseStatCounter 表中：
+- rebuild_test_case_stats: 一次分组查询（GROUP BY status, bu, priority）重建全部计数
+- 用例增删改时通过模型信号（save/delete）及 TestCaseQuerySet.bulk_create 增量更新计数，
+  批量 UPDATE 由调用方在修改前后调用 stat_groups/record_changes；批量删除在 suppress_delete_accounting()
+  内执行并调用 record_deleted，按分组一次性扣减；增量在事务提交后执行，回滚的修改不会计入
+- get_test_case_stats: 读取计数表（行数只与维度取值个数有关），结果再缓存 cache_timeout 秒
+
+计数表为空（首次使用）时读取方会先重建；'total' 计数行同时作为已初始化标记，未初始化时跳过增量更新。
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, QuerySet
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from apps.core.models import TestCase, TestCaseStatCounter
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_STATS_CONFIG = {
+    'cache_timeout': 60,
+}
+
+STAT_DIMENSIONS = ('status', 'bu', 'priority')
+TOTAL_DIMENSION = 'total'
+STATS_CACHE_KEY = 'core:test_case_stats'
+
+StatKey = Tuple[str, str]
+
+# 批量删除由调用方按分组扣减计数，期间跳过逐条删除信号的计数
+_suppress_delete_accounting: ContextVar[bool] = ContextVar('suppress_delete_accounting', default=False)
+
+
+def get_stats_config() -> Dict[str, Any]:
+    """读取 settings.TEST_CASE_STATS_CONFIG，缺省项使用默认值"""
+    config = dict(DEFAULT_STATS_CONFIG)
+    config.update(getattr(settings, 'TEST_CASE_STATS_CONFIG', {}) or {})
+    return config
+
+
+def _counts_to_stats(counts: Dict[StatKey, int]) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {
+        'total': counts.get((TOTAL_DIMENSION, ''), 0),
+        # 首页、评审页使用的状态计数总是包含全部状态
+        'status': {value: 0 for value, _ in TestCase.STATUS_CHOICES},
+        'bu': {},
+        'priority': {},
+    }
+    for (dimension, value), count in counts.items():
+        if dimension in STAT_DIMENSIONS and count:
+            stats[dimension][value] = count
+    return stats
+
+
+def rebuild_test_case_stats() -> Dict[str, Any]:
+    """以一次分组查询重建全部计数，返回统计结果"""
+    counts: Counter = Counter()
+    rows = TestCase.objects.order_by().values(*STAT_DIMENSIONS).annotate(case_count=Count('id'))
+    for row in rows:
+        counts[(TOTAL_DIMENSION, '')] += row['case_count']
+        for dimension in STAT_DIMENSIONS:
+            counts[(dimension, row[dimension] or '')] += row['case_count']
+    counts.setdefault((TOTAL_DIMENSION, ''), 0)
+
+    with transaction.atomic():
+        TestCaseStatCounter.objects.all().delete()
+        TestCaseStatCounter.objects.bulk_create([
+            TestCaseStatCounter(dimension=dimension, value=value, count=count)
+            for (dimension, value), count in counts.items()
+        ])
+    cache.delete(STATS_CACHE_KEY)
+    logger.info(f"重建测试用例统计完成, 用例总数: {counts[(TOTAL_DIMENSION, '')]}")
+    return _counts_to_stats(counts)
+
+
+def get_test_case_stats() -> Dict[str, Any]:
+    """获取用例统计: {'total': 总数, 'status': {...}, 'bu': {...}, 'priority': {...}}"""
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is not None:
+        return stats
+    counts = {
+        (dimension, value): count
+        for dimension, value, count in TestCaseStatCounter.objects.values_list('dimension', 'value', 'count')
+    }
+    if (TOTAL_DIMENSION, '') not in counts:
+        stats = rebuild_test_case_stats()
+    else:
+        stats = _counts_to_stats(counts)
+    cache.set(STATS_CACHE_KEY, stats, get_stats_config()['cache_timeout'])
+    return stats
+
+
+def _apply_deltas(deltas: Dict[StatKey, int]) -> None:
+    total_delta = deltas.get((TOTAL_DIMENSION, ''), 0)
+    # 先更新总数行；该行不存在说明尚未初始化，留待首次读取时重建
+    if not TestCaseStatCounter.objects.filter(dimension=TOTAL_DIMENSION, value='').update(
+            count=F('count') + total_delta):
+        return
+    for (dimension, value), delta in deltas.items():
+        if dimension == TOTAL_DIMENSION or not delta:
+            continue
+        queryset = TestCaseStatCounter.objects.filter(dimension=dimension, value=value)
+        if queryset.update(count=F('count') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                TestCaseStatCounter.objects.create(dimension=dimension, value=value, count=delta)
+        except IntegrityError:
+            # 并发请求已创建该行
+            queryset.update(count=F('count') + delta)
+    cache.delete(STATS_CACHE_KEY)
+
+
+def apply_stat_deltas(deltas: Dict[StatKey, int]) -> None:
+    """在当前事务提交后按 {(维度, 取值): 增量} 更新计数"""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    def apply():
+        try:
+            _apply_deltas(deltas)
+        except Exception as e:
+            # 计数更新失败不影响用例本身的修改；删除总数行（初始化标记）和缓存，下次读取时整体重建
+            logger.error(f"更新测试用例统计失败: {str(e)}", exc_info=True)
+            try:
+                TestCaseStatCounter.objects.filter(dimension=TOTAL_DIMENSION, value='').delete()
+            except Exception as delete_error:
+                logger.error(f"删除统计总数行失败, 需手动执行 rebuild_test_case_stats: {str(delete_error)}")
+            cache.delete(STATS_CACHE_KEY)
+
+    transaction.on_commit(apply)
+
+
+def _stat_values(values: Dict[str, Any]) -> Dict[str, str]:
+    return {dimension: values.get(dimension) or '' for dimension in STAT_DIMENSIONS}
+
+
+def _count_deltas(values_list: Iterable[Dict[str, Any]], sign: int) -> Counter:
+    deltas: Counter = Counter()
+    for values in values_list:
+        deltas[(TOTAL_DIMENSION, '')] += sign
+        for dimension, value in _stat_values(values).items():
+            deltas[(dimension, value)] += sign
+    return deltas
+
+
+def record_created(test_cases: Iterable[TestCase]) -> None:
+    """记录新建的用例（bulk_create 不触发 post_save，由 TestCaseQuerySet 调用）"""
+    test_cases = list(test_cases)
+    apply_stat_deltas(_count_deltas((test_case.__dict__ for test_case in test_cases), 1))
+    for test_case in test_cases:
+        _snapshot(test_case)
+
+
+def stat_groups(queryset: QuerySet) -> List[Tuple[Dict[str, Any], int]]:
+    """按统计维度分组统计查询集中的用例数，供批量修改、删除前计算计数增量"""
+    rows = queryset.order_by().values(*STAT_DIMENSIONS).annotate(case_count=Count('id'))
+    return [({dimension: row[dimension] for dimension in STAT_DIMENSIONS}, row['case_count']) for row in rows]
+
+
+def record_changes(groups: Iterable[Tuple[Dict[str, Any], int]], changes: Dict[str, Any]) -> None:
+    """记录批量修改（QuerySet.update 不触发信号）
+
+    Args:
+        groups: 修改前的 stat_groups 结果
+        changes: 本次修改的字段值
+    """
+    changed = {dimension: changes[dimension] or '' for dimension in STAT_DIMENSIONS if dimension in changes}
+    if not changed:
+        return
+    deltas: Counter = Counter()
+    for values, count in groups:
+        old_values = _stat_values(values)
+        for dimension, new_value in changed.items():
+            if old_values[dimension] != new_value:
+                deltas[(dimension, old_values[dimension])] -= count
+                deltas[(dimension, new_value)] += count
+    apply_stat_deltas(deltas)
+
+
+def record_deleted(groups: Iterable[Tuple[Dict[str, Any], int]]) -> None:
+    """记录批量删除，groups 为删除前的 stat_groups 结果"""
+    deltas: Counter = Counter()
+    for values, count in groups:
+        deltas[(TOTAL_DIMENSION, '')] -= count
+        for dimension, value in _stat_values(values).items():
+            deltas[(dimension, value)] -= count
+    apply_stat_deltas(deltas)
+
+
+@contextmanager
+def suppress_delete_accounting():
+    """在此上下文中删除用例不再逐条更新计数，由调用方调用 record_deleted 一次性扣减"""
+    token = _suppress_delete_accounting.set(True)
+    try:
+        yield
+    finally:
+        _suppress_delete_accounting.reset(token)
+
+
+def _snapshot(instance: TestCase) -> None:
+    # 只记录已加载的字段，避免 only()/defer() 查询时触发额外的字段加载
+    instance._stat_snapshot = {dimension: instance.__dict__.get(dimension) for dimension in STAT_DIMENSIONS}
+
+
+@receiver(post_init, sender=TestCase)
+def _on_test_case_init(sender, instance: TestCase, **kwargs) -> None:
+    _snapshot(instance)
+
+
+@receiver(post_save, sender=TestCase)
+def _on_test_case_saved(sender, instance: TestCase, created: bool,
+                        update_fields: Optional[Iterable[str]] = None, **kwargs) -> None:
+    if created:
+        record_created([instance])
+        return
+    old_values = getattr(instance, '_stat_snapshot', {})
+    deltas: Counter = Counter()
+    for dimension in STAT_DIMENSIONS:
+        if update_fields is not None and dimension not in update_fields:
+            continue
+        old_value = old_values.get(dimension)
+        new_value = instance.__dict__.get(dimension)
+        if old_value is None or new_value is None or (old_value or '') == (new_value or ''):
+            continue
+        deltas[(dimension, old_value or '')] -= 1
+        deltas[(dimension, new_value or '')] += 1
+    apply_stat_deltas(deltas)
+    _snapshot(instance)
+
+
+@receiver(post_delete, sender=TestCase)
+def _on_test_case_deleted(sender, instance: TestCase, **kwargs) -> None:
+    if _suppress_delete_accounting.get():
+        return
+    apply_stat_deltas(_count_deltas([instance.__dict__], -1))
@@ -13,6 +13,11 @@ urlpatterns = [
 
     path('api/add-knowledge/', views.add_knowledge, name='add_knowledge'),
     path('api/knowledge-list/', views.knowledge_list, name='knowledge_list'),
+    path('api/update-knowledge/', views.update_knowledge, name='update_knowledge'),
+    path('api/delete-knowledge/', views.delete_knowledge, name='delete_knowledge'),
     path('api/search-knowledge/', views.search_knowledge, name='search_knowledge'),   
+    path('api/near-duplicates/', views.find_near_duplicates, name='find_near_duplicates'),
     path('api/stream-logs/', stream_logs, name='stream_logs'),
+    path('api/job-status/', views.job_status, name='job_status'),
+    path('api/cancel-job/', views.cancel_job_view, name='cancel_job'),
     ] 
\ No newline at end of file
@@ -3,7 +3,7 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 import json
 
-from .models import TestCase, KnowledgeBase
+from .models import TestCase, KnowledgeBase, Job
 from ..knowledge.service import get_knowledgeService_instance
 
 # 初始化服务
@@ -17,6 +17,8 @@ from django.views.decorators.csrf import csrf_exempt
 import os
 from datetime import datetime
 from apps.knowledge.milvus_helper import process_singel_file
+from apps.utils.job_queue import cancel_job, job_to_dict
+from apps.core.test_case_stats import get_test_case_stats
 
 import hashlib
 
@@ -50,11 +52,12 @@ knowledge_service = get_knowledgeService_instance()
 # @login_required 先屏蔽登录
 def index(request):
     """页面-首页视图"""
-    # 获取测试用例统计数据
-    total_test_cases = TestCase.objects.count()
-    pending_count = TestCase.objects.filter(status='pending').count()
-    approved_count = TestCase.objects.filter(status='approved').count()
-    rejected_count = TestCase.objects.filter(status='rejected').count()
+    # 获取测试用例统计数据(读取增量维护的统计计数, 不扫描用例表)
+    stats = get_test_case_stats()
+    total_test_cases = stats['total']
+    pending_count = stats['status']['pending']
+    approved_count = stats['status']['approved']
+    rejected_count = stats['status']['rejected']
     
     # 获取最近的测试用例
     recent_test_cases = TestCase.objects.order_by('-created_at')[:10]
@@ -136,9 +139,14 @@ def add_knowledge(request):
 
 # @login_required 先屏蔽登录
 def knowledge_list(request):
-    """获取知识库列表"""
+    """获取知识库列表
+
+    默认只返回向量已同步的条目(与检索结果一致), include_pending=1 时同时返回待同步/同步失败的条目
+    """
     try:
         knowledge_items = KnowledgeBase.objects.all().order_by('-created_at')
+        if request.GET.get('include_pending') not in ('1', 'true'):
+            knowledge_items = knowledge_items.filter(sync_status='synced')
         
         items = []
         for item in knowledge_items:
@@ -146,6 +154,8 @@ def knowledge_list(request):
                 'id': item.id,
                 'title': item.title,
                 'content': item.content,
+                'source': item.source,
+                'sync_status': item.sync_status,
                 'created_at': item.created_at.isoformat()
             })
         
@@ -159,6 +169,64 @@ def knowledge_list(request):
             'message': str(e)
         })
 
+# @login_required 先屏蔽登录
+@require_http_methods(["POST"])
+def update_knowledge(request):
+    """更新知识条目, 内容变化时重新同步向量"""
+    try:
+        data = json.loads(request.body)
+        knowledge_id = data.get('id')
+        if not knowledge_id:
+            return JsonResponse({
+                'success': False,
+                'message': '知识条目ID不能为空'
+            })
+
+        updated = knowledge_service.update_knowledge(
+            int(knowledge_id),
+            title=data.get('title'),
+            content=data.get('content'),
+        )
+        if not updated:
+            return JsonResponse({
+                'success': False,
+                'message': '知识条目不存在'
+            })
+        return JsonResponse({
+            'success': True,
+            'message': '知识条目更新成功'
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        })
+
+# @login_required 先屏蔽登录
+@require_http_methods(["POST"])
+def delete_knowledge(request):
+    """按ID批量删除知识条目及其向量"""
+    try:
+        data = json.loads(request.body)
+        knowledge_ids = data.get('ids') or []
+        if not isinstance(knowledge_ids, list) or not knowledge_ids:
+            return JsonResponse({
+                'success': False,
+                'message': '请提供要删除的知识条目ID列表'
+            })
+
+        deleted = knowledge_service.delete_knowledge([int(i) for i in knowledge_ids])
+        return JsonResponse({
+            'success': True,
+            'message': f'成功删除 {deleted} 条知识条目',
+            'deleted': deleted
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        })
+
 # @login_required 先屏蔽登录
 @require_http_methods(["POST"])
 def search_knowledge(request):
@@ -174,7 +242,7 @@ def search_knowledge(request):
             })
         
         # 搜索知识库
-        query_embedding = knowledge_service.embedder.get_embeddings(query)[0]
+        query_embedding = knowledge_service.embedder.get_embeddings_array(query, use_case='query')[0]
         logger.info(f"查询文本: '{query}', 向量维度: {len(query_embedding)}, 前5个维度: {query_embedding[:5]}")
         results = knowledge_service.search_knowledge(query)
         
@@ -188,6 +256,51 @@ def search_knowledge(request):
             'message': str(e)
         })
 
+# @login_required 先屏蔽登录
+@require_http_methods(["POST"])
+def find_near_duplicates(request):
+    """批量近似重复检测
+
+    请求体传入 texts（文本列表）或 test_case_ids（测试用例ID列表），返回相似度不低于 threshold 的重复分组
+    """
+    try:
+        data = json.loads(request.body)
+        texts = data.get('texts') or []
+        test_case_ids = data.get('test_case_ids') or []
+        threshold = float(data.get('threshold', 0.92))
+
+        if test_case_ids:
+            cases = TestCase.objects.filter(id__in=test_case_ids).order_by('id').values(
+                'id', 'description', 'test_steps', 'expected_results'
+            )
+            ids = [case['id'] for case in cases]
+            texts = [
+                f"{case['description']}\n{case['test_steps']}\n{case['expected_results']}"
+                for case in cases
+            ]
+        else:
+            ids = list(range(len(texts)))
+
+        if len(texts) < 2:
+            return JsonResponse({
+                'success': False,
+                'message': '至少需要两条文本或测试用例'
+            })
+
+        groups = knowledge_service.similarity.group_near_duplicates(texts, threshold=threshold)
+        logger.info(f"近似重复检测: 共 {len(texts)} 条, 重复分组 {len(groups)} 个, 阈值 {threshold}")
+
+        return JsonResponse({
+            'success': True,
+            'groups': [[ids[idx] for idx in members] for members in groups]
+        })
+    except Exception as e:
+        logger.error(f"近似重复检测失败: {str(e)}", exc_info=True)
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        })
+
 @csrf_exempt
 def upload_single_file(request):
     """处理文件上传的视图函数"""
@@ -277,52 +390,33 @@ def upload_single_file(request):
                         text_contents = [str(chunks)]
                     logger.info(f"提取了单个文本内容: {text_contents[0][:100]}...")
 
-                # 直接生成所有文本内容的向量
-                logger.info("开始生成向量")
+                # 写入KnowledgeBase行及同步待办, 由同步任务批量嵌入并写入Milvus
+                logger.info("开始写入知识库")
                 start_time = datetime.now()
 
                 try:
-                    # 直接为所有文本内容生成向量
-                    all_embeddings = knowledge_service.embedder.get_embeddings(texts=text_contents, show_progress_bar=False)
-                    logger.info(f"成功生成 {len(all_embeddings)} 个向量")
-                    
-                    # 确保embeddings是列表格式
-                    embeddings_list = []
-                    for emb in all_embeddings:
-                        if hasattr(emb, 'tolist'):
-                            emb = emb.tolist()
-                        embeddings_list.append(emb)
-                    
-                    # 准备插入数据
-                    data_to_insert = []
-                    for i in range(len(text_contents)):
-                        item = {
-                            "embedding": embeddings_list[i],  # 单个embedding向量
-                            "content": text_contents[i],      # 文本内容
-                            "metadata": '{}',                 # 元数据
-                            "source": file_path,              # 来源
-                            "doc_type": file_type,            # 文档类型
-                            "chunk_id": f"{hashlib.md5(os.path.basename(file_path).encode()).hexdigest()[:10]}_{i:04d}",  # 块ID
-                            "upload_time": datetime.now().isoformat()  # 上传时间
-                        }
-                        data_to_insert.append(item)
-                    
-                    # 插入数据到Milvus
-                    logger.info(f"开始往milvus中插入 {len(data_to_insert)} 条数据")
-                    knowledge_service.vector_store.add_data(data_to_insert)
-                    logger.info("数据插入完成")
+                    file_prefix = hashlib.md5(os.path.basename(file_path).encode()).hexdigest()[:10]
+                    knowledge_ids = knowledge_service.add_document_chunks(
+                        source=file_path,
+                        doc_type=file_type,
+                        chunk_ids=[f"{file_prefix}_{i:04d}" for i in range(len(text_contents))],
+                        titles=[f"{uploaded_file.name}#{i + 1}" for i in range(len(text_contents))],
+                        contents=text_contents,
+                    )
+                    pending = KnowledgeBase.objects.filter(id__in=knowledge_ids).exclude(sync_status='synced').count()
                     
                     total_time = (datetime.now() - start_time).total_seconds()
-                    logger.info(f"向量生成和插入完成，总耗时: {total_time:.2f} 秒")
+                    logger.info(f"知识库写入完成, 共 {len(knowledge_ids)} 条, 待同步 {pending} 条, 总耗时: {total_time:.2f} 秒")
                     
                     return JsonResponse({
                         'success': True, 
                         'count': len(text_contents),
-                        'message': f'成功导入文件到知识库'
+                        'pending': pending,
+                        'message': f'成功导入文件到知识库' if not pending else f'文件已导入, {pending} 条向量等待后台同步'
                     })
                     
                 except Exception as e:
-                    logger.error(f"生成或插入向量时出错: {str(e)}", exc_info=True)
+                    logger.error(f"写入知识库时出错: {str(e)}", exc_info=True)
                     return JsonResponse({
                         'success': False, 
                         'error': str(e)
@@ -350,3 +444,63 @@ def upload_single_file(request):
         'error': '不支持的请求方法'
     })
 
+
+
+# @login_required 先屏蔽登录
+@require_http_methods(["GET"])
+def job_status(request):
+    """查询后台任务状态，按 job_id 或 task_id 查询；任务完成后 result 中包含任务结果"""
+    job_id = request.GET.get('job_id')
+    task_id = request.GET.get('task_id')
+    if not job_id and not task_id:
+        return JsonResponse({
+            'success': False,
+            'message': '缺少 job_id 或 task_id'
+        }, status=400)
+    try:
+        queryset = Job.objects.filter(id=job_id) if job_id else Job.objects.filter(task_id=task_id)
+        job = queryset.order_by('-id').first()
+        if job is None:
+            return JsonResponse({
+                'success': False,
+                'message': '任务不存在'
+            }, status=404)
+        return JsonResponse({
+            'success': True,
+            'job': job_to_dict(job)
+        })
+    except Exception as e:
+        logger.error(f"查询任务状态失败: {str(e)}", exc_info=True)
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        })
+
+
+# @login_required 先屏蔽登录
+@require_http_methods(["POST"])
+def cancel_job_view(request):
+    """取消排队中的后台任务"""
+    try:
+        data = json.loads(request.body)
+        job_id = data.get('job_id')
+        if not job_id:
+            return JsonResponse({
+                'success': False,
+                'message': '缺少 job_id'
+            }, status=400)
+        if not cancel_job(int(job_id)):
+            return JsonResponse({
+                'success': False,
+                'message': '任务不存在或已开始执行，无法取消'
+            })
+        return JsonResponse({
+            'success': True,
+            'message': '任务已取消'
+        })
+    except Exception as e:
+        logger.error(f"取消任务失败: {str(e)}", exc_info=True)
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        })
@@ -22,6 +22,7 @@ from typing import Iterator
 from django.http import StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from ..utils.sse_bus import get_queue
+from ..utils.job_queue import is_remote_job_task, read_job_logs
 
 
 @csrf_exempt
@@ -36,14 +37,39 @@ def stream_logs(request):
     def event_stream() -> Iterator[bytes]:
         # 先发一行注释，帮助一些代理尽快刷出头部
         yield b": stream-start\n\n"
+        # 任务在其他进程（任务 worker）中执行时，日志不会进入本进程队列，改为定期从 Job 表增量读取
+        remote = is_remote_job_task(task_id)
+        job_log_seq = 0
+        last_heartbeat = time.time()
         while True:
             # 从同步队列拉取一条；带超时以便发送心跳
             try:
-                item = q.get(timeout=15.0)
+                item = q.get(timeout=2.0 if remote else 15.0)
             except Exception:
                 item = None
             if item is None:
+                if remote:
+                    for entry in read_job_logs(task_id, after_seq=job_log_seq):
+                        job_log_seq = entry['seq']
+                        data = json.dumps({
+                            "seq": entry['seq'],
+                            "ts": time.time(),
+                            "task_id": task_id,
+                            "level": "INFO",
+                            "name": "job",
+                            "thread": "",
+                            "msg": entry['msg'],
+                            "task_type": "generation",
+                            "module": "job",
+                        }, ensure_ascii=False).encode("utf-8")
+                        yield b"id: %d\n" % entry['seq']
+                        yield b"event: log\n"
+                        yield b"data: " + data + b"\n\n"
+                    remote = is_remote_job_task(task_id)
+                    if time.time() - last_heartbeat < 15.0:
+                        continue
                 # 周期性发送进度事件，驱动前端刷新（替代注释心跳）
+                last_heartbeat = time.time()
                 payload = json.dumps({
                     "ts": int(time.time())
                 }, ensure_ascii=False).encode("utf-8")
@@ -8,10 +8,25 @@ class KnowledgeConfig(AppConfig):
     vector_store = None
 
     def ready(self):
+        from django.conf import settings
         from .embedding import BGEM3Embedder
+        from .embedding_sidecar import SidecarEmbedder, get_sidecar_config
         from .vector_store import MilvusVectorStore
 
+        vector_db_config = getattr(settings, 'VECTOR_DB_CONFIG', {})
+        if KnowledgeConfig.embedder is None and get_sidecar_config()['enabled']:
+            # 模型由 sidecar 进程统一加载, worker 内只保留轻量客户端
+            sidecar_config = get_sidecar_config()
+            KnowledgeConfig.embedder = SidecarEmbedder(
+                socket_path=sidecar_config['socket_path'],
+                timeout=sidecar_config['timeout'],
+            )
         if KnowledgeConfig.embedder is None:
-            KnowledgeConfig.embedder = BGEM3Embedder()
+            KnowledgeConfig.embedder = BGEM3Embedder.from_settings()
         if KnowledgeConfig.vector_store is None:
-            KnowledgeConfig.vector_store = MilvusVectorStore()
\ No newline at end of file
+            # collection_name可以是真实集合名, 也可以是重建索引后切换的别名
+            KnowledgeConfig.vector_store = MilvusVectorStore(
+                host=vector_db_config.get('host', 'localhost'),
+                port=vector_db_config.get('port', '19530'),
+                collection_name=vector_db_config.get('collection_name', 'vv_knowledge_collection'),
+            )
\ No newline at end of file
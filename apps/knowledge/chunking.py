@@ -0,0 +1,199 @@
+"""
+基于 bge-m3 分词器的 token 预算 chunking
+
+unstructured 的 chunk_elements / chunk_by_title 按字符数切分（max_characters=500），
+中文与英文每 token 的字符数差异很大，导致同样 500 字符的 chunk token 数相差数倍：大量碎片 chunk 与少量超长 chunk 并存。
+
+TokenBudgetChunker 使用嵌入模型自身的分词器计数：
+- 按顺序把 elements 打包，直到接近 max_tokens
+- 单个 element 超过预算时，借助 offset_mapping 按 token 窗口切分（窗口之间可重叠）
+- 相邻 chunk 之间可保留 overlap_tokens 个 token 的重叠，遇到标题时另起新块且不重叠
+输出 unstructured 的 CompositeElement，与原有 chunking 结果的用法一致（.text / str()）。
+"""
+
+import copy
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from unstructured.documents.elements import CompositeElement, Element
+
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CHUNKING_CONFIG = {
+    'strategy': 'token',
+    'max_tokens': 512,
+    'overlap_tokens': 64,
+    'new_section_on_title': True,
+}
+
+_tokenizer = None
+
+
+def get_chunking_config() -> Dict[str, Any]:
+    """读取 settings.KNOWLEDGE_CHUNKING，缺省项使用默认值"""
+    config = dict(DEFAULT_CHUNKING_CONFIG)
+    config.update(getattr(settings, 'KNOWLEDGE_CHUNKING', {}) or {})
+    return config
+
+
+def get_embedding_tokenizer():
+    """获取嵌入模型的分词器
+
+    优先复用 KnowledgeConfig 中已加载模型的分词器；使用 sidecar 客户端时 worker 内没有模型，
+    单独加载分词器（仅几 MB）。
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        from django.apps import apps
+
+        embedder = apps.get_app_config('knowledge').embedder
+        model = getattr(embedder, 'model', None)
+        if model is not None and getattr(model, 'tokenizer', None) is not None:
+            _tokenizer = model.tokenizer
+        else:
+            from transformers import AutoTokenizer
+
+            model_name = getattr(settings, 'EMBEDDING_CONFIG', {}).get('model_name', 'BAAI/bge-m3')
+            _tokenizer = AutoTokenizer.from_pretrained(model_name)
+    return _tokenizer
+
+
+def get_token_chunker() -> Optional["TokenBudgetChunker"]:
+    """按配置创建 token chunker；strategy 不为 'token' 时返回 None，调用方回退到按字符数 chunking"""
+    config = get_chunking_config()
+    if config['strategy'] != 'token':
+        return None
+    return TokenBudgetChunker(
+        get_embedding_tokenizer(),
+        max_tokens=config['max_tokens'],
+        overlap_tokens=config['overlap_tokens'],
+        new_section_on_title=config['new_section_on_title'],
+    )
+
+
+class TokenBudgetChunker:
+    """按 token 预算打包 elements 的 chunker"""
+
+    separator = "\n\n"
+
+    def __init__(self, tokenizer, max_tokens: int = 512, overlap_tokens: int = 0, new_section_on_title: bool = True):
+        """
+        Args:
+            tokenizer: HuggingFace fast tokenizer（需支持 return_offsets_mapping）
+            max_tokens: 每个 chunk 的 token 上限（不含特殊 token）
+            overlap_tokens: 相邻 chunk 的重叠 token 数
+            new_section_on_title: 遇到标题元素时是否另起新块
+        """
+        if max_tokens <= 0:
+            raise ValueError("max_tokens 必须大于0")
+        if not 0 <= overlap_tokens < max_tokens:
+            raise ValueError("overlap_tokens 必须大于等于0且小于 max_tokens")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.new_section_on_title = new_section_on_title
+
+    def _offsets(self, text: str) -> List[Tuple[int, int]]:
+        encoded = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        return encoded['offset_mapping']
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer(text, add_special_tokens=False)['input_ids'])
+
+    def split_text(self, text: str, first_budget: Optional[int] = None) -> List[str]:
+        """将超长文本按 token 窗口切分，窗口之间重叠 overlap_tokens 个 token
+
+        Args:
+            text: 待切分文本
+            first_budget: 第一个窗口的 token 数（用于与前面未满的 chunk 拼接），为空时为 max_tokens
+        """
+        offsets = self._offsets(text)
+        if len(offsets) <= (first_budget or self.max_tokens):
+            return [text]
+        pieces = []
+        start, size = 0, first_budget or self.max_tokens
+        while True:
+            window = offsets[start:start + size]
+            pieces.append(text[window[0][0]:window[-1][1]].strip())
+            if start + size >= len(offsets):
+                break
+            start += size - min(self.overlap_tokens, size - 1)
+            size = self.max_tokens
+        return [piece for piece in pieces if piece]
+
+    def _tail(self, text: str) -> str:
+        """取文本末尾 overlap_tokens 个 token 对应的文本，作为下一个 chunk 的开头"""
+        if not self.overlap_tokens:
+            return ''
+        offsets = self._offsets(text)
+        if len(offsets) <= self.overlap_tokens:
+            return text
+        return text[offsets[-self.overlap_tokens][0]:].strip()
+
+    def chunk(self, elements: List[Element]) -> List[CompositeElement]:
+        chunks: List[CompositeElement] = []
+        parts: List[str] = []
+        part_tokens = 0
+        has_new_content = False
+        first_element: Optional[Element] = None
+
+        def emit(text: str, source: Optional[Element]) -> None:
+            metadata = copy.deepcopy(source.metadata) if source is not None else None
+            chunks.append(CompositeElement(text=text, metadata=metadata))
+
+        def flush(keep_overlap: bool) -> None:
+            nonlocal parts, part_tokens, has_new_content, first_element
+            if parts and has_new_content:
+                text = self.separator.join(parts)
+                emit(text, first_element)
+                tail = self._tail(text) if keep_overlap else ''
+            else:
+                tail = ''
+            parts = [tail] if tail else []
+            part_tokens = self.count_tokens(tail) if tail else 0
+            has_new_content = False
+            first_element = None
+
+        for element in elements:
+            text = (getattr(element, 'text', None) or str(element)).strip()
+            if not text:
+                continue
+            if self.new_section_on_title and getattr(element, 'category', None) == 'Title':
+                flush(keep_overlap=False)
+
+            tokens = self.count_tokens(text)
+            if tokens > self.max_tokens:
+                # 超长元素：第一个窗口填满当前未满的 chunk（如前面的标题），其余窗口各自成块
+                first_budget = self.max_tokens - part_tokens - 1 if parts else self.max_tokens
+                if first_budget < self.overlap_tokens + 1:
+                    flush(keep_overlap=False)
+                    first_budget = self.max_tokens
+                pieces = self.split_text(text, first_budget if parts else None)
+                if parts:
+                    parts.append(pieces.pop(0))
+                    has_new_content = True
+                    first_element = first_element or element
+                    flush(keep_overlap=False)
+                for piece in pieces:
+                    emit(piece, element)
+                continue
+
+            # 每个分隔符按 1 个 token 预留
+            if parts and part_tokens + tokens + 1 > self.max_tokens:
+                flush(keep_overlap=True)
+                if parts and part_tokens + tokens + 1 > self.max_tokens:
+                    parts, part_tokens = [], 0
+            parts.append(text)
+            part_tokens += tokens + (1 if len(parts) > 1 else 0)
+            has_new_content = True
+            if first_element is None:
+                first_element = element
+        flush(keep_overlap=False)
+
+        logger.info(
+            f"token chunking完成: 元素数 {len(elements)}, chunk数 {len(chunks)}, "
+            f"max_tokens {self.max_tokens}, overlap {self.overlap_tokens}"
+        )
+        return chunks
@@ -1,37 +1,86 @@
 import torch
-from typing import List, Union, Dict
+from typing import List, Union, Dict, Optional, Tuple
 # from transformers import AutoTokenizer, AutoModel
 from sentence_transformers import SentenceTransformer
 
 import numpy as np
 import os
 
+from apps.knowledge.encoding_policy import EncodingPolicy, USE_CASE_PASSAGE
+
 class BGEM3Embedder:
     """BGE-M3嵌入模型本地服务 - 针对Apple Silicon优化"""
     
-    def __init__(self, model_name: str = "BAAI/bge-m3"):
+    def __init__(self,
+                 model_name: str = "BAAI/bge-m3",
+                 max_tokens: Optional[Dict[str, int]] = None,
+                 length_buckets: Optional[List[Tuple[int, int]]] = None):
         """
         初始化BGE-M3嵌入模型
         
         Args:
             model_name: 模型名称，默认为'BAAI/bge-m3'
+            max_tokens: 各用途的截断长度，如 {'query': 512, 'passage': 2048}
+            length_buckets: 长度分桶 [(桶内最大token数, 批大小), ...]
         """
         print("正在加载BGE-M3模型...")
+        self.model_name = model_name
         self.model = SentenceTransformer(model_name)
+        self.policy = EncodingPolicy(self.model, max_tokens=max_tokens, length_buckets=length_buckets)
+
+    @classmethod
+    def from_settings(cls, model_name: Optional[str] = None) -> "BGEM3Embedder":
+        """按 settings.EMBEDDING_CONFIG 创建嵌入模型，model_name 不为空时覆盖配置中的模型"""
+        from django.conf import settings
+
+        config = getattr(settings, 'EMBEDDING_CONFIG', {})
+        return cls(
+            model_name=model_name or config.get('model_name', 'BAAI/bge-m3'),
+            max_tokens=config.get('max_tokens'),
+            length_buckets=config.get('length_buckets'),
+        )
+
+    @property
+    def dimension(self) -> int:
+        """嵌入向量维度"""
+        return self.model.get_sentence_embedding_dimension()
 
         
-    def get_embeddings(self, texts: Union[str, List[str]], show_progress_bar: bool = False) -> List[List[float]]:
-        """获取文本的嵌入向量"""
+    def get_embeddings_array(self,
+                             texts: Union[str, List[str]],
+                             show_progress_bar: bool = False,
+                             dtype: Union[str, np.dtype] = np.float32,
+                             batch_size: Optional[int] = None,
+                             use_case: str = USE_CASE_PASSAGE) -> np.ndarray:
+        """获取文本的嵌入向量，直接返回 (n, dim) 的连续 ndarray
+
+        避免把向量转换为 Python float 列表，结果可直接写入Milvus或参与矩阵运算。
+        编码经过 EncodingPolicy：只分词一次，按用途截断并按长度分桶组批，各桶吞吐记录在 self.policy.last_stats。
+
+        Args:
+            texts: 单条文本或文本列表
+            show_progress_bar: 保留参数, 分桶编码按桶输出日志, 不再显示进度条
+            dtype: 向量数据类型，支持 float32 / float16
+            batch_size: 批大小上限，为空时使用各长度桶的默认批大小
+            use_case: 'query'（检索问句）或 'passage'（入库文档），决定截断长度
+        """
+        dtype = np.dtype(dtype)
+        if dtype not in (np.dtype(np.float32), np.dtype(np.float16)):
+            raise ValueError(f"不支持的向量数据类型: {dtype}")
         if isinstance(texts, str):
             texts = [texts]
-        embeddings = self.model.encode(sentences=texts, normalize_embeddings=True, show_progress_bar=show_progress_bar)
-        return embeddings.tolist()
+        embeddings = self.policy.encode(list(texts), use_case=use_case, max_batch_size=batch_size)
+        return np.ascontiguousarray(embeddings, dtype=dtype)
+
+    def get_embeddings(self, texts: Union[str, List[str]], show_progress_bar: bool = False) -> List[List[float]]:
+        """获取文本的嵌入向量（列表形式），为 get_embeddings_array 的简单包装"""
+        return self.get_embeddings_array(texts, show_progress_bar=show_progress_bar).tolist()
     
     def compute_similarity(self, text1: str, text2: str) -> float:
         """计算两个文本之间的相似度"""
-        embeddings = self.get_embeddings([text1, text2])
-        similarity = np.dot(embeddings[0], embeddings[1])
-        return similarity
+        embeddings = self.get_embeddings_array([text1, text2])
+        # 向量已归一化，点积即余弦相似度
+        return float(embeddings[0] @ embeddings[1])
 
 # 测试
 if __name__ == "__main__":
@@ -0,0 +1,349 @@
+"""
+嵌入模型 sidecar 进程
+
+每个 Django worker 通过 KnowledgeConfig.ready() 各自加载一份 bge-m3（约 2GB 常驻内存），限制了单机 worker 数量。
+sidecar 进程只加载一次模型，通过 Unix domain socket 为本机所有 worker 提供嵌入服务，并把并发请求合并成批次编码。
+开启 settings.EMBEDDING_SIDECAR['enabled'] 后，worker 中的 embedder 替换为轻量客户端 SidecarEmbedder。
+
+二进制协议（网络字节序头部 + 小端 float 数据）：
+- 请求头 REQUEST_HEADER: magic(4s) version(B) op(B) flags(H) count(I)，
+  其后为 count 段 [长度(I) + UTF-8 文本]
+- 响应头 RESPONSE_HEADER: magic(4s) version(B) status(B) dtype(B) pad(x) rows(I) dim(I) payload_len(I)，
+  其后为 payload：成功时为 rows×dim 的 float32/float16 向量，失败时为 UTF-8 错误信息；
+  OP_INFO 的 payload 为模型名称
+
+启动：python manage.py run_embedding_sidecar
+"""
+
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+MAGIC = b'TBEM'
+PROTOCOL_VERSION = 1
+
+OP_ENCODE = 1
+OP_INFO = 2
+
+FLAG_FLOAT16 = 0x01
+FLAG_QUERY = 0x02
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+DTYPE_FLOAT32 = 0
+DTYPE_FLOAT16 = 1
+_DTYPES = {DTYPE_FLOAT32: np.dtype('<f4'), DTYPE_FLOAT16: np.dtype('<f2')}
+
+REQUEST_HEADER = struct.Struct('!4sBBHI')
+RESPONSE_HEADER = struct.Struct('!4sBBBxIII')
+TEXT_LENGTH = struct.Struct('!I')
+
+DEFAULT_SIDECAR_CONFIG = {
+    'enabled': False,
+    'socket_path': os.path.join('run', 'embedding.sock'),
+    'max_batch_texts': 256,
+    'max_wait_ms': 5,
+    'timeout': 120,
+}
+
+
+def get_sidecar_config() -> dict:
+    """读取 settings.EMBEDDING_SIDECAR，缺省项使用默认值"""
+    from django.conf import settings
+
+    config = dict(DEFAULT_SIDECAR_CONFIG)
+    config.update(getattr(settings, 'EMBEDDING_SIDECAR', {}) or {})
+    return config
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    """从 socket 读取恰好 size 字节，对端关闭时抛出 ConnectionError"""
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("连接已被对端关闭")
+        received += n
+    return bytes(buf)
+
+
+def encode_request(op: int, texts: List[str], flags: int = 0) -> bytes:
+    parts = [REQUEST_HEADER.pack(MAGIC, PROTOCOL_VERSION, op, flags, len(texts))]
+    for text in texts:
+        data = text.encode('utf-8')
+        parts.append(TEXT_LENGTH.pack(len(data)))
+        parts.append(data)
+    return b''.join(parts)
+
+
+def encode_response(status: int, dtype: int = DTYPE_FLOAT32, rows: int = 0, dim: int = 0, payload: bytes = b'') -> bytes:
+    return RESPONSE_HEADER.pack(MAGIC, PROTOCOL_VERSION, status, dtype, rows, dim, len(payload)) + payload
+
+
+class _PendingRequest:
+    """等待批量编码的单个请求"""
+
+    __slots__ = ('texts', 'is_query', 'done', 'result', 'error')
+
+    def __init__(self, texts: List[str], is_query: bool):
+        self.texts = texts
+        self.is_query = is_query
+        self.done = threading.Event()
+        self.result: Optional[np.ndarray] = None
+        self.error: Optional[BaseException] = None
+
+
+class EmbeddingBatcher:
+    """将多个连接的并发请求合并为一次 encode 调用
+
+    后台线程取出第一个请求后，在 max_wait_ms 内继续收集，直到文本数达到 max_batch_texts，
+    再按 query/passage 分组各编码一次，结果按请求拆分返回。
+    """
+
+    def __init__(self, embedder, max_batch_texts: int = 256, max_wait_ms: float = 5):
+        self.embedder = embedder
+        self.max_batch_texts = max_batch_texts
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[_PendingRequest]" = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name='embedding-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str], is_query: bool = False) -> np.ndarray:
+        """提交一组文本并阻塞等待编码结果"""
+        request = _PendingRequest(texts, is_query)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect(self) -> List[_PendingRequest]:
+        batch = [self._queue.get()]
+        total = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while total < self.max_batch_texts:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            total += len(request.texts)
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            for is_query in (True, False):
+                group = [r for r in batch if r.is_query == is_query]
+                if group:
+                    self._encode_group(group, is_query)
+
+    def _encode_group(self, group: List[_PendingRequest], is_query: bool) -> None:
+        texts = [text for request in group for text in request.texts]
+        try:
+            start = time.perf_counter()
+            embeddings = self._encode(texts, is_query)
+            logger.debug(
+                f"sidecar批量编码: 请求数 {len(group)}, 文本数 {len(texts)}, "
+                f"耗时 {time.perf_counter() - start:.3f}秒"
+            )
+            offset = 0
+            for request in group:
+                request.result = embeddings[offset:offset + len(request.texts)]
+                offset += len(request.texts)
+        except Exception as e:
+            logger.error(f"sidecar编码失败: {str(e)}", exc_info=True)
+            for request in group:
+                request.error = e
+        finally:
+            for request in group:
+                request.done.set()
+
+    def _encode(self, texts: List[str], is_query: bool) -> np.ndarray:
+        return self.embedder.get_embeddings_array(texts, use_case='query' if is_query else 'passage')
+
+
+class _SidecarRequestHandler(socketserver.BaseRequestHandler):
+    """单个 worker 连接的处理器，同一连接上可连续发送多个请求"""
+
+    def handle(self) -> None:
+        sock = self.request
+        while True:
+            try:
+                header = _recv_exact(sock, REQUEST_HEADER.size)
+            except ConnectionError:
+                return
+            try:
+                response = self._dispatch(sock, header)
+            except ConnectionError:
+                return
+            except Exception as e:
+                response = encode_response(STATUS_ERROR, payload=str(e).encode('utf-8'))
+            sock.sendall(response)
+
+    def _dispatch(self, sock: socket.socket, header: bytes) -> bytes:
+        magic, version, op, flags, count = REQUEST_HEADER.unpack(header)
+        if magic != MAGIC or version != PROTOCOL_VERSION:
+            raise ConnectionError("协议不匹配")
+        texts = []
+        for _ in range(count):
+            (length,) = TEXT_LENGTH.unpack(_recv_exact(sock, TEXT_LENGTH.size))
+            texts.append(_recv_exact(sock, length).decode('utf-8'))
+
+        server: EmbeddingSidecarServer = self.server
+        if op == OP_INFO:
+            return encode_response(
+                STATUS_OK,
+                dim=server.embedder.dimension,
+                payload=str(getattr(server.embedder, 'model_name', '')).encode('utf-8'),
+            )
+        if op != OP_ENCODE:
+            raise ValueError(f"不支持的操作: {op}")
+
+        if texts:
+            embeddings = server.batcher.submit(texts, is_query=bool(flags & FLAG_QUERY))
+        else:
+            embeddings = np.zeros((0, server.embedder.dimension), dtype=np.float32)
+        dtype_code = DTYPE_FLOAT16 if flags & FLAG_FLOAT16 else DTYPE_FLOAT32
+        payload = np.ascontiguousarray(embeddings, dtype=_DTYPES[dtype_code]).tobytes()
+        return encode_response(STATUS_OK, dtype_code, embeddings.shape[0], embeddings.shape[1], payload)
+
+
+class EmbeddingSidecarServer(socketserver.ThreadingUnixStreamServer):
+    """嵌入模型 sidecar 服务端"""
+
+    daemon_threads = True
+
+    def __init__(self, embedder, socket_path: str, max_batch_texts: int = 256, max_wait_ms: float = 5):
+        self.embedder = embedder
+        self.batcher = EmbeddingBatcher(embedder, max_batch_texts=max_batch_texts, max_wait_ms=max_wait_ms)
+        socket_dir = os.path.dirname(socket_path)
+        if socket_dir:
+            os.makedirs(socket_dir, exist_ok=True)
+        # 清理上次异常退出残留的 socket 文件
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, _SidecarRequestHandler)
+        os.chmod(socket_path, 0o660)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+class SidecarEmbedder:
+    """嵌入模型 sidecar 的客户端，接口与 BGEM3Embedder 保持一致
+
+    每个线程复用一条长连接，连接断开（如 sidecar 重启）时自动重连重试一次；请求超时不重试。
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 120):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._info: Optional[Tuple[str, int]] = None
+
+    @property
+    def model_name(self) -> str:
+        return self._get_info()[0]
+
+    @property
+    def dimension(self) -> int:
+        return self._get_info()[1]
+
+    def _get_info(self) -> Tuple[str, int]:
+        if self._info is None:
+            _, dim, payload = self._request(OP_INFO, [])
+            self._info = (payload.decode('utf-8'), dim)
+        return self._info
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _request(self, op: int, texts: List[str], flags: int = 0) -> Tuple[int, int, bytes]:
+        """发送请求并返回 (rows, dim, payload)；dtype 由调用方按 flags 解析"""
+        frame = encode_request(op, texts, flags)
+        for attempt in range(2):
+            sock = getattr(self._local, 'sock', None)
+            try:
+                if sock is None:
+                    sock = self._local.sock = self._connect()
+                sock.sendall(frame)
+                header = _recv_exact(sock, RESPONSE_HEADER.size)
+                magic, version, status, _dtype, rows, dim, payload_len = RESPONSE_HEADER.unpack(header)
+                payload = _recv_exact(sock, payload_len) if payload_len else b''
+                break
+            except ConnectionError:
+                # 连接被拒绝/重置/管道断开/对端关闭（如 sidecar 重启）时重连重试一次
+                self._close_local()
+                if attempt == 1:
+                    raise
+            except OSError:
+                # 超时等其他错误不重试：sidecar 可能仍在编码该批文本，重发会让同一批文本被编码两次；
+                # 关闭连接丢弃可能迟到的响应
+                self._close_local()
+                raise
+        if magic != MAGIC or version != PROTOCOL_VERSION:
+            self._close_local()
+            raise ConnectionError("嵌入服务协议不匹配")
+        if status != STATUS_OK:
+            raise RuntimeError(f"嵌入服务处理失败: {payload.decode('utf-8', errors='replace')}")
+        return rows, dim, payload
+
+    def _close_local(self) -> None:
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def get_embeddings_array(self,
+                             texts: Union[str, List[str]],
+                             show_progress_bar: bool = False,
+                             dtype: Union[str, np.dtype] = np.float32,
+                             batch_size: Optional[int] = None,
+                             use_case: str = 'passage') -> np.ndarray:
+        """获取文本的嵌入向量，返回 (n, dim) 的连续 ndarray；show_progress_bar/batch_size 由 sidecar 统一控制"""
+        dtype = np.dtype(dtype)
+        if dtype not in (np.dtype(np.float32), np.dtype(np.float16)):
+            raise ValueError(f"不支持的向量数据类型: {dtype}")
+        if isinstance(texts, str):
+            texts = [texts]
+        flags = FLAG_FLOAT16 if dtype == np.dtype(np.float16) else 0
+        if use_case == 'query':
+            flags |= FLAG_QUERY
+        rows, dim, payload = self._request(OP_ENCODE, list(texts), flags)
+        wire_dtype = _DTYPES[DTYPE_FLOAT16 if flags & FLAG_FLOAT16 else DTYPE_FLOAT32]
+        return np.frombuffer(payload, dtype=wire_dtype).reshape(rows, dim).astype(dtype, copy=False)
+
+    def get_embeddings(self, texts: Union[str, List[str]], show_progress_bar: bool = False) -> List[List[float]]:
+        """获取文本的嵌入向量（列表形式）"""
+        return self.get_embeddings_array(texts).tolist()
+
+    def compute_similarity(self, text1: str, text2: str) -> float:
+        """计算两个文本之间的相似度"""
+        embeddings = self.get_embeddings_array([text1, text2])
+        return float(embeddings[0] @ embeddings[1])
@@ -0,0 +1,158 @@
+"""
+bge-m3 编码策略：按序列长度分桶批处理 + 按用途截断
+
+bge-m3 最长支持 8192 token，注意力计算量随长度平方增长。直接把长短不一的文本交给一次 encode 时，
+同一批内的短文本会被填充到最长文本的长度，整批按最长 chunk 的速度运行。
+
+本模块：
+- 只分词一次，按用途截断（query 默认 512，passage 默认 2048）
+- 按 token 长度分桶，桶内再按长度排序组批，长文本使用更小的批大小，避免拖慢短文本
+- 在已分好词的特征上直接运行模型前向，不再重复分词
+- 记录每个长度桶的文本数、有效 token 数、填充率与 tokens/s（last_stats）
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+USE_CASE_QUERY = 'query'
+USE_CASE_PASSAGE = 'passage'
+
+DEFAULT_MAX_TOKENS = {
+    USE_CASE_QUERY: 512,
+    USE_CASE_PASSAGE: 2048,
+}
+
+# (桶内最大 token 数, 批大小)，按长度升序
+DEFAULT_LENGTH_BUCKETS = [
+    (128, 64),
+    (512, 32),
+    (1024, 16),
+    (2048, 8),
+    (4096, 4),
+    (8192, 2),
+]
+
+
+class EncodingPolicy:
+    """基于 SentenceTransformer 模型的长度感知编码策略"""
+
+    def __init__(self,
+                 model,
+                 max_tokens: Optional[Dict[str, int]] = None,
+                 length_buckets: Optional[Sequence[Tuple[int, int]]] = None):
+        """
+        Args:
+            model: 已加载的 SentenceTransformer 模型
+            max_tokens: 各用途的截断长度，如 {'query': 512, 'passage': 2048}
+            length_buckets: [(桶内最大 token 数, 批大小), ...]
+        """
+        self.model = model
+        self.tokenizer = model.tokenizer
+        self.max_tokens = dict(DEFAULT_MAX_TOKENS)
+        self.max_tokens.update(max_tokens or {})
+        self.length_buckets = sorted(
+            (int(limit), int(size)) for limit, size in (length_buckets or DEFAULT_LENGTH_BUCKETS)
+        )
+        self.last_stats: List[Dict[str, Any]] = []
+
+    def truncation_limit(self, use_case: str) -> int:
+        if use_case not in self.max_tokens:
+            raise ValueError(f"不支持的编码用途: {use_case}")
+        model_limit = getattr(self.model, 'max_seq_length', None) or self.max_tokens[use_case]
+        return min(self.max_tokens[use_case], model_limit)
+
+    def tokenize(self, texts: List[str], use_case: str) -> List[List[int]]:
+        """一次性分词并按用途截断，返回每条文本的 input_ids"""
+        encoded = self.tokenizer(
+            texts,
+            add_special_tokens=True,
+            truncation=True,
+            max_length=self.truncation_limit(use_case),
+            padding=False,
+            return_attention_mask=False,
+        )
+        return encoded['input_ids']
+
+    def plan_batches(self, lengths: Sequence[int], max_batch_size: Optional[int] = None) -> List[Tuple[int, List[int]]]:
+        """按长度分桶并组批，返回 [(桶上限, 文本下标列表), ...]，桶内按长度升序"""
+        order = np.argsort(np.asarray(lengths), kind='stable')
+        batches: List[Tuple[int, List[int]]] = []
+        current_bucket = None
+        current: List[int] = []
+        for idx in order:
+            length = lengths[idx]
+            bucket_limit, bucket_size = next(
+                ((limit, size) for limit, size in self.length_buckets if length <= limit),
+                self.length_buckets[-1],
+            )
+            if max_batch_size:
+                bucket_size = min(bucket_size, max_batch_size)
+            if current and (bucket_limit != current_bucket or len(current) >= bucket_size):
+                batches.append((current_bucket, current))
+                current = []
+            current_bucket = bucket_limit
+            current.append(int(idx))
+        if current:
+            batches.append((current_bucket, current))
+        return batches
+
+    def encode(self, texts: List[str], use_case: str = USE_CASE_PASSAGE, max_batch_size: Optional[int] = None) -> np.ndarray:
+        """编码文本，返回按输入顺序排列、已归一化的 float32 向量 (n, dim)
+
+        Args:
+            texts: 文本列表
+            use_case: 'query' 或 'passage'，决定截断长度
+            max_batch_size: 批大小上限，为空时使用各长度桶的默认批大小
+        """
+        dim = self.model.get_sentence_embedding_dimension()
+        if not texts:
+            self.last_stats = []
+            return np.zeros((0, dim), dtype=np.float32)
+
+        all_input_ids = self.tokenize(texts, use_case)
+        lengths = [len(ids) for ids in all_input_ids]
+        result = np.empty((len(texts), dim), dtype=np.float32)
+        stats: Dict[int, Dict[str, Any]] = {}
+
+        device = self.model.device
+        for bucket_limit, indices in self.plan_batches(lengths, max_batch_size):
+            features = self.tokenizer.pad(
+                {'input_ids': [all_input_ids[i] for i in indices]},
+                padding=True,
+                return_tensors='pt',
+            )
+            features = {key: value.to(device) for key, value in features.items()}
+            start = time.perf_counter()
+            with torch.inference_mode():
+                embeddings = self.model.forward(features)['sentence_embedding']
+                embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
+            result[indices] = embeddings.float().cpu().numpy()
+            elapsed = time.perf_counter() - start
+
+            bucket = stats.setdefault(bucket_limit, {
+                'bucket': bucket_limit, 'texts': 0, 'batches': 0, 'tokens': 0, 'padded_tokens': 0, 'seconds': 0.0,
+            })
+            bucket['texts'] += len(indices)
+            bucket['batches'] += 1
+            bucket['tokens'] += sum(lengths[i] for i in indices)
+            bucket['padded_tokens'] += int(features['input_ids'].numel())
+            bucket['seconds'] += elapsed
+
+        self.last_stats = []
+        for bucket in sorted(stats.values(), key=lambda item: item['bucket']):
+            bucket['tokens_per_second'] = bucket['tokens'] / bucket['seconds'] if bucket['seconds'] > 0 else 0.0
+            bucket['padding_ratio'] = 1 - bucket['tokens'] / bucket['padded_tokens'] if bucket['padded_tokens'] else 0.0
+            self.last_stats.append(bucket)
+            logger.info(
+                f"编码长度桶 <= {bucket['bucket']} ({use_case}): 文本 {bucket['texts']}, 批次 {bucket['batches']}, "
+                f"token {bucket['tokens']}, 填充率 {bucket['padding_ratio']:.1%}, "
+                f"{bucket['tokens_per_second']:.0f} tokens/s"
+            )
+        return result
@@ -0,0 +1,41 @@
+"""
+知识库快照导出命令
+
+将 Milvus 中的向量、标量字段及 MySQL KnowledgeBase 表导出为单个快照文件，用于跨环境迁移或灾备恢复。
+
+示例：
+    python manage.py export_knowledge_snapshot backups/knowledge.tbsnap
+    python manage.py export_knowledge_snapshot backups/knowledge.tbsnap --dtype float16 --skip-mysql
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.knowledge.snapshot import export_knowledge_snapshot
+
+
+class Command(BaseCommand):
+    help = "导出知识库快照（Milvus向量+标量字段、KnowledgeBase表）到单个文件"
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='快照文件路径')
+        parser.add_argument('--collection', default=None, help='集合名/别名，默认取VECTOR_DB_CONFIG.collection_name')
+        parser.add_argument('--dtype', choices=['float32', 'float16'], default='float32',
+                            help='向量存储类型，float16体积减半')
+        parser.add_argument('--skip-mysql', action='store_true', help='不导出KnowledgeBase表')
+        parser.add_argument('--batch-size', type=int, default=2000, help='每批读取条数')
+
+    def handle(self, *args, **options):
+        try:
+            manifest = export_knowledge_snapshot(
+                options['output'],
+                collection_name=options['collection'],
+                include_mysql=not options['skip_mysql'],
+                dtype=options['dtype'],
+                batch_size=options['batch_size'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"快照导出完成: {options['output']}, Milvus {manifest['milvus_rows']} 条, "
+            f"KnowledgeBase {manifest['knowledge_base_rows'] if manifest['knowledge_base_rows'] is not None else '未导出'}"
+        ))
@@ -0,0 +1,52 @@
+"""
+知识库快照导入命令
+
+批量导入 export_knowledge_snapshot 生成的快照文件，无需重新分区、重新嵌入。
+
+示例：
+    # 新环境整体导入
+    python manage.py import_knowledge_snapshot backups/knowledge.tbsnap
+    # MySQL 完好、仅 Milvus 数据丢失时恢复，并把现有 KnowledgeBase.vector_id 更新为新主键
+    python manage.py import_knowledge_snapshot backups/knowledge.tbsnap --mysql remap
+    # 覆盖目标集合与 KnowledgeBase 表
+    python manage.py import_knowledge_snapshot backups/knowledge.tbsnap --replace
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.knowledge.snapshot import import_knowledge_snapshot, read_snapshot_manifest
+
+
+class Command(BaseCommand):
+    help = "从快照文件批量导入知识库（Milvus + KnowledgeBase表）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('snapshot', help='快照文件路径')
+        parser.add_argument('--collection', default=None, help='目标集合名，默认取VECTOR_DB_CONFIG.collection_name')
+        parser.add_argument('--replace', action='store_true', help='导入前删除目标集合(及KnowledgeBase表数据)')
+        parser.add_argument('--mysql', choices=['insert', 'remap', 'skip'], default='insert',
+                            help='insert: 插入快照中的KnowledgeBase行; remap: 仅更新现有行的vector_id; skip: 不处理MySQL')
+        parser.add_argument('--allow-model-mismatch', action='store_true', help='快照嵌入模型与当前配置不一致时仍然导入')
+        parser.add_argument('--batch-size', type=int, default=2000, help='每批写入条数')
+
+    def handle(self, *args, **options):
+        try:
+            manifest = read_snapshot_manifest(options['snapshot'])
+            self.stdout.write(
+                f"快照信息: 创建于 {manifest['created_at']}, 模型 {manifest.get('model_name')}, "
+                f"维度 {manifest['dim']}, Milvus {manifest['milvus_rows']} 条"
+            )
+            result = import_knowledge_snapshot(
+                options['snapshot'],
+                collection_name=options['collection'],
+                replace=options['replace'],
+                mysql_mode=options['mysql'],
+                allow_model_mismatch=options['allow_model_mismatch'],
+                batch_size=options['batch_size'],
+            )
+        except (ValueError, FileNotFoundError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"快照导入完成: 集合 {result['collection']}, Milvus {result['milvus_rows']} 条, "
+            f"KnowledgeBase({result['mysql_mode']}) {result['knowledge_base_rows']} 条"
+        ))
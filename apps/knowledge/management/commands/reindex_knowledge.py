@@ -0,0 +1,72 @@
+"""
+知识库重建索引命令
+
+嵌入模型、chunking 策略或索引参数变更后，将知识库重新嵌入到新集合并原子切换别名。
+任务中断后使用相同参数重新执行即可从断点继续。
+
+示例：
+    python manage.py reindex_knowledge --model BAAI/bge-m3
+    python manage.py reindex_knowledge --mode sources --max-characters 800
+    nohup python manage.py reindex_knowledge --model BAAI/bge-m3 > logs/reindex.log 2>&1 &
+"""
+
+import json
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.knowledge.reindex import KnowledgeReindexJob
+
+
+class Command(BaseCommand):
+    help = "将知识库重新嵌入到新集合（支持断点续跑），完成后原子切换集合别名"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default=None, help='新的嵌入模型名称，默认沿用当前模型')
+        parser.add_argument('--mode', choices=['rows', 'sources'], default='rows',
+                            help='rows: 对已有数据重新嵌入; sources: 按源文件重新分区、chunking后嵌入')
+        parser.add_argument('--source', default=None, help='源集合名/别名，默认取VECTOR_DB_CONFIG.collection_name')
+        parser.add_argument('--target', default=None, help='目标集合名，默认根据任务参数自动生成')
+        parser.add_argument('--max-characters', type=int, default=500, help='sources模式下chunking的最大字符数')
+        parser.add_argument('--index-params', default=None, help='新集合的索引参数(JSON字符串)')
+        parser.add_argument('--no-swap', action='store_true', help='完成后不切换别名')
+        parser.add_argument('--restart', action='store_true', help='忽略已有断点, 从头开始')
+
+    def handle(self, *args, **options):
+        index_params = None
+        if options['index_params']:
+            try:
+                index_params = json.loads(options['index_params'])
+            except json.JSONDecodeError as e:
+                raise CommandError(f"索引参数不是合法的JSON: {e}")
+
+        embedder = apps.get_app_config('knowledge').embedder
+        if options['model'] and options['model'] != getattr(embedder, 'model_name', None):
+            from apps.knowledge.embedding import BGEM3Embedder
+            embedder = BGEM3Embedder.from_settings(options['model'])
+
+        source = options['source'] or getattr(settings, 'VECTOR_DB_CONFIG', {}).get(
+            'collection_name', 'vv_knowledge_collection'
+        )
+        try:
+            job = KnowledgeReindexJob(
+                embedder=embedder,
+                source_collection=source,
+                target_collection=options['target'],
+                mode=options['mode'],
+                index_params=index_params,
+                max_characters=options['max_characters'],
+                swap=not options['no_swap'],
+                restart=options['restart'],
+            )
+            result = job.run()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"重建完成: {result['source']} -> {result['target']}, 共写入 {result.get('written', 0)} 条, "
+            f"状态: {result['status']}"
+        ))
+        if options['model'] and result['status'] == 'swapped':
+            self.stdout.write(f"请将 EMBEDDING_CONFIG['model_name'] 更新为 {options['model']} 后重启服务")
@@ -0,0 +1,48 @@
+"""
+嵌入模型 sidecar 启动命令
+
+在本机启动唯一的嵌入模型进程，各 Django worker 通过 Unix socket 调用（需开启 EMBEDDING_SIDECAR['enabled']）。
+
+示例：
+    python manage.py run_embedding_sidecar
+    nohup python manage.py run_embedding_sidecar > logs/embedding_sidecar.log 2>&1 &
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.knowledge.embedding import BGEM3Embedder
+from apps.knowledge.embedding_sidecar import EmbeddingSidecarServer, get_sidecar_config
+
+
+class Command(BaseCommand):
+    help = "启动嵌入模型 sidecar 进程，为本机所有 worker 提供批量嵌入服务"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=None, help='Unix socket 路径，默认取EMBEDDING_SIDECAR.socket_path')
+        parser.add_argument('--model', default=None, help='嵌入模型名称，默认取EMBEDDING_CONFIG.model_name')
+        parser.add_argument('--max-batch-texts', type=int, default=None, help='单次合并编码的最大文本数')
+        parser.add_argument('--max-wait-ms', type=float, default=None, help='合并批次时等待后续请求的最长时间(毫秒)')
+
+    def handle(self, *args, **options):
+        config = get_sidecar_config()
+        socket_path = str(options['socket'] or config['socket_path'])
+        model_name = options['model'] or getattr(settings, 'EMBEDDING_CONFIG', {}).get('model_name', 'BAAI/bge-m3')
+
+        # sidecar 自身必须加载真实模型, 不能复用 ready() 中可能创建的客户端
+        embedder = BGEM3Embedder.from_settings(model_name)
+        server = EmbeddingSidecarServer(
+            embedder,
+            socket_path,
+            max_batch_texts=options['max_batch_texts'] or config['max_batch_texts'],
+            max_wait_ms=options['max_wait_ms'] if options['max_wait_ms'] is not None else config['max_wait_ms'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"嵌入模型 sidecar 已启动: {socket_path}, 模型: {model_name}, 维度: {embedder.dimension}"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("正在停止嵌入模型 sidecar...")
+        finally:
+            server.server_close()
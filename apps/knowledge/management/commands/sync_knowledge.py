@@ -0,0 +1,46 @@
+"""
+知识库同步命令
+
+消费 KnowledgeSyncOutbox 待办，将 KnowledgeBase 的新增/更新/删除批量同步到 Milvus，并可定期对账。
+
+示例：
+    python manage.py sync_knowledge
+    python manage.py sync_knowledge --reconcile --orphans adopt   # 首次启用时为历史上传数据补建KnowledgeBase行
+    python manage.py sync_knowledge --loop --interval 10
+"""
+
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.knowledge.sync import KnowledgeSyncWorker
+
+
+class Command(BaseCommand):
+    help = "批量同步KnowledgeBase与Milvus向量（outbox），可选对账修复两侧漂移"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='每批处理的待办数')
+        parser.add_argument('--reconcile', action='store_true', help='处理待办前先分页对账')
+        parser.add_argument('--orphans', choices=['report', 'adopt', 'delete'], default='report',
+                            help='对账时Milvus中无对应KnowledgeBase行的向量: report仅统计, adopt补建行, delete删除')
+        parser.add_argument('--loop', action='store_true', help='持续运行')
+        parser.add_argument('--interval', type=float, default=10, help='持续运行时的轮询间隔(秒)')
+
+    def handle(self, *args, **options):
+        config = apps.get_app_config('knowledge')
+        worker = KnowledgeSyncWorker(config.embedder, config.vector_store, batch_size=options['batch_size'])
+
+        while True:
+            if options['reconcile']:
+                try:
+                    stats = worker.reconcile(orphans=options['orphans'])
+                except ValueError as e:
+                    raise CommandError(str(e))
+                self.stdout.write(f"对账结果: {stats}")
+            stats = worker.drain()
+            self.stdout.write(self.style.SUCCESS(f"同步结果: {stats}"))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
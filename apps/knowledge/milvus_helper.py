@@ -13,6 +13,8 @@ from unstructured.chunking.basic import chunk_elements
 from unstructured.chunking.title import chunk_by_title
 from apps.utils.logger_manager import get_logger
 from unstructured.partition.auto import partition
+from apps.knowledge.partition_cache import partition_with_cache
+from apps.knowledge.chunking import get_token_chunker
 import os
 
 
@@ -51,24 +53,31 @@ def init_milvus_collection(collection_name="vv_knowledge_collection"):
         raise Exception(f"初始化Milvus集合失败: {str(e)}")
 
 # 处理单个Excel文件
-def process_single_excel(file_path):
+def process_single_excel(file_path, max_characters=500):
     """处理单个Excel文件"""
     try:
-        elements = partition_xlsx(filename=file_path)
-        chunks = chunk_elements(elements=elements, max_characters=500)
+        elements = partition_with_cache(file_path, "xlsx", partition_xlsx)
+        chunker = get_token_chunker()
+        if chunker is not None:
+            chunks = chunker.chunk(elements)
+        else:
+            chunks = chunk_elements(elements=elements, max_characters=max_characters)
     except Exception as e:
         raise ValueError(f"Excel文件处理失败: {str(e)}")
     return chunks
 
 # 处理单个pdf文件
-def process_single_pdf(file_path):
+def process_single_pdf(file_path, max_characters=500, combine_text_under_n_chars=200):
     """处理单个pdf文件"""
     try:
-        elements = partition(filename=file_path)
+        elements = partition_with_cache(file_path, "auto", partition)
+        chunker = get_token_chunker()
+        if chunker is not None:
+            return chunker.chunk(elements)
         chunks = chunk_by_title(
             elements,
-            max_characters=500,         # 每个块最多1500个字符
-            combine_text_under_n_chars=200,  # 合并小于300字符的块
+            max_characters=max_characters,         # 每个块最多max_characters个字符
+            combine_text_under_n_chars=combine_text_under_n_chars,  # 合并小于该字符数的块
             multipage_sections=True,     # 允许部分跨页
         )
     except Exception as e:
@@ -76,8 +85,12 @@ def process_single_pdf(file_path):
     return chunks
 
 
-def process_singel_file(file_path):
-    """处理单个文件, 返回文件分区、chunking后的chunks"""
+def process_singel_file(file_path, max_characters=500):
+    """处理单个文件, 返回文件分区、chunking后的chunks
+
+    分区结果按文件内容哈希缓存(见partition_cache), 同一文件重复入库或调整max_characters重新chunking时不再重复分区
+    KNOWLEDGE_CHUNKING['strategy'] 为 'token' 时按 bge-m3 token 数打包(见chunking), max_characters 仅在 'character' 策略下生效
+    """
     # NOTE: 如下是unstructured支持解析的文件类型，除此外的文件类型无法解析
     file_categories = {
         "CSV": [".csv"],
@@ -105,12 +118,16 @@ def process_singel_file(file_path):
             logger.info(f"开始解析文件: {file_path}")
             try:
                 if file_type in [".xlsx", ".xls"]:
-                    chunks = process_single_excel(file_path)
+                    chunks = process_single_excel(file_path, max_characters=max_characters)
                 elif file_type in [".pdf"]:
-                    chunks = process_single_pdf(file_path)
+                    chunks = process_single_pdf(file_path, max_characters=max_characters)
                 else:
-                    elements = partition(filename=file_path)
-                    chunks = chunk_by_title(elements=elements, max_characters=500)
+                    elements = partition_with_cache(file_path, "auto", partition)
+                    chunker = get_token_chunker()
+                    if chunker is not None:
+                        chunks = chunker.chunk(elements)
+                    else:
+                        chunks = chunk_by_title(elements=elements, max_characters=max_characters)
                 logger.info(f"文件调用unstructured库分区、chunking成功")
                 return chunks
             except Exception as e:
@@ -0,0 +1,142 @@
+"""
+文档分区结果缓存
+
+unstructured 的分区（PDF 版面分析、xlsx 解析等）是知识库入库最慢的一步，
+同一文件重复上传、或仅调整 chunking 参数（max_characters 等）重新切分时都会从头再做一次。
+
+本模块将分区得到的 elements 按「文件内容哈希 + 分区策略」缓存到本地磁盘：
+- 键：文件内容 sha256 + 分区策略名 + 分区参数 + unstructured 版本
+- 值：elements_to_dicts 的结果，使用 orjson 序列化后再用 zstd 压缩，体积紧凑、读写快
+
+chunking 不参与缓存键，因此调整 chunking 参数的实验、以及同一文件的重复入库都可以直接跳过分区。
+"""
+
+import hashlib
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+import zstandard
+from django.conf import settings
+from unstructured.staging.base import elements_from_dicts, elements_to_dicts
+
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+# 缓存格式版本号，序列化格式变化时递增，使旧缓存自动失效
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_CACHE_CONFIG = {
+    'enabled': True,
+    'cache_dir': os.path.join('cache', 'partitions'),
+    'compression_level': 3,
+}
+
+
+def _get_cache_config() -> Dict[str, Any]:
+    """读取 settings.PARTITION_CACHE_CONFIG，缺省项使用默认值"""
+    config = dict(DEFAULT_CACHE_CONFIG)
+    config.update(getattr(settings, 'PARTITION_CACHE_CONFIG', {}) or {})
+    return config
+
+
+def _unstructured_version() -> str:
+    try:
+        from unstructured.__version__ import __version__
+        return __version__
+    except Exception:
+        return 'unknown'
+
+
+def file_content_hash(file_path: str, block_size: int = 1 << 20) -> str:
+    """按块读取文件并计算内容 sha256，避免大文件一次性读入内存"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_cache_key(content_hash: str, strategy: str, partition_kwargs: Optional[Dict[str, Any]] = None) -> str:
+    """根据内容哈希、分区策略及分区参数生成缓存键"""
+    key_payload = orjson.dumps(
+        {
+            'v': CACHE_FORMAT_VERSION,
+            'content': content_hash,
+            'strategy': strategy,
+            'kwargs': partition_kwargs or {},
+            'unstructured': _unstructured_version(),
+        },
+        option=orjson.OPT_SORT_KEYS,
+        default=str,
+    )
+    return hashlib.sha256(key_payload).hexdigest()
+
+
+def _cache_file_path(cache_key: str) -> str:
+    cache_dir = _get_cache_config()['cache_dir']
+    # 两级目录，避免单目录下文件过多
+    return os.path.join(cache_dir, cache_key[:2], f"{cache_key}.json.zst")
+
+
+def load_cached_elements(cache_key: str) -> Optional[List[Any]]:
+    """读取缓存的分区结果，未命中或缓存损坏时返回 None"""
+    path = _cache_file_path(cache_key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            raw = zstandard.ZstdDecompressor().decompress(f.read())
+        return elements_from_dicts(orjson.loads(raw))
+    except Exception as e:
+        logger.warning(f"读取分区缓存失败, 将重新分区: {path}, 错误: {str(e)}")
+        return None
+
+
+def save_cached_elements(cache_key: str, elements: List[Any]) -> None:
+    """将分区结果写入缓存；先写临时文件再原子替换，避免并发读到半截文件"""
+    config = _get_cache_config()
+    path = _cache_file_path(cache_key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = orjson.dumps(elements_to_dicts(elements), default=str)
+    compressed = zstandard.ZstdCompressor(level=config['compression_level']).compress(payload)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def partition_with_cache(file_path: str, strategy: str, partition_func: Callable[..., List[Any]], **partition_kwargs) -> List[Any]:
+    """带缓存的分区：命中缓存直接返回 elements，否则调用 partition_func 分区并写入缓存
+
+    Args:
+        file_path: 待分区文件路径
+        strategy: 分区策略名（如 'xlsx'、'auto'），不同分区函数的结果互不复用
+        partition_func: unstructured 分区函数，如 partition_xlsx / partition
+        partition_kwargs: 透传给分区函数的参数，同时参与缓存键计算
+
+    Returns:
+        分区得到的 elements 列表
+    """
+    if not _get_cache_config()['enabled']:
+        return partition_func(filename=file_path, **partition_kwargs)
+
+    cache_key = build_cache_key(file_content_hash(file_path), strategy, partition_kwargs)
+    elements = load_cached_elements(cache_key)
+    if elements is not None:
+        logger.info(f"命中分区缓存, 跳过分区: {file_path}, 元素数: {len(elements)}")
+        return elements
+
+    elements = partition_func(filename=file_path, **partition_kwargs)
+    try:
+        save_cached_elements(cache_key, elements)
+        logger.info(f"分区结果已写入缓存: {file_path}, 元素数: {len(elements)}")
+    except Exception as e:
+        # 缓存写入失败不影响主流程
+        logger.warning(f"写入分区缓存失败: {file_path}, 错误: {str(e)}")
+    return elements
@@ -0,0 +1,286 @@
+"""
+知识库重建索引任务
+
+当嵌入模型、chunking 策略或索引参数发生变化时，将整个知识库重新嵌入到一个新集合中，完成后原子切换别名。
+
+两种模式：
+- rows: 从旧集合按主键分页流式读出 content，使用新模型重新嵌入（适用于模型/索引参数变化）
+- sources: 按 source 逐个文件重新分区、chunking 后嵌入（适用于 chunking 策略变化，分区结果走 partition_cache）；
+  源文件已不存在时回退为对该文件的已有行重新嵌入
+
+进度记录在本地断点文件中，任务崩溃后使用相同参数重新运行即可从断点继续：
+- rows 模式记录已写入的最大源主键，可能在"写入成功但断点未落盘"的极小窗口内产生少量重复数据
+- sources 模式记录已完成的文件，恢复时会先删除目标集合中未完成文件的残留数据
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from pymilvus import Collection
+
+from apps.knowledge.chunking import get_chunking_config
+from apps.knowledge.vector_store import (
+    BufferedMilvusWriter,
+    MilvusVectorStore,
+    SCALAR_FIELDS,
+    swap_collection_alias,
+)
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_REINDEX_CONFIG = {
+    'checkpoint_dir': os.path.join('cache', 'reindex'),
+    'read_batch_size': 1000,
+    'embed_batch_size': 256,
+    'write_batch_size': 2000,
+}
+
+
+def get_reindex_config() -> Dict[str, Any]:
+    """读取 settings.REINDEX_CONFIG，缺省项使用默认值"""
+    config = dict(DEFAULT_REINDEX_CONFIG)
+    config.update(getattr(settings, 'REINDEX_CONFIG', {}) or {})
+    return config
+
+
+def _quote_expr_value(value: str) -> str:
+    """转义 Milvus 过滤表达式中的字符串值"""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class ReindexCheckpoint:
+    """重建索引断点文件（JSON），每次更新后原子落盘"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data: Dict[str, Any] = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+
+    @property
+    def exists(self) -> bool:
+        return bool(self.data)
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def reset(self, **data) -> None:
+        self.data = dict(data)
+        self.save()
+
+
+class KnowledgeReindexJob:
+    """将知识库重新嵌入到新集合并切换别名的可恢复任务"""
+
+    def __init__(self,
+                 embedder,
+                 source_collection: str,
+                 target_collection: Optional[str] = None,
+                 mode: str = 'rows',
+                 index_params: Optional[Dict[str, Any]] = None,
+                 max_characters: int = 500,
+                 swap: bool = True,
+                 restart: bool = False):
+        """
+        Args:
+            embedder: 嵌入模型实例（BGEM3Embedder）
+            source_collection: 旧集合名或业务使用的别名
+            target_collection: 新集合名，为空时根据任务参数生成，保证相同参数重跑时命中同一断点
+            mode: 'rows' 或 'sources'
+            index_params: 新集合的索引参数，为空时使用默认索引参数
+            max_characters: sources 模式下 chunking 的最大字符数
+            swap: 完成后是否将 source_collection 别名切换到新集合
+            restart: 忽略已有断点，从头开始
+        """
+        if mode not in ('rows', 'sources'):
+            raise ValueError(f"不支持的重建模式: {mode}")
+        self.embedder = embedder
+        self.source_collection = source_collection
+        self.mode = mode
+        self.index_params = index_params
+        self.max_characters = max_characters
+        self.swap = swap
+        self.config = get_reindex_config()
+
+        self.fingerprint = self._build_fingerprint()
+        self.target_collection = target_collection or f"{source_collection}_{self.fingerprint[:8]}"
+        self.checkpoint = ReindexCheckpoint(
+            os.path.join(self.config['checkpoint_dir'], f"{self.target_collection}.json")
+        )
+        if restart or not self.checkpoint.exists:
+            self.checkpoint.reset(
+                fingerprint=self.fingerprint,
+                source=self.source_collection,
+                target=self.target_collection,
+                mode=self.mode,
+                status='running',
+                last_id=None,
+                done_sources=[],
+                current_source=None,
+                written=0,
+            )
+        elif self.checkpoint.data.get('fingerprint') != self.fingerprint:
+            raise ValueError(
+                f"断点文件 {self.checkpoint.path} 与本次任务参数不一致，请更换目标集合名或使用 restart 重新开始"
+            )
+
+    def _build_fingerprint(self) -> str:
+        payload = json.dumps({
+            'model': getattr(self.embedder, 'model_name', ''),
+            'dim': self.embedder.dimension,
+            'index_params': self.index_params,
+            'mode': self.mode,
+            'max_characters': self.max_characters if self.mode == 'sources' else None,
+            'chunking': get_chunking_config() if self.mode == 'sources' else None,
+        }, sort_keys=True)
+        return hashlib.md5(payload.encode()).hexdigest()
+
+    def run(self) -> Dict[str, Any]:
+        """执行重建，返回断点信息（包含写入条数、目标集合等）"""
+        data = self.checkpoint.data
+        if data.get('status') == 'swapped':
+            logger.info(f"重建任务已完成: {self.target_collection}")
+            return data
+
+        vector_db = getattr(settings, 'VECTOR_DB_CONFIG', {})
+        host = vector_db.get('host', 'localhost')
+        port = vector_db.get('port', '19530')
+        source_store = MilvusVectorStore(host=host, port=port, collection_name=self.source_collection)
+        MilvusVectorStore(
+            host=host,
+            port=port,
+            collection_name=self.target_collection,
+            dim=self.embedder.dimension,
+            index_params=self.index_params,
+        )
+        logger.info(
+            f"开始重建索引: {self.source_collection} -> {self.target_collection}, 模式: {self.mode}, "
+            f"已写入: {data.get('written', 0)}"
+        )
+
+        if data.get('status') == 'running':
+            if self.mode == 'rows':
+                self._reindex_rows(source_store)
+            else:
+                self._reindex_sources(source_store)
+            data['status'] = 'indexed'
+            self.checkpoint.save()
+
+        if self.swap:
+            previous = swap_collection_alias(self.source_collection, self.target_collection)
+            data['status'] = 'swapped'
+            data['previous_collection'] = previous
+            self.checkpoint.save()
+        logger.info(f"重建索引完成: {self.target_collection}, 共写入 {data.get('written', 0)} 条")
+        return data
+
+    def _reindex_rows(self, source_store: MilvusVectorStore) -> None:
+        """rows 模式：按主键升序分页读取旧集合，重新嵌入后写入新集合"""
+        data = self.checkpoint.data
+        embed_batch_size = self.config['embed_batch_size']
+
+        def on_flush(tags: List[Any], primary_keys: List[Any]) -> None:
+            # tags 为源数据主键，读取与写入均按主键升序，本批最后一个即为新的断点
+            data['last_id'] = tags[-1]
+            data['written'] = data.get('written', 0) + len(tags)
+            self.checkpoint.save()
+
+        pending: List[Dict[str, Any]] = []
+        with BufferedMilvusWriter(self.target_collection, self.config['write_batch_size'], on_flush) as writer:
+            for page in source_store.iter_rows(
+                batch_size=self.config['read_batch_size'],
+                start_after_id=data.get('last_id'),
+            ):
+                pending.extend(page)
+                while len(pending) >= embed_batch_size:
+                    batch, pending = pending[:embed_batch_size], pending[embed_batch_size:]
+                    self._embed_and_write(writer, batch, [row['id'] for row in batch])
+            if pending:
+                self._embed_and_write(writer, pending, [row['id'] for row in pending])
+
+    def _reindex_sources(self, source_store: MilvusVectorStore) -> None:
+        """sources 模式：按文件重新分区、chunking、嵌入"""
+        from apps.knowledge.milvus_helper import process_singel_file
+
+        data = self.checkpoint.data
+        target = Collection(self.target_collection)
+
+        # 上次中断时未完成的文件，先清理其在目标集合中的残留数据
+        current = data.get('current_source')
+        if current:
+            target.delete(expr=f"source == {_quote_expr_value(current)}")
+            logger.info(f"已清理未完成文件的残留数据: {current}")
+
+        sources = set()
+        for page in source_store.iter_rows(batch_size=self.config['read_batch_size'], output_fields=['source']):
+            sources.update(row['source'] for row in page)
+        done = set(data.get('done_sources') or [])
+        todo = sorted(sources - done)
+        logger.info(f"共 {len(sources)} 个文件, 待处理 {len(todo)} 个")
+
+        with BufferedMilvusWriter(self.target_collection, self.config['write_batch_size']) as writer:
+            for source in todo:
+                data['current_source'] = source
+                self.checkpoint.save()
+
+                rows = self._rechunk_source(source, process_singel_file)
+                if rows is None:
+                    logger.warning(f"源文件不存在或解析失败, 对已有数据重新嵌入: {source}")
+                    rows = []
+                    for page in source_store.iter_rows(
+                        batch_size=self.config['read_batch_size'],
+                        expr=f"source == {_quote_expr_value(source)}",
+                    ):
+                        rows.extend(page)
+
+                embed_batch_size = self.config['embed_batch_size']
+                for start in range(0, len(rows), embed_batch_size):
+                    self._embed_and_write(writer, rows[start:start + embed_batch_size])
+                writer.flush()
+
+                data['written'] = data.get('written', 0) + len(rows)
+                data.setdefault('done_sources', []).append(source)
+                data['current_source'] = None
+                self.checkpoint.save()
+
+    def _rechunk_source(self, source: str, process_file) -> Optional[List[Dict[str, Any]]]:
+        """按新的 chunking 策略重新切分源文件，返回待嵌入的行（不含向量）"""
+        if not os.path.exists(source):
+            return None
+        try:
+            chunks = process_file(source, max_characters=self.max_characters)
+        except ValueError:
+            return None
+        if not chunks:
+            return None
+        file_prefix = hashlib.md5(os.path.basename(source).encode()).hexdigest()[:10]
+        upload_time = datetime.now().isoformat()
+        return [{
+            "content": str(getattr(chunk, 'text', chunk)),
+            "metadata": '{}',
+            "source": source,
+            "doc_type": os.path.splitext(source)[1],
+            "chunk_id": f"{file_prefix}_{i:04d}",
+            "upload_time": upload_time,
+        } for i, chunk in enumerate(chunks)]
+
+    def _embed_and_write(self, writer: BufferedMilvusWriter, rows: List[Dict[str, Any]], tags: Optional[List[Any]] = None) -> None:
+        """批量嵌入并交给缓冲写入器"""
+        embeddings = self.embedder.get_embeddings_array([row['content'] for row in rows])
+        new_rows = []
+        for row, embedding in zip(rows, embeddings):
+            new_row = {field: row.get(field) or '' for field in SCALAR_FIELDS}
+            new_row['metadata'] = new_row['metadata'] or '{}'
+            new_row['embedding'] = embedding  # ndarray行视图, 无需转换为列表
+            new_rows.append(new_row)
+        writer.write_many(new_rows, tags)
@@ -3,7 +3,43 @@
 from ..core.models import KnowledgeBase
 # from typing import List, Dict, Any
 from apps.utils.logger_manager import get_logger
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from typing import Any, Dict, List, Optional
+from .similarity import SimilarityService
+from .sync import KnowledgeSyncWorker, enqueue_deletes, enqueue_upserts, get_sync_config
+
+DEFAULT_RETRIEVAL_CONFIG = {
+    'max_workers': 4,
+    'timeout': 15,
+}
+
+_retrieval_executor = None
+_retrieval_executor_lock = threading.Lock()
+
+
+def get_retrieval_config() -> Dict[str, Any]:
+    """读取 settings.KNOWLEDGE_RETRIEVAL_CONFIG，缺省项使用默认值"""
+    config = dict(DEFAULT_RETRIEVAL_CONFIG)
+    config.update(getattr(settings, 'KNOWLEDGE_RETRIEVAL_CONFIG', {}) or {})
+    return config
+
+
+def _get_retrieval_executor() -> ThreadPoolExecutor:
+    """知识检索专用的有界线程池（进程内单例），避免嵌入编码与Milvus请求阻塞事件循环"""
+    global _retrieval_executor
+    if _retrieval_executor is None:
+        with _retrieval_executor_lock:
+            if _retrieval_executor is None:
+                _retrieval_executor = ThreadPoolExecutor(
+                    max_workers=get_retrieval_config()['max_workers'],
+                    thread_name_prefix='knowledge-retrieval',
+                )
+    return _retrieval_executor
 
 
 class KnowledgeService:
@@ -13,28 +49,77 @@ class KnowledgeService:
         config = apps.get_app_config('knowledge')
         self.vector_store = config.vector_store
         self.embedder = config.embedder
+        # 批量相似度/近似重复检测服务
+        self.similarity = SimilarityService(self.embedder, self.vector_store)
+        # MySQL与Milvus的批量同步任务(outbox)
+        self.sync_worker = KnowledgeSyncWorker(self.embedder, self.vector_store)
         self.logger = get_logger(self.__class__.__name__)
+
+    def sync_pending(self, knowledge_ids: List[int]) -> Dict[str, int]:
+        """写入后立即同步本次登记的待办；其他待办及失败重试由 sync_knowledge 命令处理"""
+        if not get_sync_config()['drain_on_write']:
+            return {}
+        try:
+            return self.sync_worker.drain(knowledge_ids=knowledge_ids)
+        except Exception as e:
+            self.logger.error(f"知识库同步失败, 将由同步任务重试: {str(e)}", exc_info=True)
+            return {}
         
     def add_knowledge(self, title: str, content: str) -> int:
-        """添加知识到知识库"""
-        # 获取嵌入向量
-        embedding = self.embedder.get_embeddings(content)[0]
-        
-        # 添加到向量数据库
-        self.vector_store.add_documents([{
-            "title": title,
-            "content": content,
-            "embedding": embedding
-        }])
-        
-        # 保存到MySQL
-        knowledge = KnowledgeBase(
-            title=title,
-            content=content
-        )
-        knowledge.save()
-        
+        """添加知识到知识库：在同一事务中写入 KnowledgeBase 行和同步待办，向量由同步任务写入"""
+        with transaction.atomic():
+            knowledge = KnowledgeBase.objects.create(title=title, content=content)
+            enqueue_upserts([knowledge.id])
+        self.sync_pending([knowledge.id])
         return knowledge.id
+
+    def add_document_chunks(self, source: str, doc_type: str, chunk_ids: List[str], titles: List[str], contents: List[str]) -> List[int]:
+        """批量写入文档分片；同一来源文件重新上传时替换旧分片
+
+        Returns:
+            新写入的 KnowledgeBase 主键列表
+        """
+        with transaction.atomic():
+            old_rows = KnowledgeBase.objects.select_for_update().filter(source=source)
+            old_items = list(old_rows.values_list('id', 'vector_id'))
+            enqueue_deletes(old_items)
+            old_rows.delete()
+            KnowledgeBase.objects.bulk_create([
+                KnowledgeBase(title=title[:200], content=content, source=source, doc_type=doc_type, chunk_id=chunk_id)
+                for title, content, chunk_id in zip(titles, contents, chunk_ids)
+            ], batch_size=500)
+            # MySQL 下 bulk_create 不回填主键, 按来源重新查询
+            knowledge_ids = list(KnowledgeBase.objects.filter(source=source).order_by('id').values_list('id', flat=True))
+            enqueue_upserts(knowledge_ids)
+        self.sync_pending([knowledge_id for knowledge_id, _ in old_items] + knowledge_ids)
+        return knowledge_ids
+
+    def update_knowledge(self, knowledge_id: int, title: Optional[str] = None, content: Optional[str] = None) -> bool:
+        """更新知识条目，内容变化时重新同步向量"""
+        with transaction.atomic():
+            knowledge = KnowledgeBase.objects.select_for_update().filter(id=knowledge_id).first()
+            if knowledge is None:
+                return False
+            content_changed = content is not None and content != knowledge.content
+            if title is not None:
+                knowledge.title = title
+            if content_changed:
+                knowledge.content = content
+                knowledge.sync_status = 'pending'
+                enqueue_upserts([knowledge.id])
+            knowledge.save()
+        if content_changed:
+            self.sync_pending([knowledge_id])
+        return True
+
+    def delete_knowledge(self, knowledge_ids: List[int]) -> int:
+        """按ID批量删除知识条目及其向量"""
+        with transaction.atomic():
+            rows = KnowledgeBase.objects.select_for_update().filter(id__in=knowledge_ids)
+            enqueue_deletes(rows.values_list('id', 'vector_id'))
+            deleted, _ = rows.delete()
+        self.sync_pending(knowledge_ids)
+        return deleted
         
     def search_relevant_knowledge(self, query: str, top_k: int = 5, min_score_threshold: float = 0.6) -> str:
         """搜索相关知识
@@ -48,7 +133,7 @@ class KnowledgeService:
             组合后的相关知识文本
         """
         # 获取查询的嵌入向量
-        query_embedding = self.embedder.get_embeddings(query)[0]
+        query_embedding = self.embedder.get_embeddings_array(query, use_case='query')[0]
         self.logger.info(
             f"知识库查询context: '{query}'\n"
             f"向量维度: {len(query_embedding)}\n"
@@ -94,6 +179,29 @@ class KnowledgeService:
         
         return combined_content
 
+    async def asearch_relevant_knowledge(self, query: str, top_k: int = 5, min_score_threshold: float = 0.6,
+                                         timeout: Optional[float] = None) -> str:
+        """search_relevant_knowledge 的异步版本
+
+        嵌入编码与Milvus检索在有界线程池中执行，不阻塞事件循环；超过 timeout 秒抛出 asyncio.TimeoutError
+        （线程池中的检索仍会执行完毕，但调用方不再等待）。
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            _get_retrieval_executor(),
+            self.search_relevant_knowledge,
+            query,
+            top_k,
+            min_score_threshold,
+        )
+        timeout = get_retrieval_config()['timeout'] if timeout is None else timeout
+        return await asyncio.wait_for(future, timeout=timeout)
+
+    async def adedupe(self, texts: List[str], threshold: float = 0.92) -> List[int]:
+        """SimilarityService.dedupe 的异步版本（嵌入编码在检索线程池中执行），返回需要保留的下标"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_retrieval_executor(), self.similarity.dedupe, texts, threshold)
+
 
 def get_knowledgeService_instance():
     """获取知识库服务实例"""
@@ -0,0 +1,170 @@
+"""
+批量文本相似度服务
+
+BGEM3Embedder.compute_similarity 每次只能比较两条文本，N 条文本两两比较需要 O(N²) 次编码。
+本服务一次性编码全部文本，在归一化向量上做分块矩阵乘法：
+- similarity_matrix: 返回完整相似度矩阵（仅适合 N 较小的场景）
+- top_k_neighbors: 每条文本在自身集合或给定语料中的 top-k 近邻
+- find_near_duplicates / group_near_duplicates / dedupe: 近似重复检测与去重
+- top_k_in_store: N 条文本对 Milvus 中已有知识库的批量检索
+
+分块计算时内存占用为 block_size × block_size，N 很大时也不会生成完整的 N×N 矩阵。
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+TextsOrEmbeddings = Union[Sequence[str], np.ndarray]
+
+
+class SimilarityService:
+    """基于归一化嵌入向量的批量相似度计算服务"""
+
+    def __init__(self, embedder, vector_store=None, block_size: int = 1024):
+        """
+        Args:
+            embedder: 嵌入模型实例（BGEM3Embedder）
+            vector_store: 向量数据库实例（MilvusVectorStore），仅 top_k_in_store 需要
+            block_size: 分块矩阵乘法的块大小
+        """
+        self.embedder = embedder
+        self.vector_store = vector_store
+        self.block_size = block_size
+
+    def embed(self, texts: TextsOrEmbeddings) -> np.ndarray:
+        """编码文本；传入的已经是嵌入矩阵时直接返回"""
+        if isinstance(texts, np.ndarray):
+            return np.ascontiguousarray(texts, dtype=np.float32)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self.embedder.get_embeddings_array(list(texts))
+
+    def iter_similarity_blocks(self, left: np.ndarray, right: np.ndarray) -> Iterator[Tuple[int, int, np.ndarray]]:
+        """分块计算 left @ right.T，依次产出 (行起点, 列起点, 相似度块)"""
+        step = self.block_size
+        for row_start in range(0, len(left), step):
+            left_block = left[row_start:row_start + step]
+            for col_start in range(0, len(right), step):
+                yield row_start, col_start, left_block @ right[col_start:col_start + step].T
+
+    def similarity_matrix(self, texts: TextsOrEmbeddings, other_texts: Optional[TextsOrEmbeddings] = None) -> np.ndarray:
+        """计算完整相似度矩阵（N×N 或 N×M），大规模数据请使用 top_k_neighbors / find_near_duplicates"""
+        left = self.embed(texts)
+        right = left if other_texts is None else self.embed(other_texts)
+        return left @ right.T
+
+    def top_k_neighbors(self,
+                        texts: TextsOrEmbeddings,
+                        k: int = 5,
+                        corpus: Optional[TextsOrEmbeddings] = None) -> List[List[Tuple[int, float]]]:
+        """计算每条文本的 top-k 近邻
+
+        Args:
+            texts: 查询文本（或嵌入矩阵）
+            k: 近邻数量
+            corpus: 语料文本（或嵌入矩阵），为空时在 texts 自身中查找且排除自身
+
+        Returns:
+            与 texts 等长的列表，每项为按相似度降序排列的 (语料下标, 相似度)
+        """
+        queries = self.embed(texts)
+        self_search = corpus is None
+        candidates = queries if self_search else self.embed(corpus)
+        if len(queries) == 0 or len(candidates) == 0:
+            return [[] for _ in range(len(queries))]
+        k = min(k, len(candidates) - (1 if self_search else 0))
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        results: List[List[Tuple[int, float]]] = []
+        step = self.block_size
+        for row_start in range(0, len(queries), step):
+            query_block = queries[row_start:row_start + step]
+            rows = len(query_block)
+            best_scores = np.full((rows, k), -np.inf, dtype=np.float32)
+            best_indices = np.full((rows, k), -1, dtype=np.int64)
+            for col_start in range(0, len(candidates), step):
+                scores = query_block @ candidates[col_start:col_start + step].T
+                cols = scores.shape[1]
+                col_indices = np.arange(col_start, col_start + cols, dtype=np.int64)
+                if self_search:
+                    # 排除自身
+                    row_ids = np.arange(row_start, row_start + rows)[:, None]
+                    scores = np.where(row_ids == col_indices[None, :], -np.inf, scores)
+                merged_scores = np.hstack([best_scores, scores])
+                merged_indices = np.hstack([best_indices, np.broadcast_to(col_indices, (rows, cols))])
+                top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(merged_scores, top, axis=1)
+                best_indices = np.take_along_axis(merged_indices, top, axis=1)
+            order = np.argsort(-best_scores, axis=1)
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            best_indices = np.take_along_axis(best_indices, order, axis=1)
+            for scores_row, indices_row in zip(best_scores, best_indices):
+                results.append([(int(i), float(s)) for i, s in zip(indices_row, scores_row) if i >= 0])
+        return results
+
+    def find_near_duplicates(self, texts: TextsOrEmbeddings, threshold: float = 0.92) -> List[Tuple[int, int, float]]:
+        """找出相似度不低于阈值的文本对，只计算上三角分块
+
+        Returns:
+            (i, j, 相似度) 列表，i < j，按相似度降序
+        """
+        embeddings = self.embed(texts)
+        pairs: List[Tuple[int, int, float]] = []
+        step = self.block_size
+        for row_start in range(0, len(embeddings), step):
+            row_block = embeddings[row_start:row_start + step]
+            for col_start in range(row_start, len(embeddings), step):
+                scores = row_block @ embeddings[col_start:col_start + step].T
+                if col_start == row_start:
+                    # 对角块只保留上三角（排除自身与重复的对称对）
+                    upper = np.triu(np.ones(scores.shape, dtype=bool), k=1)
+                    scores = np.where(upper, scores, -np.inf)
+                rows, cols = np.nonzero(scores >= threshold)
+                for r, c in zip(rows, cols):
+                    pairs.append((row_start + int(r), col_start + int(c), float(scores[r, c])))
+        pairs.sort(key=lambda pair: pair[2], reverse=True)
+        return pairs
+
+    def group_near_duplicates(self, texts: TextsOrEmbeddings, threshold: float = 0.92) -> List[List[int]]:
+        """将近似重复的文本聚成组（并查集），只返回包含两条及以上文本的组"""
+        embeddings = self.embed(texts)
+        parent = list(range(len(embeddings)))
+
+        def find(x: int) -> int:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for i, j, _ in self.find_near_duplicates(embeddings, threshold):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+        groups: Dict[int, List[int]] = {}
+        for idx in range(len(embeddings)):
+            groups.setdefault(find(idx), []).append(idx)
+        return [members for members in groups.values() if len(members) > 1]
+
+    def dedupe(self, texts: TextsOrEmbeddings, threshold: float = 0.92) -> List[int]:
+        """去重，返回需要保留的下标（每组近似重复只保留最靠前的一条）"""
+        embeddings = self.embed(texts)
+        dropped = set()
+        for members in self.group_near_duplicates(embeddings, threshold):
+            dropped.update(members[1:])
+        return [idx for idx in range(len(embeddings)) if idx not in dropped]
+
+    def top_k_in_store(self, texts: TextsOrEmbeddings, k: int = 5) -> List[List[Dict[str, Any]]]:
+        """N 条文本对知识库集合的批量检索（一次 Milvus 请求）"""
+        if self.vector_store is None:
+            raise ValueError("未配置向量数据库, 无法对知识库检索")
+        embeddings = self.embed(texts)
+        if len(embeddings) == 0:
+            return []
+        return self.vector_store.search_batch(embeddings, top_k=k)
@@ -0,0 +1,412 @@
+"""
+知识库快照导出/导入
+
+将整个知识库（Milvus 向量与标量字段 + MySQL KnowledgeBase 表）写入单个本地快照文件，
+用于在环境之间迁移语料，或在 Milvus 数据丢失后直接恢复，无需重新分区、重新嵌入。
+
+快照为一个 zip 文件，内部按列存储：
+- manifest.json: 格式版本、模型名称、向量维度、行数、各列文件清单
+- milvus/id.npy, milvus/embedding.npy: 原主键 (n,) int64 与向量 (n, dim) float32/float16，不压缩
+- milvus/<字段>.offsets.npy + milvus/<字段>.bin: 字符串列，UTF-8 字节拼接 + (n+1) 个 int64 偏移量，deflate 压缩
+- mysql/knowledge_base/...: KnowledgeBase 表，同样按列存储
+
+导出与导入都是流式的：导出时各列先追加写入临时文件再拷贝进 zip；导入时按批从 zip 中顺序读取，
+向量经 BufferedMilvusWriter 批量写入，KnowledgeBase 行经 bulk_create 批量写入，并把 vector_id 重映射为新主键。
+"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from pymilvus import Collection, utility
+
+from apps.core.models import KnowledgeBase
+from apps.knowledge.vector_store import (
+    BufferedMilvusWriter,
+    MilvusVectorStore,
+    SCALAR_FIELDS,
+    _find_alias_target,
+)
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+SNAPSHOT_FORMAT = 'testbrain-knowledge-snapshot'
+SNAPSHOT_VERSION = 1
+
+MILVUS_PREFIX = 'milvus'
+MYSQL_PREFIX = 'mysql/knowledge_base'
+KB_STRING_FIELDS = ['title', 'content', 'vector_id', 'source', 'doc_type', 'chunk_id', 'created_at', 'updated_at']
+
+
+def _write_npy_entry(zf: zipfile.ZipFile, name: str, raw_path: str, dtype: np.dtype, shape: tuple) -> None:
+    """将临时文件中的原始数据加上 npy 头写入 zip，不整体读入内存"""
+    with zf.open(name, 'w', force_zip64=True) as dst:
+        np.lib.format.write_array_header_2_0(dst, {
+            'descr': np.lib.format.dtype_to_descr(dtype),
+            'fortran_order': False,
+            'shape': shape,
+        })
+        with open(raw_path, 'rb') as src:
+            shutil.copyfileobj(src, dst, 1 << 20)
+
+
+def _open_npy_entry(zf: zipfile.ZipFile, name: str):
+    """打开 zip 中的 npy 文件，返回 (文件对象, shape, dtype)，文件指针位于数据起始处"""
+    f = zf.open(name)
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+    return f, shape, dtype
+
+
+def _read_npy_entry(zf: zipfile.ZipFile, name: str) -> np.ndarray:
+    with zf.open(name) as f:
+        return np.load(io.BytesIO(f.read()), allow_pickle=False)
+
+
+class _ColumnWriter:
+    """流式列写入器：数值列与字符串列都先追加到临时文件，结束时写入 zip"""
+
+    def __init__(self, tmp_dir: str, name: str, dtype: Optional[np.dtype] = None, row_shape: tuple = ()):
+        """dtype 为空时为字符串列，否则为 (rows,) + row_shape 的数值列"""
+        self.name = name
+        self.data_path = os.path.join(tmp_dir, name.replace('/', '__'))
+        self._data = open(self.data_path, 'wb')
+        self._offsets = array('q', [0])
+        self.rows = 0
+        self.dtype = np.dtype(dtype) if dtype is not None else None
+        self.row_shape = tuple(row_shape)
+
+    def append_strings(self, values: List[Any]) -> None:
+        for value in values:
+            data = ('' if value is None else str(value)).encode('utf-8')
+            self._data.write(data)
+            self._offsets.append(self._offsets[-1] + len(data))
+        self.rows += len(values)
+
+    def append_array(self, values: np.ndarray) -> None:
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        self._data.write(values.tobytes())
+        self.rows += len(values)
+
+    def write_to(self, zf: zipfile.ZipFile) -> List[str]:
+        self._data.close()
+        if self.dtype is not None:
+            entry = f"{self.name}.npy"
+            _write_npy_entry(zf, entry, self.data_path, self.dtype, (self.rows,) + self.row_shape)
+            return [entry]
+        zf.write(self.data_path, f"{self.name}.bin", compress_type=zipfile.ZIP_DEFLATED)
+        with zf.open(f"{self.name}.offsets.npy", 'w', force_zip64=True) as f:
+            np.save(f, np.frombuffer(self._offsets, dtype=np.int64), allow_pickle=False)
+        return [f"{self.name}.bin", f"{self.name}.offsets.npy"]
+
+
+class _StringColumnReader:
+    """按批顺序读取字符串列"""
+
+    def __init__(self, zf: zipfile.ZipFile, name: str):
+        self.offsets = _read_npy_entry(zf, f"{name}.offsets.npy")
+        self._data = zf.open(f"{name}.bin")
+        self._pos = 0
+
+    def read(self, count: int) -> List[str]:
+        offsets = self.offsets[self._pos:self._pos + count + 1]
+        raw = self._data.read(int(offsets[-1] - offsets[0]))
+        base = int(offsets[0])
+        self._pos += len(offsets) - 1
+        return [raw[int(s) - base:int(e) - base].decode('utf-8') for s, e in zip(offsets[:-1], offsets[1:])]
+
+    def close(self) -> None:
+        self._data.close()
+
+
+class _ArrayColumnReader:
+    """按批顺序读取 npy 数值列"""
+
+    def __init__(self, zf: zipfile.ZipFile, name: str):
+        self._file, self.shape, self.dtype = _open_npy_entry(zf, f"{name}.npy")
+        self._row_bytes = int(np.prod(self.shape[1:], dtype=np.int64)) * self.dtype.itemsize
+
+    def read(self, count: int) -> np.ndarray:
+        raw = self._file.read(count * self._row_bytes)
+        return np.frombuffer(raw, dtype=self.dtype).reshape((-1,) + tuple(self.shape[1:]))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _iter_knowledge_base_pages(batch_size: int) -> Iterator[List[KnowledgeBase]]:
+    """按主键分页读取 KnowledgeBase（MySQL 下 .iterator() 不能真正流式读取）"""
+    last_id = 0
+    while True:
+        page = list(KnowledgeBase.objects.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not page:
+            return
+        yield page
+        last_id = page[-1].id
+
+
+def export_knowledge_snapshot(output_path: str,
+                              collection_name: Optional[str] = None,
+                              include_mysql: bool = True,
+                              dtype: str = 'float32',
+                              batch_size: int = 2000) -> Dict[str, Any]:
+    """导出知识库快照
+
+    Args:
+        output_path: 快照文件路径
+        collection_name: Milvus 集合名或别名，默认取 VECTOR_DB_CONFIG.collection_name
+        include_mysql: 是否导出 KnowledgeBase 表
+        dtype: 向量存储类型 float32 / float16（float16 体积减半）
+        batch_size: 每批读取条数
+
+    Returns:
+        快照 manifest
+    """
+    vector_db = getattr(settings, 'VECTOR_DB_CONFIG', {})
+    collection_name = collection_name or vector_db.get('collection_name', 'vv_knowledge_collection')
+    store = MilvusVectorStore(
+        host=vector_db.get('host', 'localhost'),
+        port=vector_db.get('port', '19530'),
+        collection_name=collection_name,
+    )
+    vector_dtype = np.dtype(dtype)
+    if vector_dtype not in (np.dtype(np.float32), np.dtype(np.float16)):
+        raise ValueError(f"不支持的向量数据类型: {dtype}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    dim = _collection_dim(collection_name)
+    with tempfile.TemporaryDirectory(prefix='kb_snapshot_') as tmp_dir:
+        milvus_columns = {
+            'id': _ColumnWriter(tmp_dir, f"{MILVUS_PREFIX}/id", np.int64),
+            'embedding': _ColumnWriter(tmp_dir, f"{MILVUS_PREFIX}/embedding", vector_dtype, (dim,)),
+        }
+        milvus_columns.update({
+            name: _ColumnWriter(tmp_dir, f"{MILVUS_PREFIX}/{name}") for name in SCALAR_FIELDS
+        })
+        for page in store.iter_rows(batch_size=batch_size, output_fields=['embedding'] + SCALAR_FIELDS):
+            milvus_columns['id'].append_array(np.array([row['id'] for row in page], dtype=np.int64))
+            milvus_columns['embedding'].append_array(np.asarray([row['embedding'] for row in page], dtype=np.float32))
+            for field in SCALAR_FIELDS:
+                milvus_columns[field].append_strings([row.get(field) for row in page])
+            logger.info(f"快照导出Milvus数据: {milvus_columns['id'].rows} 条")
+
+        kb_columns = {}
+        if include_mysql:
+            kb_columns = {'id': _ColumnWriter(tmp_dir, f"{MYSQL_PREFIX}/id", np.int64)}
+            kb_columns.update({
+                name: _ColumnWriter(tmp_dir, f"{MYSQL_PREFIX}/{name}") for name in KB_STRING_FIELDS
+            })
+            for page in _iter_knowledge_base_pages(batch_size):
+                kb_columns['id'].append_array(np.array([kb.id for kb in page], dtype=np.int64))
+                for field in KB_STRING_FIELDS:
+                    values = [getattr(kb, field) for kb in page]
+                    if field in ('created_at', 'updated_at'):
+                        values = [value.isoformat() if value else '' for value in values]
+                    kb_columns[field].append_strings(values)
+            logger.info(f"快照导出KnowledgeBase数据: {kb_columns['id'].rows} 条")
+
+        tmp_output = f"{output_path}.tmp"
+        with zipfile.ZipFile(tmp_output, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+            files = []
+            for column in list(milvus_columns.values()) + list(kb_columns.values()):
+                files.extend(column.write_to(zf))
+            manifest = {
+                'format': SNAPSHOT_FORMAT,
+                'version': SNAPSHOT_VERSION,
+                'created_at': datetime.now().isoformat(),
+                'collection': collection_name,
+                'model_name': getattr(settings, 'EMBEDDING_CONFIG', {}).get('model_name'),
+                'dim': dim,
+                'dtype': vector_dtype.name,
+                'milvus_rows': milvus_columns['id'].rows,
+                'knowledge_base_rows': kb_columns['id'].rows if kb_columns else None,
+                'scalar_fields': SCALAR_FIELDS,
+                'knowledge_base_fields': KB_STRING_FIELDS if kb_columns else None,
+                'files': files,
+            }
+            zf.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2),
+                        compress_type=zipfile.ZIP_DEFLATED)
+        os.replace(tmp_output, output_path)
+
+    logger.info(f"知识库快照导出完成: {output_path}, Milvus {manifest['milvus_rows']} 条")
+    return manifest
+
+
+def read_snapshot_manifest(snapshot_path: str) -> Dict[str, Any]:
+    with zipfile.ZipFile(snapshot_path) as zf:
+        manifest = json.loads(zf.read('manifest.json'))
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"不是知识库快照文件: {snapshot_path}")
+    if manifest.get('version', 0) > SNAPSHOT_VERSION:
+        raise ValueError(f"快照版本 {manifest.get('version')} 高于当前支持的版本 {SNAPSHOT_VERSION}")
+    return manifest
+
+
+def _collection_dim(collection_name: str) -> Optional[int]:
+    """读取集合（或别名指向的集合）的向量维度"""
+    for field in Collection(collection_name).schema.fields:
+        if field.name == 'embedding':
+            return int(field.params.get('dim'))
+    return None
+
+
+def import_knowledge_snapshot(snapshot_path: str,
+                              collection_name: Optional[str] = None,
+                              replace: bool = False,
+                              mysql_mode: str = 'insert',
+                              allow_model_mismatch: bool = False,
+                              batch_size: int = 2000) -> Dict[str, Any]:
+    """导入知识库快照
+
+    Args:
+        snapshot_path: 快照文件路径
+        collection_name: 目标集合名，默认取 VECTOR_DB_CONFIG.collection_name
+        replace: 导入前删除目标集合（及 mysql_mode=insert 时的 KnowledgeBase 全表数据）
+        mysql_mode: insert 插入快照中的 KnowledgeBase 行；remap 仅将现有行的 vector_id 更新为新主键
+                    （适用于 MySQL 完好、仅 Milvus 数据丢失的恢复场景）；skip 不处理 MySQL
+        allow_model_mismatch: 快照的嵌入模型与当前配置不一致时是否仍然导入
+        batch_size: 每批写入条数
+
+    Returns:
+        导入统计信息
+    """
+    if mysql_mode not in ('insert', 'remap', 'skip'):
+        raise ValueError(f"不支持的MySQL导入模式: {mysql_mode}")
+    manifest = read_snapshot_manifest(snapshot_path)
+    current_model = getattr(settings, 'EMBEDDING_CONFIG', {}).get('model_name')
+    if manifest.get('model_name') and current_model and manifest['model_name'] != current_model and not allow_model_mismatch:
+        raise ValueError(
+            f"快照嵌入模型 {manifest['model_name']} 与当前配置 {current_model} 不一致，向量不可混用"
+        )
+    if mysql_mode == 'insert' and manifest.get('knowledge_base_rows') is None:
+        raise ValueError("快照中不包含KnowledgeBase数据，请使用 mysql_mode=remap 或 skip")
+
+    vector_db = getattr(settings, 'VECTOR_DB_CONFIG', {})
+    collection_name = collection_name or vector_db.get('collection_name', 'vv_knowledge_collection')
+    host, port = vector_db.get('host', 'localhost'), vector_db.get('port', '19530')
+    MilvusVectorStore(host=host, port=port, collection_name=collection_name, dim=manifest['dim'])
+    if replace:
+        if _find_alias_target(collection_name):
+            raise ValueError(f"{collection_name} 是别名，replace 模式请指定真实集合名")
+        utility.drop_collection(collection_name)
+        logger.info(f"已删除目标集合: {collection_name}")
+        MilvusVectorStore(host=host, port=port, collection_name=collection_name, dim=manifest['dim'])
+    target_dim = _collection_dim(collection_name)
+    if target_dim != manifest['dim']:
+        raise ValueError(f"目标集合维度 {target_dim} 与快照维度 {manifest['dim']} 不一致")
+
+    total = manifest['milvus_rows']
+    with zipfile.ZipFile(snapshot_path) as zf:
+        old_ids = _read_npy_entry(zf, f"{MILVUS_PREFIX}/id.npy")
+        new_ids = np.full(total, -1, dtype=np.int64)
+
+        def on_flush(tags: List[int], primary_keys: List[Any]) -> None:
+            new_ids[tags] = primary_keys
+            logger.info(f"快照导入Milvus数据: {writer.total_written}/{total}")
+
+        embeddings = _ArrayColumnReader(zf, f"{MILVUS_PREFIX}/embedding")
+        scalars = {field: _StringColumnReader(zf, f"{MILVUS_PREFIX}/{field}") for field in manifest['scalar_fields']}
+        try:
+            with BufferedMilvusWriter(collection_name, batch_size, on_flush) as writer:
+                for start in range(0, total, batch_size):
+                    vectors = embeddings.read(min(batch_size, total - start)).astype(np.float32)
+                    columns = {field: reader.read(len(vectors)) for field, reader in scalars.items()}
+                    rows = []
+                    for i, vector in enumerate(vectors):
+                        row = {field: columns[field][i] for field in SCALAR_FIELDS if field in columns}
+                        row['embedding'] = vector
+                        rows.append(row)
+                    writer.write_many(rows, list(range(start, start + len(rows))))
+        finally:
+            embeddings.close()
+            for reader in scalars.values():
+                reader.close()
+
+        id_order = np.argsort(old_ids)
+        sorted_old_ids = old_ids[id_order]
+
+        def remap(vector_id: str) -> str:
+            if not vector_id or not vector_id.lstrip('-').isdigit():
+                return ''
+            pos = np.searchsorted(sorted_old_ids, int(vector_id))
+            if pos < len(sorted_old_ids) and sorted_old_ids[pos] == int(vector_id):
+                return str(int(new_ids[id_order[pos]]))
+            return ''
+
+        kb_count = 0
+        if mysql_mode == 'insert':
+            kb_count = _import_knowledge_base_rows(zf, manifest, remap, replace, batch_size)
+        elif mysql_mode == 'remap':
+            kb_count = _remap_knowledge_base_vector_ids(remap, batch_size)
+
+    result = {
+        'collection': collection_name,
+        'milvus_rows': total,
+        'knowledge_base_rows': kb_count,
+        'mysql_mode': mysql_mode,
+    }
+    logger.info(f"知识库快照导入完成: {result}")
+    return result
+
+
+def _import_knowledge_base_rows(zf: zipfile.ZipFile, manifest: Dict[str, Any], remap, replace: bool, batch_size: int) -> int:
+    """bulk_create 导入 KnowledgeBase 行；created_at/updated_at 为自动字段，导入后会更新为导入时间
+
+    未能映射到向量的行标记为 pending，由 sync_knowledge --reconcile 重新入队同步
+    """
+    total = manifest['knowledge_base_rows']
+    fields = [
+        field for field in manifest.get('knowledge_base_fields') or ['title', 'content', 'vector_id']
+        if field in ('title', 'content', 'vector_id', 'source', 'doc_type', 'chunk_id')
+    ]
+    readers = {field: _StringColumnReader(zf, f"{MYSQL_PREFIX}/{field}") for field in fields}
+    try:
+        with transaction.atomic():
+            if replace:
+                KnowledgeBase.objects.all().delete()
+            for start in range(0, total, batch_size):
+                count = min(batch_size, total - start)
+                columns = {field: reader.read(count) for field, reader in readers.items()}
+                objs = []
+                for i in range(count):
+                    values = {field: columns[field][i] for field in fields}
+                    values['vector_id'] = remap(values.get('vector_id', ''))
+                    values['sync_status'] = 'synced' if values['vector_id'] else 'pending'
+                    objs.append(KnowledgeBase(**values))
+                KnowledgeBase.objects.bulk_create(objs, batch_size=batch_size)
+                logger.info(f"快照导入KnowledgeBase数据: {start + count}/{total}")
+    finally:
+        for reader in readers.values():
+            reader.close()
+    return total
+
+
+def _remap_knowledge_base_vector_ids(remap, batch_size: int) -> int:
+    """将现有 KnowledgeBase 行的 vector_id 更新为导入后的新主键"""
+    updated = 0
+    for page in _iter_knowledge_base_pages(batch_size):
+        changed = []
+        for kb in page:
+            new_vector_id = remap(kb.vector_id)
+            if new_vector_id != kb.vector_id:
+                kb.vector_id = new_vector_id
+                kb.sync_status = 'synced' if new_vector_id else 'pending'
+                changed.append(kb)
+        if changed:
+            KnowledgeBase.objects.bulk_update(changed, ['vector_id', 'sync_status'], batch_size=batch_size)
+            updated += len(changed)
+    logger.info(f"KnowledgeBase vector_id 重映射完成: {updated} 条")
+    return updated
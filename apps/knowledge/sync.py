@@ -0,0 +1,324 @@
+"""
+KnowledgeBase 与 Milvus 的批量同步（outbox 模式）
+
+写入方只在一个数据库事务中写 KnowledgeBase 行和 KnowledgeSyncOutbox 待办，不直接调用 Milvus；
+同步任务批量消费待办：
+- upsert: 批量嵌入 -> 一次 insert 写入新向量 -> bulk_update 回填 KnowledgeBase.vector_id -> 删除旧向量
+  （Milvus 主键为 auto_id，更新即"先写新向量再删旧向量"，检索期间不会出现空窗）
+- delete: 按 vector_id 一次删除
+失败的待办保留错误信息，按 retry_backoff_seconds 指数退避（不超过 max_retry_backoff_seconds）后重试，
+超过最大次数后标记为 failed；Milvus/嵌入服务短时故障不会在一次同步中耗尽全部重试次数。
+
+reconcile() 分页对账，修复两侧漂移：
+- MySQL -> Milvus: 未同步或 vector_id 在 Milvus 中已不存在的行重新入队
+- Milvus -> MySQL: 没有 KnowledgeBase 行对应的向量（历史上传数据等），可选择补建行(adopt)、删除(delete)或仅统计(report)；
+  对账开始后写入的向量可能属于并发同步中尚未回填 vector_id 的条目，不做处理
+
+写入方在请求内只同步自己刚登记的待办（drain(knowledge_ids=...)），积压的待办由
+python manage.py sync_knowledge 定期执行。
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.core.models import KnowledgeBase, KnowledgeSyncOutbox
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_SYNC_CONFIG = {
+    'batch_size': 256,
+    'max_attempts': 5,
+    'reconcile_page_size': 2000,
+    'drain_on_write': True,
+    'processing_timeout_seconds': 600,
+    'retry_backoff_seconds': 30,
+    'max_retry_backoff_seconds': 1800,
+}
+
+
+def get_sync_config() -> Dict[str, Any]:
+    """读取 settings.KNOWLEDGE_SYNC_CONFIG，缺省项使用默认值"""
+    config = dict(DEFAULT_SYNC_CONFIG)
+    config.update(getattr(settings, 'KNOWLEDGE_SYNC_CONFIG', {}) or {})
+    return config
+
+
+def enqueue_upserts(knowledge_ids: Iterable[int]) -> None:
+    """登记需要写入/更新向量的知识条目，应与 KnowledgeBase 的写入处于同一事务"""
+    KnowledgeSyncOutbox.objects.bulk_create([
+        KnowledgeSyncOutbox(knowledge_id=knowledge_id, operation='upsert')
+        for knowledge_id in knowledge_ids
+    ])
+
+
+def enqueue_deletes(items: Iterable[Tuple[int, str]]) -> None:
+    """登记需要删除的向量，items 为 (knowledge_id, vector_id)；vector_id 为空的条目无需删除向量"""
+    KnowledgeSyncOutbox.objects.bulk_create([
+        KnowledgeSyncOutbox(knowledge_id=knowledge_id, operation='delete', vector_id=vector_id)
+        for knowledge_id, vector_id in items
+        if vector_id
+    ])
+
+
+def _written_since(upload_time: Any, since) -> bool:
+    """Milvus 中向量的 upload_time 是否不早于 since；无法解析的（历史数据）视为更早写入"""
+    try:
+        written_at = datetime.fromisoformat(str(upload_time))
+    except (TypeError, ValueError):
+        return False
+    if timezone.is_aware(written_at) and timezone.is_naive(since):
+        written_at = timezone.make_naive(written_at)
+    elif timezone.is_naive(written_at) and timezone.is_aware(since):
+        written_at = timezone.make_aware(written_at)
+    return written_at >= since
+
+
+def _chunk(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class KnowledgeSyncWorker:
+    """消费 KnowledgeSyncOutbox 的批量同步任务"""
+
+    def __init__(self, embedder, vector_store, batch_size: Optional[int] = None, max_attempts: Optional[int] = None):
+        config = get_sync_config()
+        self.embedder = embedder
+        self.vector_store = vector_store
+        self.batch_size = batch_size or config['batch_size']
+        self.max_attempts = max_attempts or config['max_attempts']
+        self.processing_timeout = timedelta(seconds=config['processing_timeout_seconds'])
+        self.retry_backoff_seconds = config['retry_backoff_seconds']
+        self.max_retry_backoff_seconds = config['max_retry_backoff_seconds']
+
+    def drain(self, max_batches: Optional[int] = None,
+              knowledge_ids: Optional[Iterable[int]] = None) -> Dict[str, int]:
+        """处理已到执行时间的待办直到队列为空（或达到 max_batches），返回统计信息
+
+        Args:
+            max_batches: 最多处理的批次数
+            knowledge_ids: 只处理这些知识条目的待办（写入方同步自己刚登记的待办）
+        """
+        knowledge_ids = list(knowledge_ids) if knowledge_ids is not None else None
+        stats = {'batches': 0, 'upserted': 0, 'deleted': 0, 'failed': 0}
+        if knowledge_ids is not None and not knowledge_ids:
+            return stats
+        while max_batches is None or stats['batches'] < max_batches:
+            batch_stats = self.process_batch(knowledge_ids)
+            if batch_stats is None:
+                break
+            stats['batches'] += 1
+            for key in ('upserted', 'deleted', 'failed'):
+                stats[key] += batch_stats[key]
+        if stats['batches']:
+            logger.info(f"知识库同步完成: {stats}")
+        return stats
+
+    def _claim(self, knowledge_ids: Optional[List[int]] = None) -> List[KnowledgeSyncOutbox]:
+        """认领一批已到执行时间的待办；skip_locked 保证多个同步进程不会重复处理同一条待办"""
+        with transaction.atomic():
+            queryset = KnowledgeSyncOutbox.objects.select_for_update(skip_locked=True).filter(
+                status='pending', run_after__lte=timezone.now()
+            )
+            if knowledge_ids is not None:
+                queryset = queryset.filter(knowledge_id__in=knowledge_ids)
+            ids = list(queryset.order_by('id').values_list('id', flat=True)[:self.batch_size])
+            if not ids:
+                return []
+            KnowledgeSyncOutbox.objects.filter(id__in=ids).update(
+                status='processing', attempts=F('attempts') + 1, updated_at=timezone.now()
+            )
+        return list(KnowledgeSyncOutbox.objects.filter(id__in=ids).order_by('id'))
+
+    def process_batch(self, knowledge_ids: Optional[List[int]] = None) -> Optional[Dict[str, int]]:
+        """处理一批待办，没有待办时返回 None"""
+        entries = self._claim(knowledge_ids)
+        if not entries:
+            return None
+
+        # 同一条目的多个待办只保留最新的 upsert；delete 各自携带要删除的向量ID, 全部执行
+        upsert_entries: Dict[int, KnowledgeSyncOutbox] = {}
+        delete_entries: List[KnowledgeSyncOutbox] = []
+        for entry in entries:
+            if entry.operation == 'delete':
+                delete_entries.append(entry)
+            else:
+                upsert_entries[entry.knowledge_id] = entry
+
+        stats = {'upserted': 0, 'deleted': 0, 'failed': 0}
+        try:
+            stats['deleted'] = self._apply_deletes(delete_entries)
+            stats['upserted'] = self._apply_upserts(list(upsert_entries))
+        except Exception as e:
+            logger.error(f"知识库同步批次失败: {str(e)}", exc_info=True)
+            self._mark_failed(entries, str(e))
+            stats['failed'] = len(entries)
+            return stats
+
+        KnowledgeSyncOutbox.objects.filter(id__in=[entry.id for entry in entries]).update(
+            status='done', last_error='', updated_at=timezone.now()
+        )
+        return stats
+
+    def _apply_deletes(self, entries: List[KnowledgeSyncOutbox]) -> int:
+        vector_ids = [entry.vector_id for entry in entries if entry.vector_id]
+        self.vector_store.delete_by_ids(vector_ids)
+        return len(vector_ids)
+
+    def _apply_upserts(self, knowledge_ids: List[int]) -> int:
+        rows = list(KnowledgeBase.objects.filter(id__in=knowledge_ids).order_by('id'))
+        if not rows:
+            return 0
+
+        embeddings = self.embedder.get_embeddings_array([row.content for row in rows])
+        upload_time = timezone.now().isoformat()
+        primary_keys = self.vector_store.add_data([{
+            "embedding": embedding,
+            "content": row.content,
+            "metadata": json.dumps({'knowledge_id': row.id, 'title': row.title}, ensure_ascii=False),
+            "source": row.source or f"knowledge://{row.id}",
+            "doc_type": row.doc_type or 'text',
+            "chunk_id": row.chunk_id or f"kb_{row.id}",
+            "upload_time": upload_time,
+        } for row, embedding in zip(rows, embeddings)])
+
+        old_vector_ids = [row.vector_id for row in rows if row.vector_id]
+        for row, primary_key in zip(rows, primary_keys):
+            row.vector_id = str(primary_key)
+            row.sync_status = 'synced'
+        with transaction.atomic():
+            # 写入向量期间被删除的条目, 其新向量需要一并删除
+            alive = set(
+                KnowledgeBase.objects.select_for_update()
+                .filter(id__in=[row.id for row in rows])
+                .values_list('id', flat=True)
+            )
+            KnowledgeBase.objects.bulk_update(
+                [row for row in rows if row.id in alive], ['vector_id', 'sync_status'], batch_size=self.batch_size
+            )
+        orphaned = [row.vector_id for row in rows if row.id not in alive]
+        self.vector_store.delete_by_ids(old_vector_ids + orphaned)
+        return len(alive)
+
+    def _retry_delay(self, attempts: int) -> timedelta:
+        """第 attempts 次尝试失败后的重试延迟：retry_backoff_seconds * 2^(attempts-1)，不超过上限"""
+        seconds = self.retry_backoff_seconds * (2 ** max(0, attempts - 1))
+        return timedelta(seconds=min(seconds, self.max_retry_backoff_seconds))
+
+    def _mark_failed(self, entries: List[KnowledgeSyncOutbox], error: str) -> None:
+        failed_ids = [entry.id for entry in entries if entry.attempts >= self.max_attempts]
+        now = timezone.now()
+        # 按尝试次数分组设置下次执行时间，退避期间 drain 不会再次认领
+        retry_groups: Dict[int, List[int]] = {}
+        for entry in entries:
+            if entry.attempts < self.max_attempts:
+                retry_groups.setdefault(entry.attempts, []).append(entry.id)
+        for attempts, retry_ids in retry_groups.items():
+            KnowledgeSyncOutbox.objects.filter(id__in=retry_ids).update(
+                status='pending', last_error=error, updated_at=now, run_after=now + self._retry_delay(attempts)
+            )
+        if failed_ids:
+            KnowledgeSyncOutbox.objects.filter(id__in=failed_ids).update(
+                status='failed', last_error=error, updated_at=now
+            )
+            failed_knowledge_ids = [
+                entry.knowledge_id for entry in entries if entry.id in set(failed_ids) and entry.operation == 'upsert'
+            ]
+            KnowledgeBase.objects.filter(id__in=failed_knowledge_ids).update(sync_status='failed')
+
+    def recover_stale(self) -> int:
+        """将处理超时（同步进程崩溃）的待办重置为 pending"""
+        deadline = timezone.now() - self.processing_timeout
+        return KnowledgeSyncOutbox.objects.filter(status='processing', updated_at__lt=deadline).update(
+            status='pending', updated_at=timezone.now()
+        )
+
+    def reconcile(self, page_size: Optional[int] = None, orphans: str = 'report') -> Dict[str, int]:
+        """分页对账，修复 MySQL 与 Milvus 之间的漂移
+
+        Args:
+            page_size: 每页条数
+            orphans: Milvus 中没有 KnowledgeBase 行对应的向量的处理方式：adopt 补建行 / delete 删除 / report 仅统计
+        """
+        if orphans not in ('adopt', 'delete', 'report'):
+            raise ValueError(f"不支持的孤儿向量处理方式: {orphans}")
+        page_size = page_size or get_sync_config()['reconcile_page_size']
+        # 对账开始之后写入 Milvus 的向量可能正由并发的同步任务回填 vector_id，不能视为孤儿
+        started_at = timezone.now()
+        stats = {'recovered': self.recover_stale(), 'requeued': 0, 'orphans': 0, 'adopted': 0, 'orphans_deleted': 0,
+                 'orphans_skipped': 0}
+
+        # 1. MySQL -> Milvus
+        referenced_vector_ids = set()
+        last_id = 0
+        while True:
+            page = list(
+                KnowledgeBase.objects.filter(id__gt=last_id).order_by('id')
+                .values('id', 'vector_id', 'sync_status')[:page_size]
+            )
+            if not page:
+                break
+            last_id = page[-1]['id']
+            with_vector = [row for row in page if row['vector_id'].isdigit()]
+            existing = {str(pk) for pk in self.vector_store.existing_ids([row['vector_id'] for row in with_vector])}
+            referenced_vector_ids.update(existing)
+            pending = set(
+                KnowledgeSyncOutbox.objects.filter(
+                    knowledge_id__in=[row['id'] for row in page], status__in=['pending', 'processing']
+                ).values_list('knowledge_id', flat=True)
+            )
+            drifted = [
+                row['id'] for row in page
+                if row['id'] not in pending and (row['vector_id'] not in existing or row['sync_status'] != 'synced')
+            ]
+            if drifted:
+                with transaction.atomic():
+                    KnowledgeBase.objects.filter(id__in=drifted).update(sync_status='pending')
+                    enqueue_upserts(drifted)
+                stats['requeued'] += len(drifted)
+
+        # 2. Milvus -> MySQL
+        for page in self.vector_store.iter_rows(batch_size=page_size):
+            orphan_rows = [row for row in page if str(row['id']) not in referenced_vector_ids]
+            if not orphan_rows:
+                continue
+            recent = [row for row in orphan_rows if _written_since(row.get('upload_time'), started_at)]
+            # 第 1 步读取之后才回填了 vector_id 的条目同样不是孤儿
+            backfilled = set(
+                KnowledgeBase.objects.filter(vector_id__in=[str(row['id']) for row in orphan_rows])
+                .values_list('vector_id', flat=True)
+            )
+            recent_ids = {row['id'] for row in recent}
+            skipped = [row for row in orphan_rows if row['id'] in recent_ids or str(row['id']) in backfilled]
+            stats['orphans_skipped'] += len(skipped)
+            orphan_rows = [row for row in orphan_rows if row['id'] not in recent_ids and str(row['id']) not in backfilled]
+            if not orphan_rows:
+                continue
+            stats['orphans'] += len(orphan_rows)
+            if orphans == 'adopt':
+                KnowledgeBase.objects.bulk_create([
+                    KnowledgeBase(
+                        title=f"{os.path.basename(row.get('source') or '')}#{row.get('chunk_id') or row['id']}"[:200],
+                        content=row.get('content') or '',
+                        vector_id=str(row['id']),
+                        source=(row.get('source') or '')[:512],
+                        doc_type=(row.get('doc_type') or '')[:32],
+                        chunk_id=(row.get('chunk_id') or '')[:128],
+                        sync_status='synced',
+                    ) for row in orphan_rows
+                ], batch_size=page_size)
+                stats['adopted'] += len(orphan_rows)
+            elif orphans == 'delete':
+                self.vector_store.delete_by_ids([row['id'] for row in orphan_rows])
+                stats['orphans_deleted'] += len(orphan_rows)
+
+        logger.info(f"知识库对账完成: {stats}")
+        return stats
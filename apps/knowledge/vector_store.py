@@ -1,23 +1,39 @@
 from pymilvus import connections, Collection, utility, DataType
 from pymilvus import CollectionSchema, FieldSchema
 # import numpy as np
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Callable, Union
+import time
+import numpy as np
 # import os
 # from django.conf import settings
 from apps.utils.logger_manager import get_logger
 
 logger = get_logger(__name__)
 
+# 默认索引参数
+DEFAULT_INDEX_PARAMS = {
+    "metric_type": "COSINE",
+    "index_type": "HNSW",
+    "params": {"M": 8, "efConstruction": 64}
+}
+
+# 除主键、向量外的标量字段
+SCALAR_FIELDS = ["content", "metadata", "source", "doc_type", "chunk_id", "upload_time"]
+
 class MilvusVectorStore:
     """Milvus向量数据库服务"""
     
     def __init__(self, 
                 host: str = "localhost", 
                 port: str = "19530",
-                collection_name: str = "vv_knowledge_collection"):
+                collection_name: str = "vv_knowledge_collection",
+                dim: int = 1024,
+                index_params: Optional[Dict[str, Any]] = None):
         self.host = host
         self.port = port
         self.collection_name = collection_name
+        self.dim = dim
+        self.index_params = index_params or DEFAULT_INDEX_PARAMS
         # 原来的逻辑
         self._connect()
         self._ensure_collection()
@@ -53,7 +69,7 @@ class MilvusVectorStore:
                 FieldSchema(
                     name="embedding",
                     dtype=DataType.FLOAT_VECTOR,
-                    dim=1024  
+                    dim=self.dim
                 ),
                 FieldSchema(
                     name="content",    # 存储文档片段的实际内容
@@ -92,14 +108,9 @@ class MilvusVectorStore:
             
             # 创建索引
             logger.info("开始创建索引...")
-            index_params = {
-                "metric_type": "COSINE",
-                "index_type": "HNSW",
-                "params": {"M": 8, "efConstruction": 64}
-            }
             collection.create_index(
                 field_name="embedding", 
-                index_params=index_params
+                index_params=self.index_params
             )
             logger.info("索引创建成功")
             collection.load()
@@ -110,39 +121,63 @@ class MilvusVectorStore:
             collection.load()
             return collection
         
-    def add_data(self, data: List[Dict[str, Any]]):
-        """添加文档到向量数据库"""
+    def add_data(self, data: List[Dict[str, Any]]) -> List[Any]:
+        """添加文档到向量数据库，返回写入数据的主键列表
+
+        每条数据的 embedding 既可以是 float 列表，也可以是 float32 的一维 ndarray（如嵌入矩阵的某一行）
+        """
         logger.info("进入到add_data方法")
         collection = Collection(self.collection_name)
 
         try:
-            collection.insert(data)
+            result = collection.insert(data)
         except Exception as e:
             raise
                 
         collection.flush()
+        return list(result.primary_keys)
+
+    def delete_by_ids(self, ids: List[Any]) -> None:
+        """按主键批量删除向量（一次删除请求）"""
+        if not ids:
+            return
+        collection = Collection(self.collection_name)
+        collection.delete(expr=f"id in [{', '.join(str(int(i)) for i in ids)}]")
+
+    def existing_ids(self, ids: List[Any]) -> set:
+        """返回 ids 中在集合里实际存在的主键"""
+        if not ids:
+            return set()
+        collection = Collection(self.collection_name)
+        rows = collection.query(
+            expr=f"id in [{', '.join(str(int(i)) for i in ids)}]",
+            output_fields=["id"],
+        )
+        return {row["id"] for row in rows}
         
-    def search(self, query_vector: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
-        """搜索最相似的文档"""
+    def search(self, query_vector: Union[List[float], np.ndarray], top_k: int = 5) -> List[Dict[str, Any]]:
+        """搜索最相似的文档, query_vector 为 float32 ndarray 时以二进制形式直接传给Milvus"""
+        return self.search_batch([query_vector], top_k=top_k)[0]
+
+    def search_batch(self, query_vectors: Union[List[List[float]], np.ndarray], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """批量搜索，多个查询向量合并为一次Milvus请求，返回与查询向量一一对应的结果列表"""
         collection = Collection(self.collection_name)
         collection.load()
         
-        search_params = {"metric_type": "COSINE", "params": {"ef": 32}}
+        search_params = {"metric_type": "COSINE", "params": {"ef": max(32, top_k)}}
         results = collection.search(
-            data=[query_vector], 
+            data=list(query_vectors), 
             anns_field="embedding", 
             param=search_params,
             limit=top_k,
-            output_fields=[
-                "content", "metadata", "source", 
-                "doc_type", "chunk_id", "upload_time"
-            ]
+            output_fields=SCALAR_FIELDS
         )
         
         ret = []
         for hits in results:
+            hit_list = []
             for hit in hits:
-                ret.append({
+                hit_list.append({
                     "id": hit.id,
                     "score": hit.score,
                     "content": hit.entity.get("content"),
@@ -152,6 +187,143 @@ class MilvusVectorStore:
                     "chunk_id": hit.entity.get("chunk_id"),
                     "upload_time": hit.entity.get("upload_time")
                 })
+            ret.append(hit_list)
         
         collection.release()
-        return ret 
\ No newline at end of file
+        return ret
+
+    def iter_rows(self,
+                  batch_size: int = 1000,
+                  output_fields: Optional[List[str]] = None,
+                  start_after_id: Optional[int] = None,
+                  expr: str = "") -> Iterator[List[Dict[str, Any]]]:
+        """按主键升序分页流式读取集合中的数据，每次产出一页
+
+        Args:
+            batch_size: 每页条数
+            output_fields: 需要返回的字段，默认返回全部标量字段
+            start_after_id: 只读取主键大于该值的数据，用于断点续读
+            expr: 额外的过滤表达式
+        """
+        collection = Collection(self.collection_name)
+        collection.load()
+        filters = []
+        if start_after_id is not None:
+            filters.append(f"id > {int(start_after_id)}")
+        if expr:
+            filters.append(f"({expr})")
+        iterator = collection.query_iterator(
+            batch_size=batch_size,
+            expr=" and ".join(filters) if filters else "id >= 0",
+            output_fields=output_fields or SCALAR_FIELDS,
+        )
+        try:
+            while True:
+                page = iterator.next()
+                if not page:
+                    break
+                yield page
+        finally:
+            iterator.close()
+
+
+class BufferedMilvusWriter:
+    """带缓冲的Milvus批量写入器
+
+    数据先写入内存缓冲区，积累到 batch_size 条后一次性 insert，减少 RPC 次数；
+    close() 时写入剩余数据并 flush 集合。可通过 on_flush 回调在每批写入成功后记录进度。
+    """
+
+    def __init__(self,
+                 collection_name: str,
+                 batch_size: int = 2000,
+                 on_flush: Optional[Callable[[List[Any], List[Any]], None]] = None):
+        """
+        Args:
+            collection_name: 目标集合名称
+            batch_size: 每批写入条数
+            on_flush: 每批写入成功后的回调，参数为(本批次tag列表, 本批次写入的主键列表)
+        """
+        self.collection = Collection(collection_name)
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.total_written = 0
+        self._rows: List[Dict[str, Any]] = []
+        self._tags: List[Any] = []
+
+    def write(self, row: Dict[str, Any], tag: Any = None) -> None:
+        """写入一条数据，tag 会原样传给 on_flush 回调"""
+        self._rows.append(row)
+        self._tags.append(tag)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, rows: List[Dict[str, Any]], tags: Optional[List[Any]] = None) -> None:
+        """批量写入多条数据"""
+        tags = tags if tags is not None else [None] * len(rows)
+        for row, tag in zip(rows, tags):
+            self.write(row, tag)
+
+    def flush(self) -> List[Any]:
+        """将缓冲区中的数据写入Milvus，返回写入数据的主键列表"""
+        if not self._rows:
+            return []
+        rows, tags = self._rows, self._tags
+        self._rows, self._tags = [], []
+        result = self.collection.insert(rows)
+        primary_keys = list(result.primary_keys)
+        self.total_written += len(rows)
+        if self.on_flush:
+            self.on_flush(tags, primary_keys)
+        return primary_keys
+
+    def close(self) -> None:
+        """写入剩余数据并持久化"""
+        self.flush()
+        self.collection.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # 出现异常时不再写入缓冲区中的数据，由调用方依据断点信息重试
+        if exc_type is None:
+            self.close()
+        return False
+
+
+def swap_collection_alias(alias: str, new_collection: str) -> Optional[str]:
+    """将别名 alias 原子地切换到 new_collection
+
+    业务侧始终通过 alias（即 VECTOR_DB_CONFIG 中的 collection_name）访问集合。
+    首次切换时 alias 还是一个真实集合名，需要先将其重命名为带时间戳的备份集合，再创建别名；
+    此后的切换均通过 alter_alias 原子完成。
+
+    Returns:
+        被替换下来的旧集合名（首次切换时为重命名后的备份集合名）
+    """
+    aliased = _find_alias_target(alias)
+    if aliased:
+        utility.alter_alias(collection_name=new_collection, alias=alias)
+        logger.info(f"别名 {alias} 已从 {aliased} 切换到 {new_collection}")
+        return aliased
+
+    previous = None
+    if utility.has_collection(alias):
+        previous = f"{alias}_{time.strftime('%Y%m%d%H%M%S')}"
+        utility.rename_collection(alias, previous)
+        logger.info(f"集合 {alias} 已重命名为 {previous}")
+    utility.create_alias(collection_name=new_collection, alias=alias)
+    logger.info(f"已创建别名 {alias} -> {new_collection}")
+    return previous
+
+
+def _find_alias_target(alias: str) -> Optional[str]:
+    """查找别名当前指向的集合，alias 不是别名时返回 None"""
+    for name in utility.list_collections():
+        try:
+            if alias in utility.list_aliases(name):
+                return name
+        except Exception:
+            continue
+    return None
@@ -16,6 +16,9 @@ from .callbacks import LoggingCallbackHandler
 # 加载.env文件中的环境变量
 load_dotenv()
 
+# LLM_PROVIDERS 中描述提供商能力、限流（而非模型参数）的配置项
+PROVIDER_CAPABILITY_KEYS = ('structured_output', 'max_concurrency', 'tokens_per_minute')
+
 class BaseLLMService(BaseChatModel):
     """基础LLM服务类"""
     
@@ -107,13 +110,15 @@ class LLMServiceFactory:
         # 创建回调处理器
         callbacks = [LoggingCallbackHandler()]
         
-        # 合并配置
+        # 合并配置, 结构化输出、限流等提供商配置不传给模型构造函数
         merged_config = {
             **provider_config,
             **config,
             'callbacks': callbacks,
             'verbose': True  # 启用详细日志
         }
+        for key in PROVIDER_CAPABILITY_KEYS:
+            merged_config.pop(key, None)
         
         # 根据提供商创建相应的服务实例
         if provider.lower() == "deepseek":
@@ -1,10 +1,14 @@
 from langchain_openai import ChatOpenAI
 import os
+from typing import ClassVar
 
 
 class DeepSeekChatModel(ChatOpenAI):
     """DeepSeek聊天模型"""
     
+    # 对应 settings.LLM_PROVIDERS 中的键, 用于读取结构化输出等提供商配置
+    provider_name: ClassVar[str] = "deepseek"
+    
     def __init__(
         self,
         api_key: str = None,
@@ -0,0 +1,122 @@
+"""
+LLM 提供商调用限流（governor）
+
+同一进程内对同一提供商的所有调用共享一个 ProviderGovernor：
+- max_concurrency: 同时进行中的请求数上限
+- tokens_per_minute: 最近 60 秒内发出的提示词 token 估算总数上限，0 表示不限制
+
+在 LLM_PROVIDERS 中按提供商配置，未配置时使用 DEFAULT_GOVERNOR_CONFIG。
+批量评审、分段分析等会并发调用 LLM 的场景统一经由 governor 发请求，避免触发提供商的限流错误。
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Deque, Dict, Tuple, Union
+
+from django.conf import settings
+
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_GOVERNOR_CONFIG = {
+    'max_concurrency': 4,
+    'tokens_per_minute': 0,
+}
+
+_WINDOW_SECONDS = 60.0
+_ASYNC_POLL_INTERVAL = 0.05
+
+
+class ProviderGovernor:
+    """单个提供商的并发与 token 速率限制"""
+
+    def __init__(self, provider: str, max_concurrency: int, tokens_per_minute: int = 0):
+        self.provider = provider
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.tokens_per_minute = max(0, int(tokens_per_minute or 0))
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._window: Deque[Tuple[float, int]] = deque()
+        self._window_tokens = 0
+
+    def _reserve_tokens(self, tokens: int) -> float:
+        """在速率窗口内登记 tokens；额度不足时不登记，返回需要等待的秒数"""
+        if not self.tokens_per_minute:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            while self._window and now - self._window[0][0] >= _WINDOW_SECONDS:
+                self._window_tokens -= self._window.popleft()[1]
+            # 窗口为空时总是放行，避免单个超大请求永远等不到额度
+            if not self._window or self._window_tokens + tokens <= self.tokens_per_minute:
+                self._window.append((now, tokens))
+                self._window_tokens += tokens
+                return 0.0
+            return max(self._window[0][0] + _WINDOW_SECONDS - now, _ASYNC_POLL_INTERVAL)
+
+    @contextmanager
+    def acquire(self, tokens: int = 0):
+        """同步调用前获取额度：先等待 token 速率额度，再占用一个并发槽位"""
+        waited = 0.0
+        while True:
+            wait = self._reserve_tokens(tokens)
+            if not wait:
+                break
+            waited += wait
+            time.sleep(wait)
+        if waited:
+            logger.info(f"{self.provider} 达到 token 速率上限，等待 {waited:.1f} 秒")
+        self._slots.acquire()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def aacquire(self, tokens: int = 0):
+        """异步调用前获取额度，与同步调用共享同一组并发槽位和速率窗口"""
+        while True:
+            wait = self._reserve_tokens(tokens)
+            if not wait:
+                break
+            await asyncio.sleep(wait)
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(_ASYNC_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+
+_governors: Dict[str, ProviderGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor_config(provider: str) -> Dict[str, Any]:
+    """读取 LLM_PROVIDERS[provider] 中的限流配置，缺省项使用默认值"""
+    provider_config = getattr(settings, 'LLM_PROVIDERS', {}).get(provider) or {}
+    return {key: provider_config.get(key, default) for key, default in DEFAULT_GOVERNOR_CONFIG.items()}
+
+
+def get_provider_governor(provider_or_llm: Union[str, Any]) -> ProviderGovernor:
+    """获取提供商对应的 governor（进程内单例）
+
+    Args:
+        provider_or_llm: 提供商名称，或带有 provider_name 属性的 LLM 实例
+    """
+    if isinstance(provider_or_llm, str):
+        provider = provider_or_llm
+    else:
+        provider = getattr(provider_or_llm, 'provider_name', None) or 'default'
+    governor = _governors.get(provider)
+    if governor is None:
+        with _governors_lock:
+            governor = _governors.get(provider)
+            if governor is None:
+                governor = ProviderGovernor(provider, **get_governor_config(provider))
+                _governors[provider] = governor
+    return governor
@@ -1,9 +1,13 @@
 from langchain_community.chat_models import ChatOpenAI
 import os
+from typing import ClassVar
 
 class QwenChatModel(ChatOpenAI):
     """通义千问聊天模型"""
     
+    # 对应 settings.LLM_PROVIDERS 中的键, 用于读取结构化输出等提供商配置
+    provider_name: ClassVar[str] = "qwen"
+    
     def __init__(
         self,
         api_key: str = None,
@@ -0,0 +1,134 @@
+"""
+提供商原生结构化输出（JSON mode / JSON schema）
+
+在 LLM_PROVIDERS 中为提供商配置 structured_output：
+- 'json_object': 请求携带 response_format={"type": "json_object"}，提供商保证返回合法 JSON 对象（DeepSeek、通义千问）
+- 'json_schema': 请求携带由 Pydantic 模型生成的 JSON Schema，提供商按 Schema 约束输出
+- 未配置/None: 提供商不支持，沿用提示词约束 + 本地容错解析（json_salvage）
+
+JSON mode 要求顶层为对象，因此列表结果通过 wrapper_key 包装为 {"test_cases": [...]}，解析时自动拆包。
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+
+from django.conf import settings
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel
+
+from apps.ai_agents.common.json_salvage import parse_json_with_status
+from apps.utils.logger_manager import get_logger
+
+logger = get_logger(__name__)
+
+STRUCTURED_OUTPUT_MODES = ('json_object', 'json_schema')
+
+
+def get_structured_output_mode(llm: Any) -> Optional[str]:
+    """根据 LLM 实例对应提供商的配置返回结构化输出模式，不支持时返回 None"""
+    provider = getattr(llm, 'provider_name', None)
+    if not provider:
+        return None
+    provider_config = getattr(settings, 'LLM_PROVIDERS', {}).get(provider) or {}
+    mode = provider_config.get('structured_output')
+    if mode and mode not in STRUCTURED_OUTPUT_MODES:
+        logger.warning(f"提供商 {provider} 的 structured_output 配置无效: {mode}，使用本地解析")
+        return None
+    return mode
+
+
+class StructuredOutput:
+    """一个 Agent 的结构化输出约定：输出 Schema、列表包装键及解析方式"""
+
+    def __init__(self, name: str, schema: Union[Type[BaseModel], Dict[str, Any]],
+                 wrapper_key: Optional[str] = None):
+        """
+        Args:
+            name: Schema 名称（json_schema 模式下传给提供商）
+            schema: Pydantic 模型或 JSON Schema 字典；有 wrapper_key 时表示列表中单个元素的 Schema
+            wrapper_key: 结果为列表时的包装键，为 None 表示结果本身就是对象
+        """
+        self.name = name
+        self.schema = schema
+        self.wrapper_key = wrapper_key
+
+    def json_schema(self) -> Dict[str, Any]:
+        """返回完整输出（含包装对象）的 JSON Schema"""
+        if isinstance(self.schema, dict):
+            item_schema = dict(self.schema)
+        else:
+            item_schema = self.schema.model_json_schema()
+        if not self.wrapper_key:
+            return item_schema
+        definitions = item_schema.pop('$defs', None)
+        schema = {
+            'type': 'object',
+            'properties': {self.wrapper_key: {'type': 'array', 'items': item_schema}},
+            'required': [self.wrapper_key],
+        }
+        if definitions:
+            schema['$defs'] = definitions
+        return schema
+
+    def response_format(self, mode: str) -> Dict[str, Any]:
+        if mode == 'json_schema':
+            return {
+                'type': 'json_schema',
+                'json_schema': {'name': self.name, 'schema': self.json_schema(), 'strict': False},
+            }
+        return {'type': 'json_object'}
+
+    def bind(self, llm: Any) -> Tuple[Any, Optional[str]]:
+        """为 LLM 绑定 response_format，返回 (可调用的 LLM, 结构化输出模式)；提供商不支持时原样返回"""
+        mode = get_structured_output_mode(llm)
+        if mode is None:
+            return llm, None
+        return llm.bind(response_format=self.response_format(mode)), mode
+
+    def instruction(self, mode: Optional[str]) -> str:
+        """追加到提示词末尾的输出格式说明；提示词中要求输出数组的，改为放入包装键"""
+        if mode is None:
+            return ''
+        if self.wrapper_key:
+            return (f'请以 JSON 对象格式输出，将上述要求输出的数组放在 "{self.wrapper_key}" 字段中，'
+                    f'即 {{"{self.wrapper_key}": [...]}}，不要输出任何其他内容。')
+        return '请以 JSON 对象格式输出，不要输出任何其他内容。'
+
+    def apply(self, messages: List[BaseMessage], mode: Optional[str]) -> List[BaseMessage]:
+        """将输出格式说明追加到最后一条消息，JSON mode 要求提示词中包含 "JSON" 字样"""
+        instruction = self.instruction(mode)
+        if not instruction or not messages:
+            return messages
+        last = messages[-1]
+        return list(messages[:-1]) + [type(last)(content=f"{last.content}\n\n{instruction}")]
+
+    def parse_with_status(self, text: str, mode: Optional[str] = None) -> Tuple[Any, bool]:
+        """解析 LLM 输出并拆包，返回 (结果, 是否经过截断修复)
+
+        结构化输出模式下响应一般是合法 JSON，直接 json.loads；否则（或被截断时）回退到本地容错解析。
+        """
+        value, truncated = None, False
+        if mode is not None:
+            try:
+                value = json.loads(text)
+            except (TypeError, json.JSONDecodeError):
+                logger.warning(f"{self.name} 结构化输出不是合法 JSON，回退到本地容错解析")
+                value = None
+        if value is None:
+            value, truncated = parse_json_with_status(text, expect=list if self.wrapper_key else dict)
+        return self._unwrap(value), truncated
+
+    def parse(self, text: str, mode: Optional[str] = None) -> Any:
+        return self.parse_with_status(text, mode)[0]
+
+    def _unwrap(self, value: Any) -> Any:
+        if not self.wrapper_key:
+            return value
+        if isinstance(value, dict):
+            if self.wrapper_key in value:
+                value = value[self.wrapper_key]
+            else:
+                # 包装键名不符时取唯一的数组字段，否则视为单个元素
+                lists = [v for v in value.values() if isinstance(v, list)]
+                value = lists[0] if len(value) == 1 and len(lists) == 1 else [value]
+        return value if isinstance(value, list) else [value]
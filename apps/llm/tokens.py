@@ -0,0 +1,33 @@
+"""
+LLM 提示词 token 数估算
+
+不依赖具体模型的分词器，用于打包批量请求、提供商限流等只需要数量级的场景：
+中日韩字符按 1 个 token 计，其余字符按约 4 个字符 1 个 token 计。
+"""
+
+import math
+import re
+from typing import Any, Iterable, Union
+
+_CJK_PATTERN = re.compile(r'[　-ヿ㐀-䶿一-鿿가-힯＀-￯]')
+
+# 每条聊天消息的角色、分隔符等额外开销
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: Union[str, Iterable[Any], None]) -> int:
+    """估算文本或消息列表的 token 数
+
+    Args:
+        text: 字符串，或 LangChain 消息/{'content': ...} 字典组成的列表
+    """
+    if not text:
+        return 0
+    if not isinstance(text, str):
+        total = 0
+        for message in text:
+            content = message.get('content', '') if isinstance(message, dict) else getattr(message, 'content', message)
+            total += estimate_tokens(str(content)) + MESSAGE_OVERHEAD_TOKENS
+        return total
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return cjk_count + math.ceil((len(text) - cjk_count) / 4)
@@ -0,0 +1,23 @@
+"""
+任务队列进程池子进程的入口
+
+进程池使用 spawn 启动子进程，子进程按模块路径导入初始化函数和任务函数。job_queue 在模块顶层导入了
+apps.core.models，若在 django.setup() 之前导入会抛出 AppRegistryNotReady，导致进程池整体失效。
+因此初始化函数与入口函数放在本模块中：顶层不导入任何依赖应用注册表的模块，先完成 django.setup()，
+再导入 job_queue 执行任务。
+"""
+
+import os
+
+
+def init_process_worker() -> None:
+    """进程池子进程初始化：加载 Django（DJANGO_SETTINGS_MODULE 由父进程环境变量继承）"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+
+def run_process_job(job_id: int) -> None:
+    """在子进程中执行一个已认领的任务"""
+    from apps.utils.job_queue import _execute_job
+    _execute_job(job_id)
@@ -0,0 +1,454 @@
+"""
+基于数据库的后台任务队列
+
+长耗时的 Agent 工作不再占用 HTTP 请求或临时守护线程：视图调用 enqueue_job() 写入 Job 表后立即返回
+job_id/task_id，由 JobWorker 按优先级认领并在线程池（LLM 调用等 I/O 密集任务）或进程池（CPU 密集、
+需要隔离的任务）中执行。
+
+- 任务处理函数在各应用的 jobs.py 中通过 @register_job 注册，worker 启动时自动发现
+- 认领使用 select_for_update(skip_locked)，可同时运行多个 worker
+- 失败按 retry_backoff_seconds * 尝试次数 延迟重试，超过 max_attempts 标记为 failed
+- worker 定期为运行中的任务写心跳；进程被杀（如发布重启）后，心跳超时的任务由任意 worker 重新排队
+- 任务执行期间的 progress_registry 进度与任务日志按节流写入 Job.progress，
+  进度查询 API 与 SSE 日志流在其他进程中也能读取到
+
+运行方式：
+    python manage.py run_jobs                       # 独立 worker 进程（默认方式）
+    JOB_QUEUE_CONFIG['embedded_worker'] = True      # 仅限本地 runserver 调试：Web 进程首次入队时启动内嵌 worker
+"""
+
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from apps.core.models import Job
+from apps.utils.job_process import init_process_worker, run_process_job
+from apps.utils.logger_manager import get_logger, set_task_context, clear_task_context
+from apps.utils.progress_registry import add_progress_listener, get_progress, set_progress
+from apps.utils.progress_schema import TaskStatus
+
+logger = get_logger(__name__)
+
+DEFAULT_JOB_QUEUE_CONFIG = {
+    'thread_workers': 4,
+    'process_workers': 1,
+    'poll_interval': 1.0,
+    'heartbeat_interval': 15,
+    'stale_after_seconds': 120,
+    'max_attempts': 3,
+    'retry_backoff_seconds': 30,
+    'progress_flush_interval': 1.0,
+    'progress_log_limit': 200,
+    'embedded_worker': False,
+}
+
+
+def get_job_queue_config() -> Dict[str, Any]:
+    """读取 settings.JOB_QUEUE_CONFIG，缺省项使用默认值"""
+    config = dict(DEFAULT_JOB_QUEUE_CONFIG)
+    config.update(getattr(settings, 'JOB_QUEUE_CONFIG', {}) or {})
+    return config
+
+
+# ========= 任务注册 =========
+
+@dataclass
+class JobHandler:
+    job_type: str
+    func: Callable[[Dict[str, Any], Job], Any]
+    pool: str = 'thread'
+    max_attempts: Optional[int] = None
+
+
+_handlers: Dict[str, JobHandler] = {}
+_discovered = False
+_discover_lock = threading.Lock()
+
+
+def register_job(job_type: str, pool: str = 'thread', max_attempts: Optional[int] = None):
+    """注册任务处理函数，处理函数签名为 func(payload, job) -> 可 JSON 序列化的结果
+
+    Args:
+        job_type: 任务类型
+        pool: thread 线程池 / process 进程池
+        max_attempts: 最大尝试次数，缺省使用 JOB_QUEUE_CONFIG['max_attempts']
+    """
+    if pool not in ('thread', 'process'):
+        raise ValueError(f"不支持的执行池: {pool}")
+
+    def decorator(func):
+        _handlers[job_type] = JobHandler(job_type, func, pool, max_attempts)
+        return func
+    return decorator
+
+
+def _autodiscover() -> None:
+    """导入各应用的 jobs.py，完成任务处理函数注册"""
+    global _discovered
+    if not _discovered:
+        with _discover_lock:
+            if not _discovered:
+                autodiscover_modules('jobs')
+                _discovered = True
+
+
+def get_job_handler(job_type: str) -> JobHandler:
+    """返回任务处理函数"""
+    _autodiscover()
+    if job_type not in _handlers:
+        raise ValueError(f"未注册的任务类型: {job_type}")
+    return _handlers[job_type]
+
+
+# ========= 入队与查询 =========
+
+def enqueue_job(job_type: str, payload: Dict[str, Any], priority: int = 0,
+                task_id: Optional[str] = None, max_attempts: Optional[int] = None) -> Job:
+    """写入任务并返回 Job；task_id 用于关联进度查询与 SSE 日志，缺省自动生成"""
+    handler = get_job_handler(job_type)
+    config = get_job_queue_config()
+    job = Job.objects.create(
+        job_type=job_type,
+        task_id=task_id or f"job_{uuid.uuid4().hex}",
+        pool=handler.pool,
+        priority=priority,
+        payload=payload,
+        max_attempts=max_attempts or handler.max_attempts or config['max_attempts'],
+    )
+    logger.info(f"任务入队: {job.job_type}#{job.id} task_id={job.task_id} priority={priority}")
+    if config['embedded_worker']:
+        ensure_embedded_worker()
+    return job
+
+
+def cancel_job(job_id: int) -> bool:
+    """取消排队中的任务；已开始运行的任务不会被中断"""
+    cancelled = Job.objects.filter(id=job_id, status='pending').update(
+        status='cancelled', finished_at=timezone.now()
+    )
+    return bool(cancelled)
+
+
+def job_to_dict(job: Job) -> Dict[str, Any]:
+    return {
+        'id': job.id,
+        'job_type': job.job_type,
+        'task_id': job.task_id,
+        'status': job.status,
+        'priority': job.priority,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'result': job.result,
+        'error': job.error,
+        'progress': {key: value for key, value in (job.progress or {}).items() if key != 'logs'},
+        'created_at': job.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'started_at': job.started_at.strftime('%Y-%m-%d %H:%M:%S') if job.started_at else None,
+        'finished_at': job.finished_at.strftime('%Y-%m-%d %H:%M:%S') if job.finished_at else None,
+    }
+
+
+def get_job_progress(task_id: str) -> Optional[Dict[str, Any]]:
+    """从 Job.progress 读取任务进度（任务在其他进程中执行时使用），没有对应任务时返回 None"""
+    job = Job.objects.filter(task_id=task_id).order_by('-id').only('progress', 'status').first()
+    if job is None:
+        return None
+    progress = dict(job.progress or {})
+    progress.pop('log_seq', None)
+    if job.status == 'pending':
+        progress['status'] = TaskStatus.PENDING.value
+    elif job.status == 'failed':
+        progress['status'] = TaskStatus.FAILED.value
+    return progress
+
+
+def is_remote_job_task(task_id: str) -> bool:
+    """task_id 对应的任务是否在其他进程中执行（进度与日志需从数据库读取）"""
+    return task_id not in _local_task_ids and Job.objects.filter(task_id=task_id).exists()
+
+
+def read_job_logs(task_id: str, after_seq: int = 0) -> List[Dict[str, Any]]:
+    """读取 Job.progress 中序号大于 after_seq 的日志，返回 [{'seq', 'msg'}]"""
+    job = Job.objects.filter(task_id=task_id).order_by('-id').only('progress').first()
+    if job is None or not job.progress:
+        return []
+    logs = job.progress.get('logs') or []
+    last_seq = job.progress.get('log_seq', len(logs))
+    first_seq = last_seq - len(logs) + 1
+    return [
+        {'seq': first_seq + index, 'msg': msg}
+        for index, msg in enumerate(logs)
+        if first_seq + index > after_seq
+    ]
+
+
+# ========= 进度持久化 =========
+
+# 当前进程中正在执行的任务 task_id -> job_id
+_local_task_ids: Dict[str, int] = {}
+_flush_state: Dict[str, Dict[str, Any]] = {}
+_flush_lock = threading.Lock()
+_bridge_installed = False
+
+
+def _persist_progress(task_id: str, progress, update: Dict[str, Any]) -> None:
+    """progress_registry 监听器：收集任务日志并按节流把进度快照写入 Job.progress"""
+    job_id = _local_task_ids.get(task_id)
+    if job_id is None:
+        return
+    config = get_job_queue_config()
+    with _flush_lock:
+        state = _flush_state.setdefault(task_id, {
+            'flushed_at': 0.0, 'log_seq': 0, 'logs': deque(maxlen=config['progress_log_limit']),
+        })
+        new_logs = update.get('log') if update else None
+        if new_logs is not None:
+            new_logs = new_logs if isinstance(new_logs, list) else [new_logs]
+            state['logs'].extend(str(line) for line in new_logs)
+            state['log_seq'] += len(new_logs)
+        now = time.time()
+        final = progress.status in (TaskStatus.COMPLETED, TaskStatus.FAILED)
+        if not final and now - state['flushed_at'] < config['progress_flush_interval']:
+            return
+        state['flushed_at'] = now
+        logs, log_seq = list(state['logs']), state['log_seq']
+    data = progress.dict(exclude={'logs'})
+    data['status'] = getattr(data.get('status'), 'value', data.get('status'))
+    data['logs'] = logs
+    data['log_seq'] = log_seq
+    Job.objects.filter(id=job_id).update(progress=data)
+
+
+def _install_progress_bridge() -> None:
+    global _bridge_installed
+    if not _bridge_installed:
+        add_progress_listener(_persist_progress)
+        _bridge_installed = True
+
+
+def _flush_progress(task_id: str) -> None:
+    """任务结束时强制写入最后一次进度"""
+    progress = get_progress(task_id)
+    if progress is None:
+        return
+    with _flush_lock:
+        if task_id in _flush_state:
+            _flush_state[task_id]['flushed_at'] = 0.0
+    _persist_progress(task_id, progress, {})
+
+
+# ========= 任务执行 =========
+
+def _execute_job(job_id: int) -> None:
+    """执行一个已认领的任务（线程池线程或进程池子进程中调用），状态全部写回数据库"""
+    close_old_connections()
+    job = Job.objects.filter(id=job_id, status='running').first()
+    if job is None:
+        return
+    _install_progress_bridge()
+    with _flush_lock:
+        # 重试时日志序号接着上一次尝试继续累加，SSE 读取方不会漏读
+        _flush_state[job.task_id] = {
+            'flushed_at': 0.0,
+            'log_seq': (job.progress or {}).get('log_seq', 0),
+            'logs': deque(maxlen=get_job_queue_config()['progress_log_limit']),
+        }
+    _local_task_ids[job.task_id] = job.id
+    set_task_context(job.task_id)
+    try:
+        handler = get_job_handler(job.job_type)
+        set_progress(job.task_id, {'status': TaskStatus.RUNNING, 'message': '任务开始执行'})
+        logger.info(f"开始执行任务 {job.job_type}#{job.id}（第 {job.attempts} 次）")
+        result = handler.func(job.payload, job)
+        Job.objects.filter(id=job.id, status='running').update(
+            status='succeeded', result=result, error='', finished_at=timezone.now()
+        )
+        progress = get_progress(job.task_id)
+        if progress is None or progress.status != TaskStatus.COMPLETED:
+            set_progress(job.task_id, {'percentage': 100, 'message': '任务完成', 'status': TaskStatus.COMPLETED})
+        logger.info(f"任务 {job.job_type}#{job.id} 执行成功")
+    except Exception as e:
+        logger.error(f"任务 {job.job_type}#{job.id} 执行失败: {str(e)}", exc_info=True)
+        _record_failure(job, f"{e}\n{traceback.format_exc()}")
+    finally:
+        _flush_progress(job.task_id)
+        _local_task_ids.pop(job.task_id, None)
+        with _flush_lock:
+            _flush_state.pop(job.task_id, None)
+        clear_task_context()
+        close_old_connections()
+
+
+def _record_failure(job: Job, error: str) -> None:
+    """记录失败：未超过最大尝试次数时延迟重试，否则标记为 failed"""
+    config = get_job_queue_config()
+    now = timezone.now()
+    if job.attempts < job.max_attempts:
+        Job.objects.filter(id=job.id, status='running').update(
+            status='pending', error=error, locked_by='', heartbeat_at=None,
+            run_after=now + timedelta(seconds=config['retry_backoff_seconds'] * job.attempts),
+        )
+        set_progress(job.task_id, {'message': f'任务失败，稍后进行第 {job.attempts + 1} 次尝试'})
+    else:
+        Job.objects.filter(id=job.id, status='running').update(
+            status='failed', error=error, finished_at=now
+        )
+        set_progress(job.task_id, {'message': f'任务失败: {error.splitlines()[0]}', 'status': TaskStatus.FAILED})
+
+
+class JobWorker:
+    """任务调度器：按执行池容量认领任务、提交到线程池/进程池、写心跳并回收超时任务"""
+
+    def __init__(self, thread_workers: Optional[int] = None, process_workers: Optional[int] = None,
+                 job_types: Optional[List[str]] = None):
+        config = get_job_queue_config()
+        self.config = config
+        self.capacity = {
+            'thread': config['thread_workers'] if thread_workers is None else thread_workers,
+            'process': config['process_workers'] if process_workers is None else process_workers,
+        }
+        self.job_types = job_types
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.executors: Dict[str, Any] = {}
+        self.inflight: Dict[str, Dict[Future, int]] = {'thread': {}, 'process': {}}
+        self._stop = threading.Event()
+
+    def _get_executor(self, pool: str):
+        if pool not in self.executors:
+            if pool == 'process':
+                self.executors[pool] = ProcessPoolExecutor(
+                    max_workers=self.capacity['process'],
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_process_worker,
+                )
+            else:
+                self.executors[pool] = ThreadPoolExecutor(
+                    max_workers=self.capacity['thread'], thread_name_prefix='job-worker'
+                )
+        return self.executors[pool]
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self, once: bool = False) -> None:
+        """调度循环；once=True 时只认领一轮并等待其完成（便于调试）"""
+        _autodiscover()
+        logger.info(f"任务 worker 启动: {self.worker_id}, 容量={self.capacity}")
+        self.recover_stale()
+        last_heartbeat = last_recover = time.time()
+        try:
+            while not self._stop.is_set():
+                self._reap()
+                for pool, capacity in self.capacity.items():
+                    free = capacity - len(self.inflight[pool])
+                    if free <= 0:
+                        continue
+                    # 进程池子进程经由 job_process 入口先加载 Django，再导入本模块执行任务
+                    target = run_process_job if pool == 'process' else _execute_job
+                    for job_id in self._claim(pool, free):
+                        future = self._get_executor(pool).submit(target, job_id)
+                        self.inflight[pool][future] = job_id
+
+                now = time.time()
+                if now - last_heartbeat >= self.config['heartbeat_interval']:
+                    self._heartbeat()
+                    last_heartbeat = now
+                if now - last_recover >= self.config['stale_after_seconds']:
+                    self.recover_stale()
+                    last_recover = now
+                if once:
+                    for futures in self.inflight.values():
+                        for future in list(futures):
+                            future.result()
+                    self._reap()
+                    break
+                self._stop.wait(self.config['poll_interval'])
+        finally:
+            for executor in self.executors.values():
+                executor.shutdown(wait=True)
+            logger.info(f"任务 worker 退出: {self.worker_id}")
+
+    def _claim(self, pool: str, limit: int) -> List[int]:
+        """认领一批排队中的任务，按优先级从高到低、入队先后排序"""
+        with transaction.atomic():
+            queryset = Job.objects.select_for_update(skip_locked=True).filter(
+                status='pending', pool=pool, run_after__lte=timezone.now()
+            )
+            if self.job_types:
+                queryset = queryset.filter(job_type__in=self.job_types)
+            ids = list(queryset.order_by('-priority', 'id').values_list('id', flat=True)[:limit])
+            if not ids:
+                return []
+            now = timezone.now()
+            Job.objects.filter(id__in=ids).update(
+                status='running', attempts=F('attempts') + 1, locked_by=self.worker_id,
+                started_at=now, heartbeat_at=now,
+            )
+        return ids
+
+    def _heartbeat(self) -> None:
+        job_ids = [job_id for futures in self.inflight.values() for job_id in futures.values()]
+        if job_ids:
+            Job.objects.filter(id__in=job_ids, status='running').update(heartbeat_at=timezone.now())
+
+    def _reap(self) -> None:
+        """回收已结束的 future；子进程崩溃等导致 _execute_job 未能写回状态时按失败处理"""
+        for pool, futures in self.inflight.items():
+            for future in [f for f in futures if f.done()]:
+                job_id = futures.pop(future)
+                error = future.exception()
+                if error is None:
+                    continue
+                logger.error(f"任务 #{job_id} 执行进程异常: {error}")
+                if isinstance(error, BrokenProcessPool):
+                    # 子进程被杀后进程池不可再用，下次提交时重建
+                    self.executors.pop(pool, None)
+                job = Job.objects.filter(id=job_id, status='running').first()
+                if job is not None:
+                    _record_failure(job, f"执行进程异常: {error}")
+
+    def recover_stale(self) -> int:
+        """将心跳超时（worker 已退出）的运行中任务重新排队，超过最大尝试次数的标记为 failed"""
+        deadline = timezone.now() - timedelta(seconds=self.config['stale_after_seconds'])
+        stale = Job.objects.filter(status='running', heartbeat_at__lt=deadline)
+        failed = stale.filter(attempts__gte=F('max_attempts')).update(
+            status='failed', error='worker 心跳超时', finished_at=timezone.now()
+        )
+        requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+            status='pending', locked_by='', heartbeat_at=None, error='worker 心跳超时，已重新排队'
+        )
+        if failed or requeued:
+            logger.warning(f"回收心跳超时任务: 重新排队 {requeued} 个, 标记失败 {failed} 个")
+        return requeued
+
+
+# ========= 内嵌 worker =========
+
+_embedded_worker: Optional[JobWorker] = None
+_embedded_lock = threading.Lock()
+
+
+def ensure_embedded_worker() -> None:
+    """在当前进程中启动内嵌 worker（只启动一次）"""
+    global _embedded_worker
+    if _embedded_worker is not None:
+        return
+    with _embedded_lock:
+        if _embedded_worker is None:
+            _embedded_worker = JobWorker()
+            threading.Thread(target=_embedded_worker.run, name='job-worker-embedded', daemon=True).start()
@@ -0,0 +1,137 @@
+"""
+分页工具
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, List, Optional, Sequence
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class CountedPaginator(Paginator):
+    """总数已知的分页器
+
+    Paginator 计算页数时会对查询集执行 COUNT(*)，大表上代价很高；总数可以从统计计数等途径得到时，
+    传入 count 跳过该查询。
+    """
+
+    def __init__(self, object_list, per_page, count: Optional[int] = None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._known_count = count
+
+    @cached_property
+    def count(self) -> int:
+        if self._known_count is not None:
+            return self._known_count
+        return super().count
+
+
+class KeysetPage(Page):
+    """键集分页的一页
+
+    除 Page 的接口外提供 next_cursor/previous_cursor；has_next/has_previous 由查询结果决定，
+    不依赖总数。页码只用于显示，随翻页链接传递。
+    """
+
+    def __init__(self, object_list, number, paginator, has_next: bool, has_previous: bool):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def next_page_number(self) -> int:
+        return self.number + 1
+
+    def previous_page_number(self) -> int:
+        return max(self.number - 1, 1)
+
+    @property
+    def next_cursor(self) -> str:
+        return self.paginator.encode_cursor(self.object_list[-1]) if self.object_list else ''
+
+    @property
+    def previous_cursor(self) -> str:
+        return self.paginator.encode_cursor(self.object_list[0]) if self.object_list else ''
+
+
+class KeysetPaginator(CountedPaginator):
+    """键集（游标）分页器
+
+    按 key_fields 降序排列（最后一个字段须唯一，通常为 id），翻页时以上一页最后一行的键值为游标查询
+    "键值小于游标"的前 per_page 条，查询走 (筛选字段, key_fields) 索引，不使用 OFFSET，深页与首页耗时相同。
+    没有游标时（首页、直接输入页码）退化为 OFFSET 分页。
+    """
+
+    def __init__(self, object_list, per_page, key_fields: Sequence[str] = ('created_at', 'id'), **kwargs):
+        super().__init__(object_list.order_by(*(f'-{field}' for field in key_fields)), per_page, **kwargs)
+        self.key_fields = tuple(key_fields)
+
+    def encode_cursor(self, obj: Any) -> str:
+        values = [str(getattr(obj, field)) for field in self.key_fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor: str) -> List[Any]:
+        """解析游标，格式不正确时抛出 ValueError"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            if not isinstance(values, list) or len(values) != len(self.key_fields):
+                raise ValueError
+            model = self.object_list.model
+            return [model._meta.get_field(field).to_python(value) for field, value in zip(self.key_fields, values)]
+        except (ValueError, TypeError, UnicodeError, ValidationError, binascii.Error):
+            raise ValueError(f'无效的分页游标: {cursor}')
+
+    def _keyset_filter(self, values: List[Any], lookup: str) -> Q:
+        """构造 (k1, k2, ...) < / > (v1, v2, ...) 的条件"""
+        condition = Q()
+        for index in range(len(self.key_fields) - 1, -1, -1):
+            term = Q(**{f'{self.key_fields[index]}__{lookup}': values[index]})
+            if index < len(self.key_fields) - 1:
+                term |= Q(**{self.key_fields[index]: values[index]}) & condition
+            condition = term
+        return condition
+
+    def page_after(self, cursor: str, number: int) -> KeysetPage:
+        """游标所在行之后（更旧）的一页"""
+        values = self.decode_cursor(cursor)
+        rows = list(self.object_list.filter(self._keyset_filter(values, 'lt'))[:self.per_page + 1])
+        return KeysetPage(rows[:self.per_page], number, self,
+                          has_next=len(rows) > self.per_page, has_previous=True)
+
+    def page_before(self, cursor: str, number: int) -> KeysetPage:
+        """游标所在行之前（更新）的一页"""
+        values = self.decode_cursor(cursor)
+        ascending = self.object_list.filter(self._keyset_filter(values, 'gt')).reverse()
+        rows = list(ascending[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return KeysetPage(rows, max(number, 1) if has_previous else 1, self,
+                          has_next=True, has_previous=has_previous)
+
+    def page_from_params(self, params: Any, prefix: str) -> KeysetPage:
+        """按请求参数 {prefix}_page、{prefix}_after、{prefix}_before 取页，参数无效时返回第一页"""
+        try:
+            number = int(params.get(f'{prefix}_page') or 1)
+        except (TypeError, ValueError):
+            number = 1
+        try:
+            if params.get(f'{prefix}_after'):
+                return self.page_after(params[f'{prefix}_after'], number)
+            if params.get(f'{prefix}_before'):
+                return self.page_before(params[f'{prefix}_before'], number)
+        except ValueError:
+            number = 1
+        page = self.get_page(number)
+        return KeysetPage(list(page.object_list), page.number, self,
+                          has_next=page.has_next(), has_previous=page.has_previous())
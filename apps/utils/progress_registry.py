@@ -23,11 +23,28 @@
 
 import threading
 import time
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional
 from .progress_schema import ProgressData, ProgressUpdate, TaskStatus
 
 _progress_registry: Dict[str, ProgressData] = {}
 _lock = threading.Lock()
+# 进度变更监听器（如后台任务 worker 将进度持久化到 Job 表，供其他进程查询）
+_listeners: List[Callable[[str, ProgressData, dict], None]] = []
+
+
+def add_progress_listener(listener: Callable[[str, ProgressData, dict], None]) -> None:
+    """注册进度变更监听器，每次 set_progress 后以 (task_id, 最新进度, 本次更新数据) 调用"""
+    with _lock:
+        if listener not in _listeners:
+            _listeners.append(listener)
+
+
+def _notify(task_id: str, progress: ProgressData, data: dict) -> None:
+    for listener in list(_listeners):
+        try:
+            listener(task_id, progress, data)
+        except Exception:
+            pass
 
 
 def set_progress(task_id: str, data: dict) -> None:
@@ -49,11 +66,12 @@ def set_progress(task_id: str, data: dict) -> None:
             current_dict = current.dict()
             current_dict.update(data)
             current_dict['timestamp'] = time.time()
-            _progress_registry[task_id] = ProgressData(**current_dict)
-            return
+            current = ProgressData(**current_dict)
+            _progress_registry[task_id] = current
+            update_data = None
         
         # 处理日志追加
-        if update_data.log is not None:
+        if update_data is not None and update_data.log is not None:
             if isinstance(update_data.log, list):
                 current.logs.extend([str(x) for x in update_data.log])
             else:
@@ -61,24 +79,28 @@ def set_progress(task_id: str, data: dict) -> None:
             # 限制日志长度
             current.logs = current.logs[-2000:]
         
-        # 更新其他字段
-        update_dict = update_data.dict(exclude={'log'}, exclude_none=True)
-        for key, value in update_dict.items():
-            if hasattr(current, key):
-                setattr(current, key, value)
-        
-        # 自动更新任务状态
-        if current.percentage is not None:
-            if current.percentage >= 100:
-                current.status = TaskStatus.COMPLETED
-            elif current.percentage > 0:
-                current.status = TaskStatus.RUNNING
-        
-        # 更新时间戳
-        current.timestamp = time.time()
-        
-        # 保存更新后的数据
-        _progress_registry[task_id] = current
+        if update_data is not None:
+            # 更新其他字段
+            update_dict = update_data.dict(exclude={'log'}, exclude_none=True)
+            for key, value in update_dict.items():
+                if hasattr(current, key):
+                    setattr(current, key, value)
+            
+            # 自动更新任务状态
+            if current.percentage is not None:
+                if current.percentage >= 100:
+                    current.status = TaskStatus.COMPLETED
+                elif current.percentage > 0:
+                    current.status = TaskStatus.RUNNING
+            
+            # 更新时间戳
+            current.timestamp = time.time()
+            
+            # 保存更新后的数据
+            _progress_registry[task_id] = current
+    
+    if _listeners:
+        _notify(task_id, current, data)
 
 
 def get_progress(task_id: str) -> Optional[ProgressData]:
@@ -145,6 +145,11 @@ LLM_PROVIDERS = {
         'temperature': 1.0,
         'max_tokens': 8192,  #deepseek-chat的max_tokens为8192
         # 'max_tokens': 64000, #deepseek-reasoner的max_tokens为64000
+        # 结构化输出: json_object(JSON mode) / json_schema / None(提示词约束+本地容错解析)
+        'structured_output': 'json_object',
+        # 调用限流(apps/llm/governor.py): 同时进行中的请求数, 每分钟提示词token估算上限(0为不限制)
+        'max_concurrency': 4,
+        'tokens_per_minute': 0,
     },
     'qwen': {
         'name': '通义千问',
@@ -152,6 +157,9 @@ LLM_PROVIDERS = {
         'api_base': 'https://dashscope.aliyuncs.com/compatible-mode/v1',
         'temperature': 1.0,
         'max_tokens': 8192,
+        'structured_output': 'json_object',
+        'max_concurrency': 4,
+        'tokens_per_minute': 0,
     },
 }
 # AI Agent LLM提供商配置, 每个AI Agent可定制LLM提供商
@@ -170,13 +178,132 @@ VECTOR_DB_CONFIG = {
     'collection_name': 'vv_knowledge_collection',
 }
 
+# 文档分区结果缓存配置, unstructured分区结果按文件内容哈希+分区策略缓存到本地磁盘
+PARTITION_CACHE_CONFIG = {
+    'enabled': True,
+    'cache_dir': os.path.join(BASE_DIR, 'cache', 'partitions'),
+    'compression_level': 3,  # zstd压缩级别
+}
+
+# 知识库文档chunking配置
+KNOWLEDGE_CHUNKING = {
+    'strategy': 'token',  # 'token': 按嵌入模型分词器的token数打包; 'character': unstructured按字符数切分(max_characters)
+    'max_tokens': 512,  # 每个chunk的token上限
+    'overlap_tokens': 64,  # 相邻chunk的重叠token数
+    'new_section_on_title': True,  # 遇到标题时另起新chunk
+}
+
+# 测试用例生成配置: 用例数较多时拆分为多个分片并发生成, 合并后本地去重
+TEST_CASE_GENERATION_CONFIG = {
+    'max_cases_per_shard': 15,  # 每个分片最多生成的用例数, 避免单次输出超过max_tokens被截断
+    'max_concurrent_shards': 4,  # 同时请求LLM的分片数
+    'dedup_threshold': 0.95,  # 合并分片结果时判定为重复用例的相似度阈值
+    'output_format': 'compact',  # compact: LLM输出紧凑位置数组, 本地展开(输出token更少); verbose: 完整JSON字典
+}
+
+# 批量AI评审配置: 多条用例按token预算打包进一次请求, 各批次在提供商限流下并发执行
+TEST_CASE_REVIEW_BATCH_CONFIG = {
+    'pack_token_budget': 3000,  # 每批用例内容的token估算上限(不含提示词模板)
+    'max_cases_per_pack': 8,  # 每批最多用例数, 避免输出过长被截断
+    'max_cases': 500,  # 单次请求最多评审的用例数
+}
+
+# PRD分析配置(apps/ai_agents/prd_analyzer/analyser.py): 长文档按标题层级分段, 各段并发分析后合并测试点
+PRD_ANALYSIS_CONFIG = {
+    'map_reduce_threshold_tokens': 6000,  # 文档估算token数超过该值时自动分段分析
+    'section_token_budget': 3000,  # 每段内容的token估算上限(不含提示词模板)
+    'max_sections': 60,  # 单个文档最多分段数
+}
+
+# 测试用例批量获取与导出配置(apps/core/test_case_service.py): 按主键分批读取, xlsx使用XlsxWriter constant_memory模式
+TEST_CASE_EXPORT_CONFIG = {
+    'batch_size': 1000,  # 每批从数据库读取的用例数
+    'id_chunk_size': 1000,  # 按ID获取/导出时每条 IN 查询包含的ID数
+    'max_ids': 100000,  # 单次请求最多传入的用例ID数
+}
+
+# 测试用例统计配置(apps/core/test_case_stats.py): 计数随用例增删改增量维护, 读取结果缓存的秒数
+# 计数与实际不符时可运行 python manage.py rebuild_test_case_stats 重建
+TEST_CASE_STATS_CONFIG = {
+    'cache_timeout': 60,
+}
+
+# 测试用例全文检索配置(apps/core/test_case_search.py)
+# MySQL上执行 python manage.py create_test_case_fulltext_index 创建ngram全文索引, 未创建时退化为icontains检索
+TEST_CASE_SEARCH_CONFIG = {
+    'page_size': 20,  # 默认每页条数
+    'max_page_size': 100,
+    'ngram_token_size': 2,  # 与MySQL服务端ngram_token_size一致, 更短的检索词使用icontains
+    'max_candidates': 500,  # icontains检索时参与排序的最大命中数
+    'snippet_length': 120,  # 高亮片段长度
+}
+
+# 后台任务队列配置(apps/utils/job_queue.py): 长耗时Agent任务写入Job表, 由worker按优先级执行
+JOB_QUEUE_CONFIG = {
+    'thread_workers': 4,  # 线程池大小(LLM调用等I/O密集任务)
+    'process_workers': 1,  # 进程池大小(Java源码分析等需要隔离的任务)
+    'poll_interval': 1.0,  # 认领任务的轮询间隔(秒)
+    'heartbeat_interval': 15,  # 运行中任务的心跳间隔(秒)
+    'stale_after_seconds': 120,  # 心跳超过该时间未更新的任务视为worker已退出, 重新排队
+    'max_attempts': 3,  # 默认最大尝试次数
+    'retry_backoff_seconds': 30,  # 失败重试的延迟(秒), 按尝试次数递增
+    'progress_flush_interval': 1.0,  # 任务进度写入数据库的最小间隔(秒)
+    'progress_log_limit': 200,  # Job.progress中保留的最近日志条数
+    'embedded_worker': False,  # 任务由 python manage.py run_jobs 执行; 仅本地runserver调试时可设为True, 在Web进程内启动worker
+}
+
+# 测试用例生成结果缓存: 相同需求/设计方法/用例类型/条数/模型的请求直接返回已保存的结果, 页面勾选"重新生成"可跳过
+TEST_CASE_RESULT_CACHE_CONFIG = {
+    'enabled': True,
+    'ttl_days': 30,  # 缓存有效天数, 0表示永不过期
+}
+
+# 异步视图中的知识检索配置: 嵌入编码与Milvus检索在有界线程池中执行, 不阻塞事件循环
+KNOWLEDGE_RETRIEVAL_CONFIG = {
+    'max_workers': 4,  # 检索线程数
+    'timeout': 15,  # 单次检索等待上限(秒), 超时后不使用知识库内容继续生成
+}
+
+# 知识库MySQL与Milvus同步配置(outbox, python manage.py sync_knowledge)
+KNOWLEDGE_SYNC_CONFIG = {
+    'batch_size': 256,  # 每批处理的待办数(一次嵌入、一次写入Milvus)
+    'max_attempts': 5,  # 超过最大尝试次数后标记为failed
+    'reconcile_page_size': 2000,  # 对账时每页条数
+    'drain_on_write': True,  # 写入后在请求内立即同步本次登记的待办, 关闭后完全交由sync_knowledge命令处理
+    'processing_timeout_seconds': 600,  # 处理中的待办超过该时长视为同步进程崩溃, 对账时重置
+    'retry_backoff_seconds': 30,  # 同步失败后的重试延迟(秒), 按尝试次数指数递增
+    'max_retry_backoff_seconds': 1800,  # 重试延迟上限(秒)
+}
+
+# 知识库重建索引任务配置(python manage.py reindex_knowledge)
+REINDEX_CONFIG = {
+    'checkpoint_dir': os.path.join(BASE_DIR, 'cache', 'reindex'),  # 断点文件目录
+    'read_batch_size': 1000,   # 从旧集合分页读取的条数
+    'embed_batch_size': 256,   # 每次嵌入的文本条数
+    'write_batch_size': 2000,  # 缓冲写入新集合的条数
+}
+
 # 嵌入模型配置
 EMBEDDING_CONFIG = {
     'model': 'bge-m3',
+    'model_name': 'BAAI/bge-m3',  # 本地加载的sentence-transformers模型, 重建索引切换模型后需同步修改
+    # 按用途截断: 检索问句与入库文档分别限制最大token数(bge-m3最长支持8192)
+    'max_tokens': {'query': 512, 'passage': 2048},
+    # 长度分桶: (桶内最大token数, 批大小), 长文本使用更小的批, 避免短文本被填充到最长文本的长度
+    'length_buckets': [(128, 64), (512, 32), (1024, 16), (2048, 8), (4096, 4), (8192, 2)],
     'api_key': 'your_huggingface_api_key',
     'api_url': 'https://api-inference.huggingface.co/models/BAAI/bge-m3',
 }
 
+# 嵌入模型 sidecar: 开启后模型只在 run_embedding_sidecar 进程中加载一次, 各 worker 通过 Unix socket 调用
+EMBEDDING_SIDECAR = {
+    'enabled': False,
+    'socket_path': os.path.join(BASE_DIR, 'run', 'embedding.sock'),
+    'max_batch_texts': 256,  # 单次合并编码的最大文本数
+    'max_wait_ms': 5,  # 合并批次时等待后续请求的最长时间
+    'timeout': 120,  # 客户端等待响应的超时(秒)
+}
+
 # java源码分析服务调用地址
 JAVA_ANALYZER_SERVICE_URL = "http://localhost:8089"
 REPO_PATH_MAPPING = {